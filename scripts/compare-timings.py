@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""Compare the step timings of two installs.
+
+The timings are the installer-timings.json written to /var/log/installer
+at the end of the install. Steps are matched by name; a step that ran more
+than once (for example, one context per package) is compared by its total
+time. Steps that got slower by more than both --threshold-percent and
+--min-seconds are reported as regressions, and the exit status is 1 if
+there are any.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+
+def load(path: str) -> Tuple[dict, Dict[str, float], Dict[str, int]]:
+    with open(path) as fp:
+        data = json.load(fp)
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for step in data["steps"]:
+        name = step["name"]
+        totals[name] = totals.get(name, 0.0) + step["duration"]
+        counts[name] = counts.get(name, 0) + 1
+    return data, totals, counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument("--threshold-percent", type=float, default=10.0)
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="List every step, not only those that changed by more than "
+        "--min-seconds.",
+    )
+    parser.add_argument("old", help="baseline installer-timings.json")
+    parser.add_argument("new", help="installer-timings.json to check")
+    args = parser.parse_args()
+
+    old_data, old, old_counts = load(args.old)
+    new_data, new, new_counts = load(args.new)
+    critical = {step["name"] for step in new_data.get("critical_path", [])}
+
+    def is_regression(before: float, after: float) -> bool:
+        delta = after - before
+        return delta > args.min_seconds and (
+            before == 0 or 100 * delta / before > args.threshold_percent
+        )
+
+    rows = []
+    for name in sorted(set(old) | set(new)):
+        before = old.get(name, 0.0)
+        after = new.get(name, 0.0)
+        if not args.all and abs(after - before) <= args.min_seconds:
+            continue
+        rows.append((after - before, name, before, after))
+    rows.sort(reverse=True)
+
+    print(
+        f"total: {old_data['total']:.3f}s -> {new_data['total']:.3f}s "
+        f"({new_data['total'] - old_data['total']:+.3f}s)"
+    )
+    print()
+    print(f"{'old':>10} {'new':>10} {'change':>10} {'%':>7}  name")
+    regressions = 0
+    for delta, name, before, after in rows:
+        if name not in old:
+            percent = "new"
+        elif name not in new:
+            percent = "gone"
+        elif before == 0:
+            percent = ""
+        else:
+            percent = f"{100 * delta / before:+.1f}"
+        flags = ""
+        if is_regression(before, after):
+            regressions += 1
+            flags += " REGRESSION"
+        if name in critical:
+            flags += " (critical path)"
+        if name in old and name in new and old_counts[name] != new_counts[name]:
+            flags += f" (ran {old_counts[name]} -> {new_counts[name]} times)"
+        print(
+            f"{before:9.3f}s {after:9.3f}s {delta:+9.3f}s {percent:>7}  {name}{flags}"
+        )
+
+    if regressions:
+        print()
+        print(f"{regressions} regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""Measure the overhead Context adds to API requests and reporting events.
+
+"request" mimics what the API server does for every request: create a
+child of the controller's context, mark it as a request context and
+report its start and finish. "event" mimics what the server does for
+every reporting event from an install context: look up "request",
+"is-install-context" and "controller" (as _maybe_push_to_journal does)
+and compute the full name, from a context --depth levels below the
+controller's.
+
+Run from the root of the source tree, on both sides of a change:
+
+    PYTHONPATH=. scripts/context-benchmark.py
+"""
+
+import argparse
+import timeit
+
+from subiquitycore.context import Context
+
+
+class App:
+    project = "subiquity"
+
+    def report_start_event(self, context, description):
+        pass
+
+    def report_finish_event(self, context, description, status):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument("--number", type=int, default=200000)
+    parser.add_argument("--depth", type=int, default=6)
+    args = parser.parse_args()
+
+    root = Context.new(App())
+    controller = root.child("Install")
+    controller.set("controller", object())
+    install = controller.child("install")
+    install.set("is-install-context", True)
+    leaf = install
+    for i in range(args.depth - 1):
+        leaf = leaf.child(f"step{i}")
+
+    def request():
+        context = controller.child("status_GET")
+        context.set("request", None)
+        with context:
+            pass
+
+    def event():
+        leaf.get("request")
+        leaf.get("is-install-context", False)
+        leaf.get("controller")
+        leaf.full_name()
+
+    for name, func in [("request", request), ("event", event)]:
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        print(f"{name:8} {best / args.number * 1e9:8.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
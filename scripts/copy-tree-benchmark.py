@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""Compare copy_tree from subiquitycore.file_util with cp -aT.
+
+Two synthetic trees are copied: one shaped like /var/lib/apt/lists (a few
+large Packages and Translation files and a number of small ones) and one
+shaped like /var/log/installer (many small files in a few directories and
+a couple of larger logs). Each is copied --repeat times with cp -aT, with
+copy_tree using a single thread and with copy_tree using its default
+thread pool, and the median time of each is printed. The trees are
+created in --dir, which should be on the filesystem of interest: copies
+on filesystems that support reflinks (btrfs, xfs) are much faster still.
+
+Run from the root of the source tree:
+
+    PYTHONPATH=. scripts/copy-tree-benchmark.py
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from subiquitycore.file_util import copy_tree
+
+
+def write(path: str, size: int) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fp:
+        # Not all zeros, so that no filesystem can cheat.
+        block = random.randbytes(min(size, 1 << 16))
+        while size > 0:
+            fp.write(block[:size])
+            size -= len(block)
+
+
+def make_apt_lists(root: str, scale: float) -> None:
+    suites = ["noble", "noble-updates", "noble-security", "noble-backports"]
+    for suite in suites:
+        prefix = f"archive.ubuntu.com_ubuntu_dists_{suite}"
+        write(os.path.join(root, f"{prefix}_InRelease"), 250_000)
+        for component, mb in ("main", 8), ("universe", 60), ("restricted", 4):
+            size = int(mb * scale * (1 << 20))
+            if suite != "noble":
+                size //= 8
+            write(
+                os.path.join(root, f"{prefix}_{component}_binary-amd64_Packages"), size
+            )
+            write(
+                os.path.join(root, f"{prefix}_{component}_i18n_Translation-en"),
+                size // 3,
+            )
+            write(
+                os.path.join(root, f"{prefix}_{component}_cnf_Commands-amd64"), 40_000
+            )
+            write(
+                os.path.join(root, f"{prefix}_{component}_dep11_icons-48x48.tar"),
+                30_000,
+            )
+    write(os.path.join(root, "lock"), 0)
+    os.makedirs(os.path.join(root, "partial"))
+
+
+def make_installer_logs(root: str, scale: float) -> None:
+    write(os.path.join(root, "curtin-install.log"), int(8 * scale * (1 << 20)))
+    write(os.path.join(root, "subiquity-server-debug.log"), int(4 * scale * (1 << 20)))
+    for i in range(int(1500 * scale)):
+        write(
+            os.path.join(root, f"dir{i % 10}", f"file{i}.log"),
+            random.randint(100, 40_000),
+        )
+    for name in "block", "curtin-install":
+        for i in range(int(200 * scale)):
+            write(
+                os.path.join(root, name, f"probe-{i}.json"), random.randint(100, 4_000)
+            )
+
+
+def run_cp(src: str, dst: str) -> None:
+    subprocess.run(["cp", "-aT", src, dst], check=True)
+
+
+def measure(func, src: str, dst: str, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        shutil.rmtree(dst, ignore_errors=True)
+        start = time.perf_counter()
+        func(src, dst)
+        times.append(time.perf_counter() - start)
+    shutil.rmtree(dst, ignore_errors=True)
+    return statistics.median(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument("--dir", default=None)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+
+    methods = [
+        ("cp -aT", run_cp),
+        ("copy_tree, 1 worker", lambda s, d: copy_tree(s, d, max_workers=1)),
+        ("copy_tree", copy_tree),
+    ]
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for name, make in (
+            ("apt lists", make_apt_lists),
+            ("installer logs", make_installer_logs),
+        ):
+            src = os.path.join(tmp, "src")
+            make(src, args.scale)
+            files = sum(len(f) for _, _, f in os.walk(src))
+            size = sum(
+                os.path.getsize(os.path.join(d, f))
+                for d, _, fs in os.walk(src)
+                for f in fs
+            )
+            print(f"{name}: {files} files, {size / (1 << 20):.0f} MiB")
+            for method, func in methods:
+                elapsed = measure(func, src, os.path.join(tmp, "dst"), args.repeat)
+                print(f"  {method:22} {elapsed * 1000:8.1f} ms")
+            shutil.rmtree(src)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""Measure how fast the server side can consume curtin events from journald.
+
+The curtin event logs in examples/curtin-events are replayed into the
+journal with scripts/replay-curtin-log.py (with no delay between events)
+while this script listens for them, either one entry at a time with
+journald_listen or in batches with journald_listen_batched. For each mode
+it prints the number of events received, the wall clock time until the
+last one arrived, the CPU time used by this process and how many
+callbacks the event loop ran.
+
+Run from the root of the source tree:
+
+    PYTHONPATH=. scripts/journal-reader-benchmark.py --repeat 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from subiquity.journald import journald_listen, journald_listen_batched
+
+DEFAULT_FILES = [
+    "examples/curtin-events/initial.json",
+    "examples/curtin-events/partitioning.json",
+    "examples/curtin-events/extract.json",
+    "examples/curtin-events/curthooks.json",
+]
+
+
+def count_events(files) -> int:
+    n = 0
+    for path in files:
+        with open(path) as fp:
+            for line in fp:
+                entry = json.loads(line)
+                if entry["SYSLOG_IDENTIFIER"].startswith("curtin_event"):
+                    n += 1
+    return n
+
+
+async def replay(files, identifier, repeat):
+    env = dict(os.environ, SUBIQUITY_REPLAY_TIMESCALE="1e9")
+    for _ in range(repeat):
+        for path in files:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "scripts/replay-curtin-log.py",
+                "--event-identifier",
+                identifier,
+                "--output",
+                "/dev/null",
+                "--",
+                path,
+                env=env,
+                stdout=subprocess.DEVNULL,
+            )
+            await proc.wait()
+
+
+async def run(mode, files, repeat):
+    expected = count_events(files) * repeat
+    identifier = f"curtin_event.bench.{os.getpid()}.{mode}"
+    received = 0
+    callbacks = 0
+    done = asyncio.Event()
+
+    def on_event(event):
+        nonlocal received, callbacks
+        callbacks += 1
+        received += 1
+        if received >= expected:
+            done.set()
+
+    def on_batch(events):
+        nonlocal received, callbacks
+        callbacks += 1
+        received += len(events)
+        if received >= expected:
+            done.set()
+
+    loop = asyncio.get_running_loop()
+    if mode == "single":
+        fd = journald_listen([identifier], on_event)
+    else:
+        listener = journald_listen_batched(
+            [identifier], on_batch, fields=["CURTIN_", "MESSAGE", "SYSLOG_IDENTIFIER"]
+        )
+
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    replayer = asyncio.create_task(replay(files, identifier, repeat))
+    try:
+        await asyncio.wait_for(done.wait(), 60 * repeat)
+    except asyncio.TimeoutError:
+        print(f"{mode}: timed out", file=sys.stderr)
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu_start
+    await replayer
+
+    if mode == "single":
+        loop.remove_reader(fd)
+    else:
+        listener.close()
+
+    print(
+        f"{mode:8} {received:7d} events in {elapsed:6.2f}s "
+        f"({received / elapsed:8.0f}/s), cpu {cpu:5.2f}s, "
+        f"{callbacks:7d} loop callbacks"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["single", "batched", "both"],
+        default="both",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=50,
+        help="Number of times to replay the event logs.",
+    )
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES)
+    args = parser.parse_args()
+
+    modes = ["single", "batched"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        asyncio.run(run(mode, args.files, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""Measure how much logging delays the event loop.
+
+A burst of debug logging similar to what the server does while probing
+(many short records and a few large dumps) is emitted from a coroutine
+while a heartbeat callback measures how late the loop runs it. This is
+done with the log files written synchronously and with them written by
+the background thread that setup_logger(background=True) starts, and
+prints the time spent in logging calls and the loop stalls for each.
+
+Run from the root of the source tree:
+
+    PYTHONPATH=. scripts/logging-benchmark.py
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from subiquitycore.log import setup_logger, stop_background_logging
+
+log = logging.getLogger("subiquity.benchmark")
+
+
+async def heartbeat(stalls, stop, interval=0.001):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def emit(args):
+    big = {f"{i}:0": f"partition-{i}" * 10 for i in range(args.big_size)}
+    spent = 0.0
+    for i in range(args.records):
+        start = time.perf_counter()
+        log.debug("considering mount of %s at %s", i, "/some/path")
+        if i % args.big_every == 0:
+            log.debug("majmin_to_dev %s", big)
+        spent += time.perf_counter() - start
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    return spent
+
+
+async def run(args):
+    stalls = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stalls, stop))
+    start = time.perf_counter()
+    spent = await emit(args)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return spent, elapsed, stalls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--big-every", type=int, default=1000)
+    parser.add_argument("--big-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    root = logging.getLogger("")
+    for background in False, True:
+        with tempfile.TemporaryDirectory() as tempdir:
+            with mock.patch("subiquitycore.log.set_log_perms"):
+                setup_logger(tempdir, base="bench", background=background)
+            spent, elapsed, stalls = asyncio.run(run(args))
+            stop_background_logging()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+                handler.close()
+        stalls.sort()
+        mode = "background" if background else "sync"
+        print(
+            f"{mode:10} logging {spent * 1000:7.1f}ms of {elapsed * 1000:7.1f}ms, "
+            f"loop stall median {statistics.median(stalls) * 1000:5.2f}ms "
+            f"p99 {stalls[int(len(stalls) * 0.99)] * 1000:5.2f}ms "
+            f"max {stalls[-1] * 1000:5.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
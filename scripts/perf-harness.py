@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""Performance regression harness for the install event pipeline.
+
+Runs a dry-run server through an autoinstall, once for each --scale, while
+a few clients keep querying the API. The recorded curtin events from
+examples/curtin-events are replayed by the dry-run curtin command, sped up
+by the scale factor (SUBIQUITY_REPLAY_TIMESCALE); "inf" replays them with
+no delay at all, which measures how fast the server can process them.
+
+For each run this measures:
+
+ * install_seconds: time from the install being confirmed until DONE
+ * events_per_second: reporting events handled per second in that time
+ * api_latency_{p50,p95,max}_ms: latency of the API requests made meanwhile
+ * cpu_seconds: user + system CPU time of the server process
+ * peak_rss_mb: peak resident set size of the server process
+
+and compares the results with the budgets in --budgets. A budget named
+max_<metric> fails the run if the metric is larger, min_<metric> if it is
+smaller. Budgets at the top level apply to every run; those under
+scales.<scale> only to runs at that scale. The exit status is 1 if any
+budget was exceeded.
+
+Run from the root of the source tree:
+
+    PYTHONPATH=$PWD:$PWD/curtin:$PWD/probert \\
+        scripts/perf-harness.py --scale inf --scale 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+import yaml
+
+STATUS_PATHS = ["/meta/status", "/meta/events", "/storage/v2"]
+
+
+class ProcSampler:
+    """Samples CPU time and peak RSS of a process from /proc."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self._ticks = os.sysconf("SC_CLK_TCK")
+
+    def sample(self) -> bool:
+        try:
+            with open(f"/proc/{self.pid}/stat") as fp:
+                # The command name may contain spaces, so split after it.
+                fields = fp.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{self.pid}/status") as fp:
+                status = fp.read()
+        except (FileNotFoundError, ProcessLookupError):
+            return False
+        # utime and stime are fields 14 and 15 of stat; fields[0] is 3.
+        self.cpu_seconds = (int(fields[11]) + int(fields[12])) / self._ticks
+        for line in status.splitlines():
+            if line.startswith("VmHWM:"):
+                self.peak_rss_mb = int(line.split()[1]) / 1024
+        return True
+
+    async def run(self, interval: float = 0.1) -> None:
+        while self.sample():
+            await asyncio.sleep(interval)
+
+
+class Client:
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.latencies: List[float] = []
+
+    async def get(self, path: str, **kwargs):
+        params = {k: json.dumps(v) for k, v in kwargs.items()}
+        start = time.monotonic()
+        async with self.session.get(f"http://a{path}", params=params) as resp:
+            resp.raise_for_status()
+            result = await resp.json()
+        self.latencies.append(time.monotonic() - start)
+        return result
+
+
+async def wait_for_socket(path: str, proc, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if proc.returncode is not None:
+            raise RuntimeError("server exited during startup")
+        if time.monotonic() > deadline:
+            raise RuntimeError("timed out waiting for the server to start")
+        await asyncio.sleep(0.1)
+
+
+async def load(client: Client, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        for path in STATUS_PATHS:
+            try:
+                await client.get(path)
+            except aiohttp.ClientError:
+                if stop.is_set():
+                    return
+                await asyncio.sleep(0.1)
+
+
+async def run_install(args, scale: str) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tempdir:
+        socket_path = os.path.join(tempdir, "socket")
+        env = os.environ.copy()
+        env["SUBIQUITY_REPLAY_TIMESCALE"] = scale
+        cmd = [
+            sys.executable,
+            "-m",
+            "subiquity.cmd.server",
+            "--dry-run",
+            "--socket",
+            socket_path,
+            "--output-base",
+            tempdir,
+            "--machine-config",
+            args.machine_config,
+            "--autoinstall",
+            args.autoinstall,
+            "--kernel-cmdline",
+            "autoinstall",
+            "--source-catalog",
+            args.source_catalog,
+        ]
+        with open(os.path.join(tempdir, "server-output"), "w") as output:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, env=env, stdout=output, stderr=output
+            )
+        sampler = ProcSampler(proc.pid)
+        sampler_task = asyncio.create_task(sampler.run())
+        conn = aiohttp.UnixConnector(path=socket_path)
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(connector=conn, timeout=timeout) as session:
+            try:
+                await wait_for_socket(socket_path, proc, args.timeout)
+                return await asyncio.wait_for(
+                    measure(args, session, proc, sampler), args.timeout
+                )
+            finally:
+                with contextlib.suppress(ProcessLookupError):
+                    proc.terminate()
+                await proc.wait()
+                sampler_task.cancel()
+
+
+async def measure(args, session, proc, sampler) -> Dict[str, float]:
+    status_client = Client(session)
+    clients = [Client(session) for _ in range(args.clients)]
+    stop = asyncio.Event()
+    loaders = []
+
+    state = None
+    started = first_event = None
+    while True:
+        try:
+            status = await status_client.get("/meta/status", cur=state)
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.1)
+            continue
+        state = status["state"]
+        if state == "ERROR":
+            raise RuntimeError("server in error state")
+        if state in ("NEEDS_CONFIRMATION", "RUNNING") and started is None:
+            started = time.monotonic()
+            first_event = (await status_client.get("/meta/events", limit=0))["last"]
+            loaders = [asyncio.create_task(load(c, stop)) for c in clients]
+        if state == "DONE":
+            break
+    finished = time.monotonic()
+    if started is None:
+        raise RuntimeError("did not see the install start")
+    last_event = (await status_client.get("/meta/events", limit=0))["last"]
+    sampler.sample()
+    stop.set()
+    await asyncio.gather(*loaders)
+    # The server shuts itself down once a non-interactive install is done;
+    # let it, so that the CPU time includes the shutdown path.
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(proc.wait(), 30)
+
+    latencies = sorted(lat for c in clients for lat in c.latencies)
+    requests = len(latencies)
+    if not latencies:
+        latencies = [0.0]
+    install_seconds = finished - started
+    return {
+        "install_seconds": install_seconds,
+        "events_per_second": (last_event - first_event) / install_seconds,
+        "api_requests": requests,
+        "api_latency_p50_ms": statistics.median(latencies) * 1000,
+        "api_latency_p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "api_latency_max_ms": latencies[-1] * 1000,
+        "cpu_seconds": sampler.cpu_seconds,
+        "peak_rss_mb": sampler.peak_rss_mb,
+    }
+
+
+def check_budgets(results: Dict[str, float], budgets: Dict[str, float]) -> List[str]:
+    failures = []
+    for name, limit in budgets.items():
+        kind, metric = name.split("_", 1)
+        value = results.get(metric)
+        if value is None:
+            failures.append(f"{name}: unknown metric {metric}")
+        elif kind == "max" and value > limit:
+            failures.append(f"{metric} = {value:.2f}, budget is at most {limit}")
+        elif kind == "min" and value < limit:
+            failures.append(f"{metric} = {value:.2f}, budget is at least {limit}")
+    return failures
+
+
+def budgets_for(config: dict, scale: str) -> Dict[str, float]:
+    budgets = {k: v for k, v in config.items() if k != "scales"}
+    budgets.update(config.get("scales", {}).get(scale, {}))
+    return budgets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "--scale",
+        action="append",
+        help="Replay speed-up factor, 'inf' for no delay (default: inf). "
+        "May be given more than once.",
+    )
+    parser.add_argument("--budgets", default="scripts/perf-budgets.yaml")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--machine-config", default="examples/machines/simple.json")
+    parser.add_argument("--autoinstall", default="examples/autoinstall/user-data.yaml")
+    parser.add_argument("--source-catalog", default="examples/sources/install.yaml")
+    parser.add_argument("--output", help="Also write the results as JSON here.")
+    args = parser.parse_args()
+
+    budget_config: dict = {}
+    if args.budgets:
+        with open(args.budgets) as fp:
+            budget_config = yaml.safe_load(fp) or {}
+
+    all_results: Dict[str, Dict[str, float]] = {}
+    failed = False
+    for scale in args.scale or ["inf"]:
+        results = asyncio.run(run_install(args, scale))
+        all_results[scale] = results
+        print(f"scale {scale}:")
+        for metric, value in results.items():
+            print(f"  {metric:22} {value:10.2f}")
+        failures = check_budgets(results, budgets_for(budget_config, scale))
+        for failure in failures:
+            print(f"  FAIL {failure}")
+        failed = failed or bool(failures)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(all_results, fp, indent=2)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
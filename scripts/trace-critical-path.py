@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""Summarize the critical path of an install trace.
+
+The trace is the trace.json written to /var/log/installer at the end of the
+install (or on demand with a POST to /meta/trace). Starting from the end of
+the trace, the critical path follows, at each level, the chain of child
+spans that were running last: the span that finished last, then the span
+that finished last before that one started, and so on. Making anything on
+this path faster makes the install faster; making anything off it faster
+does not.
+
+For each span on the path this prints its start offset, duration, share
+of the total and "self" time, i.e. the part of the duration not covered by
+its children on the path.
+"""
+
+import argparse
+import json
+from typing import List, Optional, Tuple
+
+# Timestamps are in microseconds and rounded to 0.1us in the trace.
+EPSILON = 1.0
+
+
+class Span:
+    def __init__(self, event: dict):
+        args = event.get("args", {})
+        self.id: Optional[int] = args.get("id")
+        self.parent_id: Optional[int] = args.get("parent_id")
+        self.name: str = args.get("full_name", event["name"])
+        self.start: float = event["ts"]
+        self.end: float = event["ts"] + event.get("dur", 0)
+        self.result: Optional[str] = args.get("result")
+        self.unfinished: bool = args.get("unfinished", False)
+        self.children: List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def load(path: str) -> Span:
+    with open(path) as fp:
+        data = json.load(fp)
+    if isinstance(data, dict):
+        events = data["traceEvents"]
+    else:
+        events = data
+    spans = [Span(event) for event in events if event.get("ph") == "X"]
+    if not spans:
+        raise SystemExit(f"{path}: no spans found")
+    by_id = {span.id: span for span in spans if span.id is not None}
+    root = Span({"name": "(install)", "ts": 0, "dur": 0})
+    root.start = min(span.start for span in spans)
+    root.end = max(span.end for span in spans)
+    for span in spans:
+        by_id.get(span.parent_id, root).children.append(span)
+    return root
+
+
+def critical_path(span: Span, depth: int = 0) -> List[Tuple[Span, int, float]]:
+    """Return (span, depth, self time) for each span on the critical path
+    through span, in start order."""
+    chain = []
+    t = span.end
+    for child in sorted(span.children, key=lambda c: c.end, reverse=True):
+        if child.end <= t + EPSILON and child.end > span.start:
+            chain.append(child)
+            t = child.start
+    chain.reverse()
+    self_time = span.duration - sum(child.duration for child in chain)
+    path = [(span, depth, max(self_time, 0.0))]
+    for child in chain:
+        path.extend(critical_path(child, depth + 1))
+    return path
+
+
+def fmt(us: float) -> str:
+    return f"{us / 1e6:9.3f}s"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description=__doc__,
+    )
+    parser.add_argument(
+        "--min-percent",
+        type=float,
+        default=0.5,
+        help="Hide spans (and their children) shorter than this "
+        "percentage of the total.",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Also list this many spans on the critical path with the "
+        "most self time (0 to disable).",
+    )
+    parser.add_argument("trace", help="path to trace.json")
+    args = parser.parse_args()
+
+    root = load(args.trace)
+    total = root.duration or 1.0
+    path = critical_path(root)
+
+    print(f"critical path of {args.trace}: {fmt(root.duration).strip()}")
+    print()
+    print(f"{'start':>10} {'duration':>10} {'%':>6} {'self':>10}  name")
+    hidden_depth = None
+    for span, depth, self_time in path:
+        if hidden_depth is not None:
+            if depth > hidden_depth:
+                continue
+            hidden_depth = None
+        if 100 * span.duration / total < args.min_percent:
+            hidden_depth = depth
+            continue
+        note = ""
+        if span.unfinished:
+            note = " (unfinished)"
+        elif span.result not in (None, "SUCCESS"):
+            note = f" ({span.result})"
+        print(
+            f"{fmt(span.start - root.start)} {fmt(span.duration)} "
+            f"{100 * span.duration / total:5.1f}% {fmt(self_time)}  "
+            f"{'  ' * depth}{span.name}{note}"
+        )
+
+    if args.top > 0:
+        print()
+        print(f"top {args.top} by self time:")
+        ranked = sorted(path[1:], key=lambda p: p[2], reverse=True)
+        for span, depth, self_time in ranked[: args.top]:
+            print(f"{fmt(self_time)} {100 * self_time / total:5.1f}%  {span.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -336,7 +336,7 @@ class SubiquityClient(TuiApplication):
                 return None
 
         self.client = make_client_for_conn(
-            API, conn, self.resp_hook, header_func=header_func
+            API, conn, self.resp_hook, header_func=header_func, compact=True
         )
         self.error_reporter.client = self.client
 
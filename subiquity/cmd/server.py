@@ -236,7 +236,12 @@ def main():
     logging.getLogger("curtin").addHandler(handler)
     logging.getLogger("block-discover").addHandler(handler)
 
-    logfiles = setup_logger(dir=logdir, base="subiquity-server")
+    logfiles = setup_logger(
+        dir=logdir,
+        base="subiquity-server",
+        background="subiquity-log-background" in opts.kernel_cmdline,
+        json_format=opts.kernel_cmdline.get("subiquity-log-format") == "json",
+    )
 
     logging.captureWarnings(True)
     logger = logging.getLogger("subiquity")
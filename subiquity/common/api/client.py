@@ -14,17 +14,24 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import contextlib
+import functools
 import inspect
 
 import aiohttp
 
 from subiquity.common.serialize import Serializer
 
-from .defs import Payload
+from .defs import WIRE_FORMAT_COMPACT, WIRE_FORMAT_HEADER, Payload
+
+# API definitions do not change, so there is no need to recompute their
+# signatures each time a client class is made for an endpoint.
+_signature = functools.lru_cache(maxsize=None)(inspect.signature)
+
+_default_serializer = Serializer()
 
 
 def _wrap(make_request, path, meth, serializer, serialize_query_args):
-    sig = inspect.signature(meth)
+    sig = _signature(meth)
     meth_params = sig.parameters
     payload_arg = None
     for name, param in meth_params.items():
@@ -48,7 +55,15 @@ def _wrap(make_request, path, meth, serializer, serialize_query_args):
             meth.__name__, path.format(**self.path_args), json=data, params=query_args
         ) as resp:
             resp.raise_for_status()
-            return serializer.deserialize(r_ann, await resp.json())
+            deserializer = serializer
+            if (
+                serializer.compact
+                and resp.headers.get(WIRE_FORMAT_HEADER) != WIRE_FORMAT_COMPACT
+            ):
+                # The server did not understand the request for the compact
+                # format and replied in the usual one.
+                deserializer = _default_serializer
+            return deserializer.deserialize(r_ann, await resp.json())
 
     return impl
 
@@ -99,8 +114,19 @@ def make_client(endpoint_cls, make_request, serializer=None, path_args=None):
 
 
 def make_client_for_conn(
-    endpoint_cls, conn, resp_hook=lambda r: r, serializer=None, header_func=None
+    endpoint_cls,
+    conn,
+    resp_hook=lambda r: r,
+    serializer=None,
+    header_func=None,
+    compact=False,
 ):
+    """Make a client for endpoint_cls that talks to a server over conn.
+
+    If compact is true, ask the server to use the compact wire format
+    (see WIRE_FORMAT_HEADER)."""
+    if compact and serializer is None:
+        serializer = Serializer(compact=True)
     session = aiohttp.ClientSession(connector=conn, connector_owner=False)
 
     @contextlib.asynccontextmanager
@@ -115,6 +141,9 @@ def make_client_for_conn(
             headers = header_func()
         else:
             headers = None
+        if compact:
+            headers = dict(headers or {})
+            headers[WIRE_FORMAT_HEADER] = WIRE_FORMAT_COMPACT
         async with session.request(
             method, url, json=json, params=params, headers=headers, timeout=0
         ) as response:
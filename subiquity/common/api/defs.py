@@ -89,6 +89,15 @@ def api(
     return cls
 
 
+# A client can send this header with the value WIRE_FORMAT_COMPACT to ask
+# the server to use the positional encoding of Serializer(compact=True)
+# for request bodies, query arguments and responses. The server echoes
+# the header back when it has done so. Requests without the header get
+# the usual encoding, so other clients are not affected.
+WIRE_FORMAT_HEADER = "x-wire-format"
+WIRE_FORMAT_COMPACT = "compact"
+
+
 T = typing.TypeVar("T")
 
 
@@ -116,3 +125,16 @@ def allowed_before_start(fun):
     want this."""
     fun.allowed_before_start = True
     return fun
+
+
+def coalesce(fun):
+    """A GET endpoint may mark itself as coalesce if concurrent identical
+    requests (same path, same query and same wire format) should share a
+    single call to the implementation and a single serialized response.
+    Only use this for endpoints that do not modify anything and where
+    returning the result of a call that started slightly earlier is
+    acceptable. As the call is shared, the implementation cannot take the
+    per-request context or request arguments; bind() refuses it if it
+    does."""
+    fun.coalesce = True
+    return fun
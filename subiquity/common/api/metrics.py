@@ -0,0 +1,155 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+import json
+from typing import Dict, List, Tuple
+
+from subiquity.common.serialize import Serializer
+from subiquity.common.types import APIRouteMetrics
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+LATENCY_BOUNDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RouteMetrics:
+    """Counters for a single (method, path) route of the API server."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.errors = 0
+        self.latency_buckets = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.latency_seconds = 0.0
+        self.deserialize_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def observe(
+        self,
+        *,
+        latency: float,
+        deserialize: float,
+        serialize: float,
+        request_bytes: int,
+        response_bytes: int,
+        error: bool,
+    ) -> None:
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.latency_buckets[bisect.bisect_left(LATENCY_BOUNDS, latency)] += 1
+        self.latency_seconds += latency
+        self.deserialize_seconds += deserialize
+        self.serialize_seconds += serialize
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+
+    def snapshot(self) -> APIRouteMetrics:
+        return APIRouteMetrics(
+            method=self.method,
+            path=self.path,
+            count=self.count,
+            errors=self.errors,
+            latency_bounds=list(LATENCY_BOUNDS),
+            latency_buckets=list(self.latency_buckets),
+            latency_seconds=self.latency_seconds,
+            deserialize_seconds=self.deserialize_seconds,
+            serialize_seconds=self.serialize_seconds,
+            request_bytes=self.request_bytes,
+            response_bytes=self.response_bytes,
+        )
+
+
+def _labels(route: APIRouteMetrics, **extra) -> str:
+    labels = {"method": route.method, "path": route.path, **extra}
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+class APIMetrics:
+    """Collection of RouteMetrics, one per route bound to the server."""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+    def for_route(self, method: str, path: str) -> RouteMetrics:
+        key = (method, path)
+        if key not in self._routes:
+            self._routes[key] = RouteMetrics(method, path)
+        return self._routes[key]
+
+    def snapshot(self) -> List[APIRouteMetrics]:
+        return [
+            route.snapshot()
+            for route in sorted(self._routes.values(), key=lambda r: r.path)
+            if route.count > 0
+        ]
+
+    def prometheus_text(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        routes = self.snapshot()
+        lines = []
+
+        def family(name, typ, help):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {typ}")
+
+        counters = [
+            ("requests_total", "count", "Number of requests handled."),
+            ("errors_total", "errors", "Number of requests that failed."),
+            (
+                "deserialize_seconds_total",
+                "deserialize_seconds",
+                "Time spent decoding request arguments.",
+            ),
+            (
+                "serialize_seconds_total",
+                "serialize_seconds",
+                "Time spent encoding responses.",
+            ),
+            ("request_bytes_total", "request_bytes", "Size of request bodies."),
+            ("response_bytes_total", "response_bytes", "Size of response bodies."),
+        ]
+        for suffix, attrname, help in counters:
+            name = f"subiquity_api_{suffix}"
+            family(name, "counter", help)
+            for route in routes:
+                lines.append(f"{name}{{{_labels(route)}}} {getattr(route, attrname)}")
+
+        name = "subiquity_api_request_duration_seconds"
+        family(name, "histogram", "Time taken to handle requests.")
+        for route in routes:
+            cumulative = 0
+            bounds = [str(b) for b in route.latency_bounds] + ["+Inf"]
+            for bound, n in zip(bounds, route.latency_buckets):
+                cumulative += n
+                lines.append(
+                    f"{name}_bucket{{{_labels(route, le=bound)}}} {cumulative}"
+                )
+            lines.append(f"{name}_sum{{{_labels(route)}}} {route.latency_seconds}")
+            lines.append(f"{name}_count{{{_labels(route)}}} {route.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        serializer = Serializer()
+        with open(path, "w") as fp:
+            json.dump(
+                serializer.serialize(List[APIRouteMetrics], self.snapshot()),
+                fp,
+                indent=2,
+            )
@@ -13,18 +13,23 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import functools
 import inspect
 import json
 import logging
 import os
+import time
 import traceback
+from typing import Any, Optional, Tuple
 
+import attr
 from aiohttp import web
 
 from subiquity.common.api.recoverable_error import RecoverableError
 from subiquity.common.serialize import Serializer
 
-from .defs import Payload
+from .defs import WIRE_FORMAT_COMPACT, WIRE_FORMAT_HEADER, Payload
 
 log = logging.getLogger("subiquity.common.api.server")
 
@@ -55,6 +60,18 @@ class SignatureMisatchError(BindError):
         )
 
 
+class CoalesceError(BindError):
+    def __init__(self, methname, extra_args):
+        self.methname = methname
+        self.extra_args = extra_args
+
+    def __str__(self):
+        return (
+            f"implementation of {self.methname} is coalesced, so it cannot "
+            f"take per-request arguments {self.extra_args}"
+        )
+
+
 def trim(text):
     if text is None:
         return ""
@@ -85,19 +102,59 @@ async def check_controllers_started(definition, controller, request):
     log.debug(f"{request.path} resuming")
 
 
-def _make_handler(
-    controller, definition, implementation, serializer, serialize_query_args
-):
-    def_sig = inspect.signature(definition)
-    def_ret_ann = def_sig.return_annotation
-    def_params = def_sig.parameters
+@attr.s(auto_attribs=True, frozen=True)
+class _RoutePlan:
+    """What a handler needs to know about an API definition."""
+
+    return_annotation: Any
+    data_arg: Optional[str]
+    data_annotation: Any
+    query_args_anns: Tuple[Tuple[str, Any, Any], ...]
 
-    impl_sig = inspect.signature(implementation)
-    impl_params = impl_sig.parameters
 
-    data_annotation = None
-    data_arg = None
+@functools.lru_cache(maxsize=None)
+def _route_plan(definition):
+    # This reads the definition's code object rather than calling
+    # inspect.signature, which is comparatively slow and would otherwise
+    # be called for every route on every server start.
+    code = definition.__code__
+    names = code.co_varnames[: code.co_argcount]
+    defaults = definition.__defaults__ or ()
+    defaults_by_name = dict(zip(names[len(names) - len(defaults) :], defaults))
+    anns = definition.__annotations__
+    data_arg = data_annotation = None
     query_args_anns = []
+    for name in names:
+        if name in ("request", "context"):
+            raise Exception(
+                "api method {} cannot have parameter called request or context".format(
+                    definition
+                )
+            )
+        ann = anns.get(name, inspect.Parameter.empty)
+        if getattr(ann, "__origin__", None) is Payload:
+            data_arg = name
+            data_annotation = ann.__args__[0]
+        else:
+            query_args_anns.append(
+                (name, ann, defaults_by_name.get(name, inspect.Parameter.empty))
+            )
+    return _RoutePlan(
+        return_annotation=anns.get("return", inspect.Signature.empty),
+        data_arg=data_arg,
+        data_annotation=data_annotation,
+        query_args_anns=tuple(query_args_anns),
+    )
+
+
+def check_signature(definition, implementation):
+    """Raise SignatureMisatchError if implementation does not match definition.
+
+    Path parameters are passed as str arguments and Payload[T] arguments
+    as T. The implementation may additionally accept "context" and/or
+    "request" arguments."""
+    def_sig = inspect.signature(definition)
+    impl_sig = inspect.signature(implementation)
 
     check_def_params = []
 
@@ -108,23 +165,16 @@ def _make_handler(
             )
         )
 
-    for param_name, param in def_params.items():
-        if param_name in ("request", "context"):
-            raise Exception(
-                "api method {} cannot have parameter called request or context".format(
-                    definition
-                )
-            )
+    for param in def_sig.parameters.values():
         if getattr(param.annotation, "__origin__", None) is Payload:
-            data_arg = param_name
-            data_annotation = param.annotation.__args__[0]
-            check_def_params.append(param.replace(annotation=data_annotation))
+            check_def_params.append(
+                param.replace(annotation=param.annotation.__args__[0])
+            )
         else:
-            query_args_anns.append((param_name, param.annotation, param.default))
             check_def_params.append(param)
 
     check_impl_params = [
-        p for p in impl_params.values() if p.name not in ("context", "request")
+        p for p in impl_sig.parameters.values() if p.name not in ("context", "request")
     ]
     check_impl_sig = impl_sig.replace(parameters=check_impl_params)
 
@@ -135,21 +185,107 @@ def _make_handler(
             definition.__qualname__, check_def_sig, check_impl_sig
         )
 
+
+def _extra_args(implementation):
+    # Which of "context" and "request" the implementation accepts.
+    func = inspect.unwrap(getattr(implementation, "__func__", implementation))
+    code = getattr(func, "__code__", None)
+    if code is None or hasattr(func, "__signature__"):
+        names = inspect.signature(implementation).parameters
+    else:
+        names = code.co_varnames[: code.co_argcount + code.co_kwonlyargcount]
+    return [name for name in ("context", "request") if name in names]
+
+
+def _make_handler(
+    controller,
+    definition,
+    implementation,
+    serializer,
+    serialize_query_args,
+    metrics=None,
+    check_signatures=True,
+    compact_serializer=None,
+):
+    plan = _route_plan(definition)
+    def_ret_ann = plan.return_annotation
+    data_arg = plan.data_arg
+    data_annotation = plan.data_annotation
+    query_args_anns = plan.query_args_anns
+
+    if check_signatures:
+        check_signature(definition, implementation)
+
+    extra_args = _extra_args(implementation)
+    coalesced = getattr(definition, "coalesce", False) and definition.__name__ == "GET"
+    if coalesced and extra_args:
+        # The shared call runs with the arguments of the first request,
+        # so it must not see that request's context or request object.
+        raise CoalesceError(definition.__qualname__, extra_args)
+
+    async def respond(args, ser):
+        result = await implementation(**args)
+        serialize_start = time.monotonic()
+        text = json.dumps(ser.serialize(def_ret_ann, result))
+        return text, time.monotonic() - serialize_start
+
+    in_flight = {}
+
+    def forget(key, task):
+        del in_flight[key]
+        # Make sure an exception is retrieved even if every request
+        # waiting for the task was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    async def coalesced_respond(request, args, ser):
+        key = (request.path_qs, ser)
+        task = in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(respond(args, ser))
+            in_flight[key] = task
+            task.add_done_callback(functools.partial(forget, key))
+            return await asyncio.shield(task)
+        log.debug("%s sharing in-flight request", request.path_qs)
+        handler.shared_requests += 1
+        text, _ = await asyncio.shield(task)
+        # Only the request that started the task is charged for serializing.
+        return text, 0.0
+
+    if coalesced:
+        respond_for_request = coalesced_respond
+    else:
+
+        async def respond_for_request(request, args, ser):
+            return await respond(args, ser)
+
     async def handler(request):
+        start = time.monotonic()
+        deserialize_time = serialize_time = 0.0
         context = controller.context.child(implementation.__name__)
+        # Set before entering so that the start event is also recognised as
+        # being for a request.
+        context.set("request", request)
         with context:
-            context.set("request", request)
             args = {}
+            headers = {"x-status": "ok"}
+            ser = serializer
+            if (
+                compact_serializer is not None
+                and request.headers.get(WIRE_FORMAT_HEADER) == WIRE_FORMAT_COMPACT
+            ):
+                ser = compact_serializer
+                headers[WIRE_FORMAT_HEADER] = WIRE_FORMAT_COMPACT
             try:
                 if data_annotation is not None:
-                    args[data_arg] = serializer.from_json(
+                    args[data_arg] = ser.from_json(
                         data_annotation, await request.text()
                     )
                 for arg, ann, default in query_args_anns:
                     if arg in request.query:
                         v = request.query[arg]
                         if serialize_query_args:
-                            v = serializer.from_json(ann, v)
+                            v = ser.from_json(ann, v)
                     elif default != inspect._empty:
                         v = default
                     else:
@@ -157,16 +293,14 @@ def _make_handler(
                     args[arg] = v
                 for param_name in definition.__path_params__:
                     args[param_name] = request.match_info[param_name]
-                if "context" in impl_params:
+                if "context" in extra_args:
                     args["context"] = context
-                if "request" in impl_params:
+                if "request" in extra_args:
                     args["request"] = request
+                deserialize_time = time.monotonic() - start
                 await check_controllers_started(definition, controller, request)
-                result = await implementation(**args)
-                resp = web.json_response(
-                    serializer.serialize(def_ret_ann, result),
-                    headers={"x-status": "ok"},
-                )
+                text, serialize_time = await respond_for_request(request, args, ser)
+                resp = web.json_response(text=text, headers=headers)
             except Exception as exc:
                 tb = traceback.TracebackException.from_exception(exc)
                 resp = web.Response(
@@ -183,9 +317,22 @@ def _make_handler(
                 )
                 resp["exception"] = exc
             context.description = "{} {}".format(resp.status, trim(resp.text))
+            if metrics is not None:
+                metrics.observe(
+                    latency=time.monotonic() - start,
+                    deserialize=deserialize_time,
+                    serialize=serialize_time,
+                    request_bytes=request.content_length or 0,
+                    response_bytes=len(resp.body or b""),
+                    error="exception" in resp,
+                )
             return resp
 
     handler.controller = controller
+    # The calls in flight for a coalesced route, and how many requests have
+    # shared one.
+    handler.in_flight = in_flight
+    handler.shared_requests = 0
 
     return handler
 
@@ -195,30 +342,97 @@ async def controller_for_request(request):
     return getattr(match_info.handler, "controller", None)
 
 
-def bind(router, endpoint, controller, serializer=None, _depth=None):
+def bind(
+    router,
+    endpoint,
+    controller,
+    serializer=None,
+    _depth=None,
+    *,
+    metrics=None,
+    check_signatures=True,
+    compact_serializer=None,
+):
+    """Add routes to router for the methods defined by endpoint.
+
+    If metrics (an APIMetrics instance) is passed, the handlers record
+    per-route request counts, timings and sizes into it.
+
+    Unless check_signatures is False, each implementation's signature is
+    checked against its definition and SignatureMisatchError raised if
+    they do not match. The check is fairly expensive so the server only
+    does it in dry-run mode; check_implementations covers it in tests.
+
+    compact_serializer is used for requests that ask for the compact wire
+    format (see WIRE_FORMAT_HEADER). By default it is a compact version of
+    serializer."""
     if serializer is None:
         serializer = Serializer()
+    if compact_serializer is None:
+        compact_serializer = Serializer(
+            compact=True, serialize_enums_by=serializer.serialize_enums_by
+        )
     if _depth is None:
         _depth = len(endpoint.fullname)
 
     for v in endpoint.__dict__.values():
         if isinstance(v, type):
-            bind(router, v, controller, serializer, _depth)
+            bind(
+                router,
+                v,
+                controller,
+                serializer,
+                _depth,
+                metrics=metrics,
+                check_signatures=check_signatures,
+                compact_serializer=compact_serializer,
+            )
         elif callable(v):
             method = v.__name__
             impl_name = "_".join(endpoint.fullname[_depth:] + (method,))
             if not hasattr(controller, impl_name):
                 raise MissingImplementationError(controller, impl_name)
             impl = getattr(controller, impl_name)
+            route_metrics = None
+            if metrics is not None:
+                route_metrics = metrics.for_route(method, endpoint.fullpath)
             router.add_route(
                 method=method,
                 path=endpoint.fullpath,
                 handler=_make_handler(
-                    controller, v, impl, serializer, endpoint.serialize_query_args
+                    controller,
+                    v,
+                    impl,
+                    serializer,
+                    endpoint.serialize_query_args,
+                    route_metrics,
+                    check_signatures,
+                    compact_serializer,
                 ),
             )
 
 
+def check_implementations(endpoint, controller, _depth=None):
+    """Check that controller implements all the methods defined by endpoint.
+
+    controller can be a class rather than an instance, so that this can be
+    called without having to construct the controller."""
+    if _depth is None:
+        _depth = len(endpoint.fullname)
+
+    for v in endpoint.__dict__.values():
+        if isinstance(v, type):
+            check_implementations(v, controller, _depth)
+        elif callable(v):
+            impl_name = "_".join(endpoint.fullname[_depth:] + (v.__name__,))
+            if not hasattr(controller, impl_name):
+                raise MissingImplementationError(controller, impl_name)
+            impl = getattr(controller, impl_name)
+            if isinstance(controller, type):
+                impl = functools.partial(impl, None)
+            check_signature(v, impl)
+
+
 async def make_server_at_path(socket_path, endpoint, controller, **kw):
     app = web.Application(**kw)
     bind(app.router, endpoint, controller)
@@ -16,6 +16,7 @@
 import contextlib
 import functools
 import unittest
+from typing import List
 
 import aiohttp
 import attr
@@ -23,11 +24,14 @@ from aiohttp import web
 
 from subiquity.common.api.client import make_client
 from subiquity.common.api.defs import (
+    WIRE_FORMAT_COMPACT,
+    WIRE_FORMAT_HEADER,
     MultiplePathParameters,
     Payload,
     api,
     path_parameter,
 )
+from subiquity.common.serialize import Serializer
 
 from .test_server import ControllerBase, makeTestClient
 
@@ -37,10 +41,22 @@ def make_request(client, method, path, *, params, json):
 
 
 @contextlib.asynccontextmanager
-async def makeE2EClient(api, impl, *, middlewares=(), make_request=make_request):
+async def makeE2EClient(
+    api, impl, *, middlewares=(), make_request=make_request, serializer=None
+):
     async with makeTestClient(api, impl, middlewares=middlewares) as client:
         mr = functools.partial(make_request, client)
-        yield make_client(api, mr)
+        yield make_client(api, mr, serializer)
+
+
+def make_compact_request(client, method, path, *, params, json):
+    return client.request(
+        method,
+        path,
+        params=params,
+        json=json,
+        headers={WIRE_FORMAT_HEADER: WIRE_FORMAT_COMPACT},
+    )
 
 
 class TestEndToEnd(unittest.IsolatedAsyncioTestCase):
@@ -161,6 +177,67 @@ class TestEndToEnd(unittest.IsolatedAsyncioTestCase):
             out = await client.doubler.POST(In(3))
             self.assertEqual(out.doubled, 6)
 
+    async def test_compact(self):
+        @attr.s(auto_attribs=True)
+        class In:
+            val: int
+            name: str
+
+        @attr.s(auto_attribs=True)
+        class Out:
+            doubled: int
+            names: List[str]
+
+        @api
+        class API:
+            class doubler:
+                def POST(data: Payload[In], repeat: int = 1) -> Out: ...
+
+        seen = []
+
+        class Impl(ControllerBase):
+            async def doubler_POST(self, data: In, request, repeat: int = 1) -> Out:
+                seen.append(await request.json())
+                return Out(doubled=data.val * 2, names=[data.name] * repeat)
+
+        async def custom_make_request(client, method, path, *, params, json):
+            async with make_compact_request(
+                client, method, path, params=params, json=json
+            ) as resp:
+                self.assertEqual(resp.headers[WIRE_FORMAT_HEADER], WIRE_FORMAT_COMPACT)
+                self.assertEqual(await resp.json(), [6, ["x", "x"]])
+                yield resp
+
+        async with makeE2EClient(
+            API,
+            Impl(),
+            make_request=contextlib.asynccontextmanager(custom_make_request),
+            serializer=Serializer(compact=True),
+        ) as client:
+            out = await client.doubler.POST(In(3, "x"), repeat=2)
+            self.assertEqual(out, Out(doubled=6, names=["x", "x"]))
+        self.assertEqual(seen, [[3, "x"]])
+
+    async def test_compact_not_negotiated(self):
+        # A client using the compact serializer copes with a server that
+        # replies in the default format.
+        @attr.s(auto_attribs=True)
+        class Out:
+            doubled: int
+
+        @api
+        class API:
+            def GET(val: int) -> Out: ...
+
+        class Impl(ControllerBase):
+            async def GET(self, val: int) -> Out:
+                return Out(doubled=val * 2)
+
+        async with makeE2EClient(
+            API, Impl(), serializer=Serializer(compact=True)
+        ) as client:
+            self.assertEqual(await client.GET(3), Out(doubled=6))
+
     async def test_middleware(self):
         @api
         class API:
@@ -0,0 +1,86 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import tempfile
+import unittest
+
+from subiquity.common.api.metrics import LATENCY_BOUNDS, APIMetrics
+
+
+def observe(route, latency, error=False):
+    route.observe(
+        latency=latency,
+        deserialize=0.001,
+        serialize=0.002,
+        request_bytes=10,
+        response_bytes=100,
+        error=error,
+    )
+
+
+class TestAPIMetrics(unittest.TestCase):
+    def test_for_route_is_stable(self):
+        metrics = APIMetrics()
+        self.assertIs(
+            metrics.for_route("GET", "/meta/status"),
+            metrics.for_route("GET", "/meta/status"),
+        )
+
+    def test_histogram(self):
+        metrics = APIMetrics()
+        route = metrics.for_route("GET", "/storage/v2")
+        observe(route, 0.0005)
+        observe(route, 0.003)
+        observe(route, 100, error=True)
+        [snapshot] = metrics.snapshot()
+        self.assertEqual(snapshot.count, 3)
+        self.assertEqual(snapshot.errors, 1)
+        self.assertEqual(snapshot.latency_buckets[0], 1)
+        self.assertEqual(snapshot.latency_buckets[1], 1)
+        self.assertEqual(snapshot.latency_buckets[len(LATENCY_BOUNDS)], 1)
+        self.assertEqual(snapshot.request_bytes, 30)
+        self.assertEqual(snapshot.response_bytes, 300)
+
+    def test_unused_routes_not_reported(self):
+        metrics = APIMetrics()
+        metrics.for_route("GET", "/meta/status")
+        self.assertEqual(metrics.snapshot(), [])
+
+    def test_prometheus_text(self):
+        metrics = APIMetrics()
+        route = metrics.for_route("GET", "/source")
+        observe(route, 0.02)
+        observe(route, 0.2)
+        text = metrics.prometheus_text()
+        labels = 'method="GET",path="/source"'
+        self.assertIn(f"subiquity_api_requests_total{{{labels}}} 2\n", text)
+        self.assertIn(f"subiquity_api_response_bytes_total{{{labels}}} 200\n", text)
+        bucket = "subiquity_api_request_duration_seconds_bucket"
+        self.assertIn(f'{bucket}{{{labels},le="0.025"}} 1\n', text)
+        self.assertIn(f'{bucket}{{{labels},le="0.25"}} 2\n', text)
+        self.assertIn(f'{bucket}{{{labels},le="+Inf"}} 2\n', text)
+
+    def test_dump(self):
+        metrics = APIMetrics()
+        observe(metrics.for_route("POST", "/identity"), 0.01)
+        with tempfile.TemporaryDirectory() as tdir:
+            path = os.path.join(tdir, "metrics.json")
+            metrics.dump(path)
+            with open(path) as fp:
+                [data] = json.load(fp)
+        self.assertEqual(data["path"], "/identity")
+        self.assertEqual(data["count"], 1)
@@ -13,6 +13,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 import contextlib
 import unittest
 from unittest import mock
@@ -20,8 +21,16 @@ from unittest import mock
 from aiohttp import web
 from aiohttp.test_utils import TestClient, TestServer
 
-from subiquity.common.api.defs import Payload, allowed_before_start, api, path_parameter
+from subiquity.common.api.defs import (
+    Payload,
+    allowed_before_start,
+    api,
+    coalesce,
+    path_parameter,
+)
+from subiquity.common.api.metrics import APIMetrics
 from subiquity.common.api.server import (
+    CoalesceError,
     MissingImplementationError,
     SignatureMisatchError,
     bind,
@@ -55,6 +64,23 @@ async def makeTestClient(api, impl, middlewares=()):
         yield client
 
 
+def route_handler(client, path):
+    for route in client.server.app.router.routes():
+        if route.method == "GET" and route.resource.canonical == path:
+            return route.handler
+
+
+async def wait_shared(client, path, n=1):
+    """Wait until n requests to path have joined an in-flight one."""
+    handler = route_handler(client, path)
+
+    async def shared():
+        while handler.shared_requests < n:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(shared(), 5)
+
+
 class TestBind(unittest.IsolatedAsyncioTestCase):
     async def assertResponse(self, coro, value):
         resp = await coro
@@ -306,3 +332,137 @@ class TestBind(unittest.IsolatedAsyncioTestCase):
         async with makeTestClient(API, impl) as client:
             await client.get("/must_not_be_used_early")
             impl.app.controllers_have_started.wait.assert_called_once()
+
+    async def test_metrics(self):
+        @api
+        class API:
+            class good:
+                def POST(data: Payload[str]) -> str: ...
+
+            class bad:
+                def GET() -> str: ...
+
+        class Impl(ControllerBase):
+            async def good_POST(self, data: str) -> str:
+                return data
+
+            async def bad_GET(self) -> str:
+                return 1 / 0
+
+        metrics = APIMetrics()
+        app = web.Application()
+        bind(app.router, API, Impl(), metrics=metrics)
+        async with TestClient(TestServer(app)) as client:
+            await self.assertResponse(client.post("/good", json="value"), "value")
+            await client.get("/bad")
+
+        good = metrics.for_route("POST", "/good")
+        self.assertEqual(good.count, 1)
+        self.assertEqual(good.errors, 0)
+        self.assertEqual(good.request_bytes, len(b'"value"'))
+        self.assertEqual(good.response_bytes, len(b'"value"'))
+        bad = metrics.for_route("GET", "/bad")
+        self.assertEqual(bad.count, 1)
+        self.assertEqual(bad.errors, 1)
+
+    async def test_coalesce(self):
+        @api
+        class API:
+            class shared:
+                @coalesce
+                def GET(arg: int) -> int: ...
+
+            class unshared:
+                def GET(arg: int) -> int: ...
+
+        class Impl(ControllerBase):
+            def __init__(self):
+                super().__init__()
+                self.calls = []
+                self.called = asyncio.Event()
+                self.release = asyncio.Event()
+
+            def call(self, *args):
+                self.calls.append(args)
+                if len(self.calls) == 4:
+                    self.called.set()
+
+            async def shared_GET(self, arg: int) -> int:
+                self.call("shared", arg)
+                await self.release.wait()
+                return len(self.calls)
+
+            async def unshared_GET(self, arg: int) -> int:
+                self.call("unshared", arg)
+                await self.release.wait()
+                return len(self.calls)
+
+        impl = Impl()
+        async with makeTestClient(API, impl) as client:
+
+            async def get(path, arg):
+                resp = await client.get(path, params={"arg": str(arg)})
+                return await resp.json()
+
+            tasks = [
+                asyncio.create_task(get("/shared", 1)),
+                asyncio.create_task(get("/shared", 1)),
+                asyncio.create_task(get("/shared", 2)),
+                asyncio.create_task(get("/unshared", 1)),
+                asyncio.create_task(get("/unshared", 1)),
+            ]
+            # Release the calls once all of them have been made and the
+            # duplicate request is waiting for the shared one.
+            await asyncio.wait_for(impl.called.wait(), 5)
+            await wait_shared(client, "/shared")
+            impl.release.set()
+            await asyncio.wait_for(asyncio.gather(*tasks), 5)
+            self.assertEqual(
+                sorted(impl.calls),
+                [("shared", 1), ("shared", 2), ("unshared", 1), ("unshared", 1)],
+            )
+            # The first two requests got the same response.
+            self.assertEqual(tasks[0].result(), tasks[1].result())
+
+            # Once the shared call has completed, a new request calls the
+            # implementation again.
+            await self.assertResponse(client.get("/shared", params={"arg": "1"}), 5)
+
+    async def test_coalesce_error(self):
+        @api
+        class API:
+            @coalesce
+            def GET() -> int: ...
+
+        class Impl(ControllerBase):
+            def __init__(self):
+                super().__init__()
+                self.release = asyncio.Event()
+
+            async def GET(self) -> int:
+                await self.release.wait()
+                return 1 / 0
+
+        impl = Impl()
+        async with makeTestClient(API, impl) as client:
+            tasks = [asyncio.create_task(client.get("/")) for i in range(2)]
+            await wait_shared(client, "/")
+            impl.release.set()
+            for resp in await asyncio.wait_for(asyncio.gather(*tasks), 5):
+                self.assertEqual(resp.status, 500)
+                self.assertEqual(resp.headers["x-error-type"], "ZeroDivisionError")
+            self.assertEqual(route_handler(client, "/").in_flight, {})
+
+    async def test_coalesce_rejects_request_args(self):
+        @api
+        class API:
+            @coalesce
+            def GET() -> int: ...
+
+        class Impl(ControllerBase):
+            async def GET(self, context) -> int:
+                return 1
+
+        with self.assertRaises(CoalesceError):
+            async with makeTestClient(API, Impl()):
+                pass
@@ -20,6 +20,7 @@ from subiquity.common.api.defs import (
     Payload,
     allowed_before_start,
     api,
+    coalesce,
     simple_endpoint,
 )
 from subiquity.common.types import (
@@ -29,6 +30,7 @@ from subiquity.common.types import (
     AdJoinResult,
     AdPasswordValidation,
     AnyStep,
+    APIRouteMetrics,
     ApplicationState,
     ApplicationStatus,
     CasperMd5Results,
@@ -50,6 +52,7 @@ from subiquity.common.types import (
     OEMResponse,
     PackageInstallState,
     RefreshStatus,
+    ReportingEventPage,
     ShutdownMode,
     SnapInfo,
     SnapListResponse,
@@ -135,6 +138,49 @@ class API:
         class interactive_sections:
             def GET() -> Optional[List[str]]: ...
 
+        class metrics:
+            @allowed_before_start
+            def GET() -> List[APIRouteMetrics]:
+                """Get per-route request counts, latencies and sizes.
+
+                The same data is available in the Prometheus text format at
+                /meta/metrics/prometheus."""
+
+        class events:
+            @allowed_before_start
+            def GET(
+                since: int = 0, limit: int = 1000, wait: float = 0
+            ) -> ReportingEventPage:
+                """Get recent reporting events with an id greater than since.
+
+                Pass the last value of the result as since to get the
+                following events. If there are none yet, wait up to wait
+                seconds (at most 60) for one to be reported. Only the most
+                recent events are kept; missed counts the ones no longer
+                available."""
+
+        class profile:
+            @allowed_before_start
+            def GET() -> bool:
+                """Is the sampling profiler running?"""
+
+            @allowed_before_start
+            def POST(enable: bool, interval: float = 0.01) -> Optional[str]:
+                """Start or stop the sampling profiler.
+
+                When stopping, the samples are written as collapsed stacks
+                (the input format of flamegraph.pl) to the block log dir
+                and the path is returned."""
+
+        class trace:
+            @allowed_before_start
+            def POST() -> Optional[str]:
+                """Write the timeline of the install so far to trace.json.
+
+                The file is in the Chrome trace event format, which can be
+                loaded in Perfetto or chrome://tracing. Returns the path
+                written, or None if writing failed."""
+
     class errors:
         class wait:
             def GET(error_ref: ErrorReportRef) -> ErrorReportRef:
@@ -306,6 +352,7 @@ class API:
                 """
 
         class v2:
+            @coalesce
             def GET(
                 wait: bool = False,
                 include_raid: bool = False,
@@ -317,6 +364,7 @@ class API:
                 def GET() -> StorageResponseV2: ...
 
             class guided:
+                @coalesce
                 def GET(wait: bool = False) -> GuidedStorageResponseV2: ...
 
                 def POST(data: Payload[GuidedChoiceV2]) -> GuidedStorageResponseV2: ...
@@ -413,6 +461,7 @@ class API:
         def GET(wait: bool = False) -> OEMResponse: ...
 
     class snaplist:
+        @coalesce
         def GET(wait: bool = False) -> SnapListResponse: ...
 
         def POST(data: Payload[List[SnapSelection]]): ...
@@ -50,22 +50,70 @@ class NonExhaustive(typing.Generic[E]):
     pass
 
 
-@attr.s(auto_attribs=True)
+_NO_KEY = object()
+
+
 class SerializationContext:
-    obj: typing.Any
-    cur: typing.Any
-    path: str
-    metadata: typing.Optional[typing.Dict]
-    serializing: bool
+    """Where the serializer is up to in walking obj.
+
+    Each context points at its parent and knows only its own segment of
+    the path (a format string and the key to format into it). The full
+    path is only built when it is needed, i.e. when reporting an error.
+
+    Walking a list, dict or attr class creates one child with slot() and
+    moves it from sibling to sibling with move(), rather than creating a
+    context for every value. This is fine because contexts are only used
+    for the duration of the walk.
+    """
+
+    __slots__ = ("obj", "cur", "parent", "fmt", "key", "metadata", "serializing")
+
+    def __init__(self, obj, cur, parent, fmt, key, metadata, serializing):
+        self.obj = obj
+        self.cur = cur
+        self.parent = parent
+        self.fmt = fmt
+        self.key = key
+        self.metadata = metadata
+        self.serializing = serializing
 
     @classmethod
     def new(cls, obj, *, serializing):
-        return SerializationContext(obj, obj, "", {}, serializing)
+        return cls(obj, obj, None, "", _NO_KEY, {}, serializing)
+
+    @property
+    def path(self):
+        segments = []
+        context = self
+        while context is not None:
+            if context.key is _NO_KEY:
+                segments.append(context.fmt)
+            else:
+                segments.append(context.fmt.format(context.key))
+            context = context.parent
+        return "".join(reversed(segments))
 
     def child(self, path, cur, metadata=None):
         if metadata is None:
             metadata = self.metadata
-        return attr.evolve(self, path=self.path + path, cur=cur, metadata=metadata)
+        return SerializationContext(
+            self.obj, cur, self, path, _NO_KEY, metadata, self.serializing
+        )
+
+    def slot(self, fmt):
+        """Return a child context whose path segment is fmt.format(key).
+
+        Call move() to point it at a value before using it."""
+        return SerializationContext(
+            self.obj, None, self, fmt, _NO_KEY, self.metadata, self.serializing
+        )
+
+    def move(self, key, cur, metadata=None):
+        self.key = key
+        self.cur = cur
+        if metadata is not None:
+            self.metadata = metadata
+        return self
 
     def error(self, message):
         raise SerializationError(self.obj, self.path, message)
@@ -161,9 +209,9 @@ class Serializer:
         raise context.error(f"cannot serialize Union[{args}]")
 
     def _walk_List(self, meth, args, context):
-        return [
-            meth(args[0], context.child(f"[{i}]", v)) for i, v in enumerate(context.cur)
-        ]
+        [ann] = args
+        child = context.slot("[{}]")
+        return [meth(ann, child.move(i, v)) for i, v in enumerate(context.cur)]
 
     def _walk_Dict(self, meth, args, context):
         k_ann, v_ann = args
@@ -173,10 +221,12 @@ class Serializer:
             input_items = context.cur.items()
         else:
             input_items = context.cur
+        k_child = context.slot("/{}")
+        v_child = context.slot("[{}]")
         output_items = [
             [
-                meth(k_ann, context.child(f"/{k}", k)),
-                meth(v_ann, context.child(f"[{k}]", v)),
+                meth(k_ann, k_child.move(k, k)),
+                meth(v_ann, v_child.move(k, v)),
             ]
             for k, v in input_items
         ]
@@ -202,8 +252,9 @@ class Serializer:
 
     def _serialize_dict(self, annotation, context):
         context.assert_type(annotation)
+        child = context.slot("/{}")
         for k in context.cur:
-            context.child(f"/{k}", k).assert_type(str)
+            child.move(k, k).assert_type(str)
         return context.cur
 
     def _serialize_datetime(self, annotation, context):
@@ -216,16 +267,15 @@ class Serializer:
 
     def _serialize_attr(self, annotation, context):
         serialized = []
+        child = context.slot(".{}")
         for field in attr.fields(annotation):
             serialized.append(
                 (
                     _field_name(field),
                     self._serialize(
                         field.type,
-                        context.child(
-                            f".{field.name}",
-                            getattr(context.cur, field.name),
-                            field.metadata,
+                        child.move(
+                            field.name, getattr(context.cur, field.name), field.metadata
                         ),
                     ),
                 )
@@ -274,11 +324,11 @@ class Serializer:
         if self.compact:
             context.assert_type(list)
             args = []
+            child = context.slot("[{!r}]")
             for field, value in zip(attr.fields(annotation), context.cur):
                 args.append(
                     self._deserialize(
-                        field.type,
-                        context.child(f"[{field.name!r}]", value, field.metadata),
+                        field.type, child.move(field.name, value, field.metadata)
                     )
                 )
             return annotation(*args)
@@ -286,6 +336,7 @@ class Serializer:
             context.assert_type(dict)
             args = {}
             fields = {_field_name(field): field for field in attr.fields(annotation)}
+            child = context.slot("[{!r}]")
             for key, value in context.cur.items():
                 if key not in fields and (key == "$type" or self.ignore_unknown_fields):
                     # Union types can contain a '$type' field that is not
@@ -296,7 +347,7 @@ class Serializer:
                     continue
                 field = fields[key]
                 args[field.name] = self._deserialize(
-                    field.type, context.child(f"[{key!r}]", value, field.metadata)
+                    field.type, child.move(key, value, field.metadata)
                 )
             return annotation(**args)
 
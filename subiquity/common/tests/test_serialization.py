@@ -288,6 +288,25 @@ class TestSerializer(CommonSerializerTests, unittest.TestCase):
             self.serializer.deserialize(Type, {"field-1": 1, "field2": 2})
         self.assertEqual(catcher.exception.path, "['field-1']")
 
+    def test_error_paths_nested(self):
+        @attr.s(auto_attribs=True)
+        class Type:
+            field1: str
+            field2: int
+
+        with self.assertRaises(SerializationError) as catcher:
+            self.serializer.serialize(
+                typing.Dict[str, typing.List[Type]],
+                {"a": [Type("x", 1)], "b": [Type("y", 2), Type(3, 4)]},
+            )
+        self.assertEqual(catcher.exception.path, "[b][1].field1")
+        with self.assertRaises(SerializationError) as catcher:
+            self.serializer.deserialize(
+                typing.List[Type],
+                [{"field1": "x", "field2": 1}, {"field1": "y", "field2": "z"}],
+            )
+        self.assertEqual(catcher.exception.path, "[1]['field2']")
+
     def test_serialize_dict_enumkeys_name(self):
         self.assertSerialization(
             typing.Dict[MyEnum, str], {MyEnum.name: "b"}, {"name": "b"}
@@ -133,6 +133,47 @@ class LiveSessionSSHInfo:
     host_key_fingerprints: List[KeyFingerprint]
 
 
+@attr.s(auto_attribs=True)
+class APIRouteMetrics:
+    method: str
+    path: str
+    count: int
+    errors: int
+    # latency_buckets[i] counts the requests that took at most
+    # latency_bounds[i] seconds (the final bucket is unbounded).
+    latency_bounds: List[float]
+    latency_buckets: List[int]
+    latency_seconds: float
+    deserialize_seconds: float
+    serialize_seconds: float
+    request_bytes: int
+    response_bytes: int
+
+
+@attr.s(auto_attribs=True)
+class ReportingEvent:
+    # Events are numbered consecutively from 1.
+    id: int
+    timestamp: float
+    event_type: str
+    context_id: int
+    context_parent_id: Optional[int]
+    context_name: str
+    level: str
+    description: str
+    result: Optional[str] = None
+
+
+@attr.s(auto_attribs=True)
+class ReportingEventPage:
+    events: List[ReportingEvent]
+    # The id of the last event in events (or the since value passed, if
+    # there are none); pass this as since to get the events that follow.
+    last: int
+    # The number of events after since that are no longer in the history.
+    missed: int
+
+
 class RefreshCheckState(enum.Enum):
     UNKNOWN = enum.auto()
     AVAILABLE = enum.auto()
@@ -15,11 +15,16 @@
 
 import asyncio
 import contextlib
+import logging
+import queue
+import threading
 
 from systemd import journal
 
+log = logging.getLogger("subiquity.journald")
 
-def journald_listen(identifiers, callback, seek=False):
+
+def _make_reader(identifiers, seek):
     reader = journal.Reader()
     args = []
     for identifier in identifiers:
@@ -32,6 +37,12 @@ def journald_listen(identifiers, callback, seek=False):
     if seek:
         reader.seek_tail()
 
+    return reader
+
+
+def journald_listen(identifiers, callback, seek=False):
+    reader = _make_reader(identifiers, seek)
+
     def watch():
         if reader.process() != journal.APPEND:
             return
@@ -43,6 +54,81 @@ def journald_listen(identifiers, callback, seek=False):
     return reader.fileno()
 
 
+class JournalListener:
+    """Read journal entries in a thread and pass them on in batches.
+
+    The entries matching identifiers (as for journald_listen) are read in
+    a worker thread and handed to callback, on the event loop that was
+    running when the listener was created, as a list of dicts. Only one
+    call is scheduled on the loop per batch, however many entries it
+    has. If fields is passed, each entry is cut down to those fields;
+    a name ending in "_" matches every field starting with it (e.g.
+    "CURTIN_").
+    """
+
+    poll_interval = 0.5
+    max_batch = 1000
+
+    def __init__(self, identifiers, callback, *, fields=None, seek=False):
+        self._callback = callback
+        self._fields = fields
+        if fields is not None:
+            self._names = frozenset(f for f in fields if not f.endswith("_"))
+            self._prefixes = tuple(f for f in fields if f.endswith("_"))
+        self._loop = asyncio.get_running_loop()
+        self._closed = False
+        self._reader = _make_reader(identifiers, seek)
+        self._thread = threading.Thread(
+            target=self._run, name="journal-listener", daemon=True
+        )
+        self._thread.start()
+
+    def _filter(self, entry):
+        if self._fields is None:
+            return entry
+        return {
+            k: v
+            for k, v in entry.items()
+            if k in self._names or k.startswith(self._prefixes)
+        }
+
+    def _deliver(self, batch):
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, batch)
+        except RuntimeError:
+            # The loop has been closed.
+            self._closed = True
+
+    def _dispatch(self, batch):
+        if not self._closed:
+            self._callback(batch)
+
+    def _run(self):
+        reader = self._reader
+        try:
+            while not self._closed:
+                if reader.wait(self.poll_interval) != journal.APPEND:
+                    continue
+                batch = []
+                for entry in reader:
+                    batch.append(self._filter(entry))
+                    if len(batch) >= self.max_batch:
+                        self._deliver(batch)
+                        batch = []
+                if batch:
+                    self._deliver(batch)
+        finally:
+            reader.close()
+
+    def close(self):
+        """Stop delivering entries. The thread exits shortly after."""
+        self._closed = True
+
+
+def journald_listen_batched(identifiers, callback, *, fields=None, seek=False):
+    return JournalListener(identifiers, callback, fields=fields, seek=seek)
+
+
 @contextlib.contextmanager
 def journald_subscriptions(ids_callbacks, seek=False):
     fds = set()
@@ -67,3 +153,49 @@ async def journald_get_first_match(*identifiers, seek=False):
     with journald_subscriptions(((identifiers, cb),), seek=seek):
         await found.wait()
     return event
+
+
+class JournalWriter:
+    """Send messages to the journal from a dedicated thread.
+
+    send() takes the same arguments as journal.send but, once the writer
+    has been started, only puts the message on a queue, so the caller
+    (usually the event loop) does not wait for journald. Messages are
+    sent in the order they were queued. Before start() and after close()
+    messages are sent directly.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="journal-writer", daemon=True
+        )
+        self._thread.start()
+
+    def send(self, message, **fields):
+        if self._thread is None:
+            journal.send(message, **fields)
+        else:
+            self._queue.put((message, fields))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            message, fields = item
+            try:
+                journal.send(message, **fields)
+            except Exception:
+                log.exception("sending %r to the journal failed", message)
+
+    def close(self):
+        """Send any queued messages and stop the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
@@ -1660,7 +1660,13 @@ class FilesystemModel:
                 continue
             majmin_to_dev[f"{major}:{minor}"] = obj
 
-        log.debug("majmin_to_dev %s", majmin_to_dev)
+        if log.isEnabledFor(logging.DEBUG):
+            # The full objects are in the storage config logged elsewhere,
+            # their ids are enough here and much cheaper to format.
+            log.debug(
+                "majmin_to_dev %s",
+                {majmin: obj.id for majmin, obj in majmin_to_dev.items()},
+            )
 
         mounts = list(self._probe_data.get("mount", []))
         while mounts:
@@ -16,6 +16,7 @@
 import asyncio
 import contextlib
 import enum
+import functools
 import io
 import logging
 import pathlib
@@ -30,6 +31,7 @@ import apt_pkg
 from curtin.commands.extract import AbstractSourceHandler
 from curtin.config import merge_config
 
+from subiquity.server.apt_lists import AptListsCache
 from subiquity.server.curtin import run_curtin_command
 from subiquity.server.mounter import (
     DryRunMounter,
@@ -38,7 +40,8 @@ from subiquity.server.mounter import (
     OverlayCleanupError,
     OverlayMountpoint,
 )
-from subiquitycore.file_util import generate_config_yaml, write_file
+from subiquitycore.async_helpers import run_in_thread
+from subiquitycore.file_util import copy_tree, generate_config_yaml, write_file
 from subiquitycore.lsb_release import lsb_release
 from subiquitycore.utils import astart_command, orig_environ
 
@@ -113,6 +116,11 @@ class AptConfigurer:
     # 3. If the network is working, run apt-get update in the installed
     #    system, or if it is not, just copy /var/lib/apt/lists from the
     #    'configured_tree' overlay.
+    #
+    # Each apt-get update run along the way (the mirror check, the one in
+    # the install overlay and the one in the installed system) starts from
+    # the lists the previous ones fetched, kept in an AptListsCache, so
+    # that apt only has to fetch what changed.
 
     def __init__(self, app, mounter: Mounter, source_handler: AbstractSourceHandler):
         self.app = app
@@ -122,6 +130,7 @@ class AptConfigurer:
         self.configured_tree: Optional[OverlayMountpoint] = None
         self.install_tree: Optional[OverlayMountpoint] = None
         self.install_mount = None
+        self.lists_cache = AptListsCache(app)
 
     @property
     def source_path(self):
@@ -184,6 +193,16 @@ class AptConfigurer:
             "Cache::SrcPkgCache": None,
         }
 
+        # The check only fetches the Release files, so only those are worth
+        # restoring.
+        await run_in_thread(
+            functools.partial(
+                self.lists_cache.restore,
+                str(apt_dirs["State::Lists"]),
+                release_only=True,
+            )
+        )
+
         # Need to ensure the "partial" directory exists.
         partial_dir = apt_dirs["State::Lists"] / "partial"
         partial_dir.mkdir(parents=True, exist_ok=True)
@@ -234,6 +253,14 @@ class AptConfigurer:
         if returncode != 0:
             raise AptConfigCheckError
 
+        await run_in_thread(
+            functools.partial(
+                self.lists_cache.save,
+                str(apt_dirs["State::Lists"]),
+                release_only=True,
+            )
+        )
+
     async def configure_for_install(self, context):
         assert self.configured_tree is not None
 
@@ -267,6 +294,9 @@ class AptConfigurer:
         apt_lists = self.install_tree.pp("var/lib/apt/lists")
         if apt_lists.exists():
             shutil.rmtree(str(apt_lists))
+        # The point of the workaround is that this update starts from no
+        # lists at all, so do not seed it from the cache. The lists it
+        # fetches do seed the update in the target though.
 
         await run_curtin_command(
             self.app,
@@ -279,6 +309,7 @@ class AptConfigurer:
             "update",
             private_mounts=True,
         )
+        await run_in_thread(self.lists_cache.save, str(apt_lists))
 
         return self.install_tree.p()
 
@@ -317,13 +348,8 @@ class AptConfigurer:
 
         async def _restore_dir(dir):
             shutil.rmtree(target_mnt.p(dir))
-            await self.app.command_runner.run(
-                [
-                    "cp",
-                    "-aT",
-                    self.configured_tree.p(dir),
-                    target_mnt.p(dir),
-                ]
+            await run_in_thread(
+                copy_tree, self.configured_tree.p(dir), target_mnt.p(dir)
             )
 
         def _restore_file(path: str) -> None:
@@ -340,6 +366,8 @@ class AptConfigurer:
             _restore_file("etc/apt/apt.conf.d/90curtin-aptproxy")
 
         if self.app.base_model.network.has_network:
+            apt_lists = target_mnt.p("var/lib/apt/lists")
+            await run_in_thread(self.lists_cache.restore, apt_lists)
             await run_curtin_command(
                 self.app,
                 context,
@@ -0,0 +1,190 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict
+
+from subiquitycore.file_util import copy_file, write_file
+
+log = logging.getLogger("subiquity.server.apt_lists")
+
+RELEASE_SUFFIXES = ("_InRelease", "_Release", "_Release.gpg")
+
+
+def _list_files(lists_dir: str) -> Dict[str, os.stat_result]:
+    files = {}
+    with os.scandir(lists_dir) as entries:
+        for entry in entries:
+            if entry.name == "lock" or not entry.is_file(follow_symlinks=False):
+                continue
+            files[entry.name] = entry.stat(follow_symlinks=False)
+    return files
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fp:
+        while chunk := fp.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class AptListsCache:
+    """A cache of the files apt-get update downloads to /var/lib/apt/lists,
+    shared between the overlay the mirror is checked in, the overlay the
+    install runs in and the target system.
+
+    apt already names each list file after the source, suite and component
+    it was fetched for, so the cache is an index from those names to the
+    hash of the content, plus the mtime apt gave the file, and a directory
+    of objects named by hash (so the same lists used by several trees are
+    only stored once).
+
+    Seeding a tree's lists from the cache before running apt-get update
+    there lets apt do what it does with lists from a previous update: it
+    sends If-Modified-Since, based on the mtime of the files, for the
+    Release files and, when the Release file has changed, fetches pdiffs
+    to bring the indices up to date rather than fetching them again. Every
+    file is still verified against the signed Release file, so a stale
+    cache can cost a download but never be trusted blindly.
+
+    The cache lives in /run, so it is bounded by max_size, and a save
+    replaces the lists it holds rather than adding to them."""
+
+    max_size = 256 << 20
+
+    # Saves and restores run in threads, for any number of AptConfigurers,
+    # and all of them share the directory.
+    _lock = threading.Lock()
+
+    def __init__(self, app):
+        self.app = app
+
+    @property
+    def dir(self) -> str:
+        return self.app.state_path("apt-lists")
+
+    def _object(self, sha256: str) -> str:
+        return os.path.join(self.dir, "objects", sha256)
+
+    def _load_index(self) -> Dict[str, Dict[str, int]]:
+        try:
+            with open(os.path.join(self.dir, "index.json")) as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            log.exception("reading apt lists cache index failed")
+            return {}
+
+    def restore(self, lists_dir: str, *, release_only: bool = False) -> int:
+        """Copy the cached lists into lists_dir, replacing files already
+        there. If release_only is True, only copy Release files. Returns the
+        number of files copied."""
+        with self._lock:
+            return self._restore(lists_dir, release_only)
+
+    def _restore(self, lists_dir: str, release_only: bool) -> int:
+        os.makedirs(lists_dir, exist_ok=True)
+        count = 0
+        for name, entry in self._load_index().items():
+            if release_only and not name.endswith(RELEASE_SUFFIXES):
+                continue
+            dst = os.path.join(lists_dir, name)
+            try:
+                copy_file(self._object(entry["sha256"]), dst)
+                os.utime(dst, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            except OSError as exc:
+                log.warning("restoring %s from apt lists cache failed: %r", name, exc)
+                continue
+            count += 1
+        log.debug("restored %d files from apt lists cache to %s", count, lists_dir)
+        return count
+
+    def save(self, lists_dir: str, *, release_only: bool = False) -> None:
+        """Make the lists in lists_dir the cached lists. apt-get update
+        removes the lists of sources that are no longer configured, so any
+        other cached lists are dropped. If release_only is True, only the
+        Release files are replaced, as the other lists were not fetched.
+        Lists that do not fit in max_size are left out, Release files
+        last."""
+        with self._lock:
+            self._save(lists_dir, release_only)
+
+    def _save(self, lists_dir: str, release_only: bool) -> None:
+        try:
+            files = _list_files(lists_dir)
+        except FileNotFoundError:
+            return
+        cached = self._load_index()
+        index = {}
+        if release_only:
+            files = {n: st for n, st in files.items() if n.endswith(RELEASE_SUFFIXES)}
+            index = {
+                n: e for n, e in cached.items() if not n.endswith(RELEASE_SUFFIXES)
+            }
+        size = sum(entry["size"] for entry in index.values())
+        objects = os.path.join(self.dir, "objects")
+        os.makedirs(objects, exist_ok=True)
+        for name, st in sorted(
+            files.items(), key=lambda item: not item[0].endswith(RELEASE_SUFFIXES)
+        ):
+            if size + st.st_size > self.max_size:
+                log.debug("apt lists cache is full, leaving out %s", name)
+                continue
+            entry = cached.get(name)
+            if (
+                entry is None
+                or entry["size"] != st.st_size
+                or entry["mtime_ns"] != st.st_mtime_ns
+                or not os.path.exists(self._object(entry["sha256"]))
+            ):
+                path = os.path.join(lists_dir, name)
+                try:
+                    entry = {
+                        "sha256": self._add_object(path),
+                        "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns,
+                    }
+                except OSError as exc:
+                    log.warning("adding %s to apt lists cache failed: %r", name, exc)
+                    continue
+            index[name] = entry
+            size += st.st_size
+        write_file(os.path.join(self.dir, "index.json"), json.dumps(index))
+        # Drop the objects no list refers to any more.
+        referenced = {entry["sha256"] for entry in index.values()}
+        for name in os.listdir(objects):
+            if name not in referenced:
+                os.unlink(os.path.join(objects, name))
+
+    def _add_object(self, path: str) -> str:
+        sha256 = _sha256(path)
+        obj = self._object(sha256)
+        if not os.path.exists(obj):
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(obj), prefix=".tmp-")
+            os.close(fd)
+            try:
+                copy_file(path, tmp)
+                os.rename(tmp, obj)
+            except OSError:
+                os.unlink(tmp)
+                raise
+        return sha256
@@ -0,0 +1,92 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Any, List
+
+from subiquitycore.file_util import write_file
+
+log = logging.getLogger("subiquity.server.checkpoints")
+
+
+class InstallCheckpoints:
+    """Records which steps of the install have completed, so that a server
+    restarted during the install can skip them rather than, for example,
+    partitioning and extracting the source again.
+
+    Checkpoints are kept in the state dir with a key, a hash of the rendered
+    configuration, and are discarded when the install is started with a
+    different configuration. The state dir does not survive a reboot, so
+    the target filesystems are still mounted whenever there are checkpoints
+    to resume from. The directory is also where curtin keeps its resume
+    data."""
+
+    def __init__(self, app):
+        self.app = app
+        self.key = None
+        self.steps: List[str] = []
+
+    @property
+    def dir(self) -> str:
+        return self.app.state_path("install")
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.dir, *parts)
+
+    @staticmethod
+    def make_key(config: Any) -> str:
+        data = json.dumps(config, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> bool:
+        """Load the checkpoints recorded for key, discarding any recorded
+        for a different key. Returns True if there are steps to skip."""
+        self.key = key
+        self.steps = []
+        try:
+            with open(self.path("checkpoints.json")) as fp:
+                data = json.load(fp)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError):
+            log.exception("reading install checkpoints failed")
+            data = None
+        if data is not None and data.get("key") == key:
+            self.steps = data["steps"]
+        else:
+            shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+        if self.steps:
+            log.info("resuming install, completed steps: %s", self.steps)
+        return bool(self.steps)
+
+    def done(self, step: str) -> bool:
+        return step in self.steps
+
+    def mark(self, *steps: str) -> None:
+        if self.key is None:
+            # Not loaded, so not an install that can be resumed.
+            return
+        for step in steps:
+            if step not in self.steps:
+                self.steps.append(step)
+        write_file(
+            self.path("checkpoints.json"),
+            json.dumps({"key": self.key, "steps": self.steps}),
+        )
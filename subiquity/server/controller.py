@@ -182,7 +182,13 @@ class SubiquityController(BaseController):
 
     def add_routes(self, app):
         if self.endpoint is not None:
-            bind(app.router, self.endpoint, self)
+            bind(
+                app.router,
+                self.endpoint,
+                self,
+                metrics=self.app.api_metrics,
+                check_signatures=self.app.opts.dry_run,
+            )
 
 
 class NonInteractiveController(SubiquityController):
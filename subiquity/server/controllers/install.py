@@ -24,7 +24,6 @@ import re
 import shlex
 import shutil
 import subprocess
-import tempfile
 import uuid
 from pathlib import Path
 from typing import Any, Dict, List, Optional
@@ -36,16 +35,21 @@ from curtin.distro import list_kernels
 from subiquity.common.errorreport import ErrorReportKind
 from subiquity.common.pkg import TargetPkg
 from subiquity.common.types import ApplicationState, PackageInstallState
-from subiquity.journald import journald_listen
+from subiquity.journald import journald_listen_batched
 from subiquity.models.filesystem import ActionRenderMode, Partition
+from subiquity.server.checkpoints import InstallCheckpoints
 from subiquity.server.controller import SubiquityController
 from subiquity.server.controllers.filesystem import VariationInfo
 from subiquity.server.curtin import run_curtin_command
+from subiquity.server.download import PackageDownloader, parse_print_uris
 from subiquity.server.mounter import Mounter, Mountpoint
+from subiquity.server.prefetch import PackagePrefetcher
+from subiquity.server.scheduler import StepScheduler
 from subiquity.server.types import InstallerChannels
 from subiquitycore.async_helpers import run_in_thread
 from subiquitycore.context import with_context
 from subiquitycore.file_util import (
+    copy_file,
     generate_config_yaml,
     generate_timestamped_header,
     write_file,
@@ -90,18 +94,32 @@ class InstallController(SubiquityController):
 
         self.tb_extractor = TracebackExtractor()
 
+        # Download the packages postinstall will install while the rest of
+        # the install runs. Start again from scratch if the source or mirror
+        # changes.
+        self.prefetcher = PackagePrefetcher(app)
+        self.checkpoints = InstallCheckpoints(app)
+        self.app.hub.subscribe(InstallerChannels.APT_CONFIGURED, self.start_prefetch)
+        for model_name in "source", "mirror":
+            self.app.hub.subscribe(
+                (InstallerChannels.CONFIGURED, model_name), self.prefetcher.cancel
+            )
+
     def interactive(self):
         return True
 
     def start(self):
-        journald_listen([self.app.log_syslog_id], self.log_event)
+        journald_listen_batched(
+            [self.app.log_syslog_id], self.log_events, fields=["MESSAGE"]
+        )
         self.install_task = asyncio.create_task(self.install())
 
     def tpath(self, *path):
         return os.path.join(self.model.target, *path)
 
-    def log_event(self, event):
-        self.tb_extractor.feed(event["MESSAGE"])
+    def log_events(self, events):
+        for event in events:
+            self.tb_extractor.feed(event["MESSAGE"])
 
     def write_config(self, config_file: Path, config: Any) -> None:
         """Create a YAML file that represents the curtin install configuration
@@ -147,11 +165,15 @@ class InstallController(SubiquityController):
     def rp_config(self, logs_dir: Path, target: str) -> Dict[str, Any]:
         """Return configuration to be used as part of populating a recovery
         partition."""
+        # This runs at the same time as other steps, so it must not write to
+        # their log file or error tarball.
         return {
             "install": {
                 "target": target,
                 "resume_data": None,
                 "extra_rsync_args": ["--no-links"],
+                "log_file": str(logs_dir / "curtin-install-recovery.log"),
+                "error_tarfile": str(logs_dir / "curtin-errors-recovery.tar"),
             }
         }
 
@@ -250,10 +272,14 @@ class InstallController(SubiquityController):
                 *source_args,
                 config=str(config_file),
                 private_mounts=False,
+                unit=self.curtin_step_unit(name),
             )
         except subprocess.CalledProcessError:
             raise CurtinInstallError(stages=stages)
 
+        self.load_device_map(config)
+
+    def load_device_map(self, config: Dict[str, Any]) -> None:
         device_map_path = config.get("storage", {}).get("device_map_path")
         if device_map_path is not None:
             with open(device_map_path) as fp:
@@ -263,22 +289,29 @@ class InstallController(SubiquityController):
     async def pre_curthooks_oem_configuration(self, context):
         async def install_oem_metapackages(ctx):
             # For OEM, we basically mimic what ubuntu-drivers does:
-            # 1. Install each package with apt-get install
-            # 2. For each package, run apt-get update using only the source
-            # installed by said package.
-            # 3. Run apt-get install again for each package. This will upgrade
+            # 1. Install the packages with apt-get install
+            # 2. Run apt-get update using only the sources installed by said
+            # packages.
+            # 3. Run apt-get install again for the packages. This will upgrade
             # them to the version found in the OEM archive.
-
-            # NOTE In ubuntu-drivers, this is done in a single call to apt-get
-            # install.
-            for pkg in self.model.oem.metapkgs:
-                await self.install_package(package=pkg.name, context=ctx)
+            pkgnames = [pkg.name for pkg in self.model.oem.metapkgs]
+            await self.install_packages(packages=pkgnames, context=ctx)
 
             if not self.model.network.has_network:
                 return
 
-            for pkg in self.model.oem.metapkgs:
-                source_list = f"/etc/apt/sources.list.d/{pkg.name}.list"
+            # apt-get update only takes a single source list file, but any
+            # number of parts in a directory, so gather the lists installed by
+            # the packages in a directory of their own.
+            parts_dir = "/tmp/subiquity-oem-sources"
+            target_parts_dir = self.tpath(parts_dir[1:])
+            os.makedirs(target_parts_dir, exist_ok=True)
+            try:
+                for name in pkgnames:
+                    os.symlink(
+                        f"/etc/apt/sources.list.d/{name}.list",
+                        os.path.join(target_parts_dir, f"{name}.list"),
+                    )
                 await run_curtin_command(
                     self.app,
                     context,
@@ -289,17 +322,16 @@ class InstallController(SubiquityController):
                     "apt-get",
                     "update",
                     "-o",
-                    f"Dir::Etc::SourceList={source_list}",
+                    "Dir::Etc::SourceList=/dev/null",
                     "-o",
-                    "Dir::Etc::SourceParts=/dev/null",
+                    f"Dir::Etc::SourceParts={parts_dir}",
                     "--no-list-cleanup",
                     private_mounts=False,
                 )
+            finally:
+                shutil.rmtree(target_parts_dir)
 
-            # NOTE In ubuntu-drivers, this is done in a single call to
-            # apt-get install.
-            for pkg in self.model.oem.metapkgs:
-                await self.install_package(package=pkg.name)
+            await self.install_packages(packages=pkgnames, context=ctx)
 
         if not self.model.oem.metapkgs:
             return
@@ -328,6 +360,55 @@ class InstallController(SubiquityController):
         ) as child:
             await install_oem_metapackages(child)
 
+    def curtin_step_unit(self, name: str) -> Optional[str]:
+        """Return the name of the unit a curtin install step runs in. The
+        name does not change when the server restarts, so that a step still
+        running from before a restart can be found and stopped."""
+        if self.app.opts.dry_run:
+            # Several dry-run servers can run at once, as the same user, so
+            # let the runner pick a name of its own.
+            return None
+        return "subiquity-curtin-" + name.replace(" ", "-")
+
+    def target_mounted_step(self) -> str:
+        """Return the curtin install step that mounts the target."""
+        if self.app.controllers.Filesystem.use_snapd_install_api():
+            return "formatting"
+        return "partitioning"
+
+    @with_context(description="preparing target")
+    async def prepare_target(self, *, context) -> None:
+        """Get ready to run the curtin install steps, resuming from any
+        checkpoints recorded for this configuration."""
+        self.checkpoints.load(self.checkpoint_key())
+
+        # If the server was restarted while a curtin step was running, the
+        # unit running the step is still going. Stop it, so that it does not
+        # run alongside the step when it runs again.
+        units = self.curtin_step_unit("*")
+        if units is not None:
+            await self.app.command_runner.stop_unit(units)
+
+        if self.model.target is None or not os.path.exists(self.model.target):
+            return
+        # Once the target is mounted, the steps after rely on it staying
+        # mounted. Until then, anything left mounted there is from a previous
+        # attempt (or a step interrupted part way through) and is in the way.
+        if not self.checkpoints.done(self.target_mounted_step()):
+            await self.unmount_target(context=context, target=self.model.target)
+
+    def checkpoint_key(self) -> str:
+        """Return the key for the install checkpoints: a hash of everything
+        the curtin steps are configured from."""
+        return InstallCheckpoints.make_key(
+            {
+                "source": self.model.source.current.id,
+                "target": self.model.target,
+                "storage": self.model.filesystem.render(),
+                "config": self.model.render(),
+            }
+        )
+
     @with_context(description="installing system", level="INFO", childlevel="DEBUG")
     async def curtin_install(self, *, context, source):
         if self.app.opts.dry_run:
@@ -340,7 +421,7 @@ class InstallController(SubiquityController):
         config_dir = logs_dir / "curtin-install"
 
         base_config = self.base_config(
-            logs_dir, Path(tempfile.mkdtemp()) / "resume-data.json"
+            logs_dir, Path(self.checkpoints.path("resume-data.json"))
         )
 
         self.app.note_file_for_apport(
@@ -350,134 +431,236 @@ class InstallController(SubiquityController):
 
         fs_controller = self.app.controllers.Filesystem
 
-        async def run_curtin_step(name, stages, step_config, source=None):
-            config = copy.deepcopy(base_config)
-            filename = f"subiquity-{name.replace(' ', '-')}.conf"
-            merge_config(config, copy.deepcopy(step_config))
-            await self.run_curtin_step(
-                context=context,
-                name=name,
-                stages=stages,
-                config_file=config_dir / filename,
-                source=source,
-                config=config,
-            )
+        def checkpointed(step, func):
+            async def run(*, context):
+                if self.checkpoints.done(step):
+                    log.info("skipping %s, it completed before a restart", step)
+                    return
+                await func(context=context)
+                self.checkpoints.mark(step)
+
+            return run
+
+        def curtin_step(name, stages, step_config, source=None):
+            async def run(*, context):
+                config = copy.deepcopy(base_config)
+                filename = f"subiquity-{name.replace(' ', '-')}.conf"
+                merge_config(config, copy.deepcopy(step_config))
+                if self.checkpoints.done(name):
+                    log.info("skipping %s step, it completed before a restart", name)
+                    self.load_device_map(config)
+                    return
+                await self.run_curtin_step(
+                    context=context,
+                    name=name,
+                    stages=stages,
+                    config_file=config_dir / filename,
+                    source=source,
+                    config=config,
+                )
+                self.checkpoints.mark(name)
 
-        await run_curtin_step(name="initial", stages=[], step_config={})
+            return run
+
+        # The steps form a graph rather than a sequence, so that steps that
+        # do not depend on each other (most notably populating the recovery
+        # partition, which copies the whole of /cdrom) can overlap.
+        scheduler = StepScheduler(context)
+        # The step the target is ready for postinstall after.
+        target_done = None
+
+        initial = scheduler.add(
+            "initial", curtin_step(name="initial", stages=[], step_config={})
+        )
 
         if fs_controller.reset_partition_only:
-            await run_curtin_step(
-                name="partitioning",
-                stages=["partitioning"],
-                step_config=self.filesystem_config(
-                    device_map_path=logs_dir / "device-map.json",
+            partitioned = scheduler.add(
+                "partitioning",
+                curtin_step(
+                    name="partitioning",
+                    stages=["partitioning"],
+                    step_config=self.filesystem_config(
+                        device_map_path=logs_dir / "device-map.json",
+                    ),
                 ),
+                after=[initial],
             )
         elif fs_controller.use_snapd_install_api():
-            await run_curtin_step(
-                name="partitioning",
-                stages=["partitioning"],
-                step_config=self.filesystem_config(
-                    mode=ActionRenderMode.DEVICES,
-                    device_map_path=logs_dir / "device-map-partition.json",
+            scheduler.add(
+                "partitioning",
+                curtin_step(
+                    name="partitioning",
+                    stages=["partitioning"],
+                    step_config=self.filesystem_config(
+                        mode=ActionRenderMode.DEVICES,
+                        device_map_path=logs_dir / "device-map-partition.json",
+                    ),
                 ),
+                after=[initial],
             )
+            encrypted = "partitioning"
             if fs_controller.use_tpm:
-                await fs_controller.setup_encryption(context=context)
-            await run_curtin_step(
-                name="formatting",
-                stages=["partitioning"],
-                step_config=self.filesystem_config(
-                    mode=ActionRenderMode.FORMAT_MOUNT,
-                    device_map_path=logs_dir / "device-map-format.json",
+                encrypted = scheduler.add(
+                    "encryption",
+                    fs_controller.setup_encryption,
+                    after=["partitioning"],
+                )
+            partitioned = scheduler.add(
+                "formatting",
+                curtin_step(
+                    name="formatting",
+                    stages=["partitioning"],
+                    step_config=self.filesystem_config(
+                        mode=ActionRenderMode.FORMAT_MOUNT,
+                        device_map_path=logs_dir / "device-map-format.json",
+                    ),
                 ),
+                after=[encrypted],
             )
+            extracted = partitioned
             if source is not None:
-                await run_curtin_step(
-                    name="extract",
-                    stages=["extract"],
-                    step_config=self.generic_config(),
-                    source=source,
+                scheduler.add(
+                    "extract",
+                    curtin_step(
+                        name="extract",
+                        stages=["extract"],
+                        step_config=self.generic_config(),
+                        source=source,
+                    ),
+                    after=[partitioned],
+                )
+                scheduler.add(
+                    "fstab",
+                    self.create_core_boot_classic_fstab,
+                    after=["extract"],
                 )
-                await self.create_core_boot_classic_fstab(context=context)
-                await run_curtin_step(
-                    name="swap",
-                    stages=["swap"],
-                    step_config=self.generic_config(
-                        swap_commands={
-                            "subiquity": [
-                                "curtin",
-                                "swap",
-                                "--fstab",
-                                self.tpath("etc/fstab"),
-                            ],
-                        }
+                extracted = scheduler.add(
+                    "swap",
+                    curtin_step(
+                        name="swap",
+                        stages=["swap"],
+                        step_config=self.generic_config(
+                            swap_commands={
+                                "subiquity": [
+                                    "curtin",
+                                    "swap",
+                                    "--fstab",
+                                    self.tpath("etc/fstab"),
+                                ],
+                            }
+                        ),
                     ),
+                    after=["fstab"],
                 )
-            await self.setup_target(context=context)
+            target_done = scheduler.add(
+                "setup-target", self.setup_target, after=[extracted]
+            )
         else:
-            await run_curtin_step(
-                name="partitioning",
-                stages=["partitioning"],
-                step_config=self.filesystem_config(
-                    device_map_path=logs_dir / "device-map.json",
+            partitioned = scheduler.add(
+                "partitioning",
+                curtin_step(
+                    name="partitioning",
+                    stages=["partitioning"],
+                    step_config=self.filesystem_config(
+                        device_map_path=logs_dir / "device-map.json",
+                    ),
+                    source=source,
                 ),
-                source=source,
+                after=[initial],
             )
-            await run_curtin_step(
+            extract = curtin_step(
                 name="extract",
                 stages=["extract"],
                 step_config=self.generic_config(),
                 source=source,
             )
-            if self.app.opts.dry_run:
-                # In dry-run, extract does not do anything. Let's create what's
-                # needed manually. Ideally, we would not hardcode
-                # var/lib/dpkg/status because it is an implementation detail.
-                status = "var/lib/dpkg/status"
-                (root / status).parent.mkdir(parents=True, exist_ok=True)
-                await arun_command(
-                    [
-                        "cp",
-                        "-aT",
-                        "--",
-                        str(Path("/") / status),
-                        str(root / status),
-                    ]
-                )
-            await self.setup_target(context=context)
 
-            if self.supports_apt():
-                await self.pre_curthooks_oem_configuration(context=context)
+            async def extract_step(*, context):
+                await extract(context=context)
+                if self.app.opts.dry_run:
+                    # In dry-run, extract does not do anything. Let's create
+                    # what's needed manually. Ideally, we would not hardcode
+                    # var/lib/dpkg/status because it is an implementation
+                    # detail.
+                    status = "var/lib/dpkg/status"
+                    (root / status).parent.mkdir(parents=True, exist_ok=True)
+                    await run_in_thread(
+                        copy_file, str(Path("/") / status), str(root / status)
+                    )
+
+            scheduler.add("extract", extract_step, after=[partitioned])
+            configured = scheduler.add(
+                "setup-target", self.setup_target, after=["extract"]
+            )
 
-            await self.bridge_kernel_decided.wait()
+            if self.supports_apt():
+                configured = scheduler.add(
+                    "oem",
+                    checkpointed("oem", self.pre_curthooks_oem_configuration),
+                    after=[configured],
+                )
 
-            await run_curtin_step(
+            curthooks = curtin_step(
                 name="curthooks",
                 stages=["curthooks"],
                 step_config=self.generic_config(),
             )
+
+            async def curthooks_step(*, context):
+                await self.bridge_kernel_decided.wait()
+                await curthooks(context=context)
+
+            target_done = scheduler.add("curthooks", curthooks_step, after=[configured])
             # If the current source has a snapd_system_label here we should
             # really write recovery_system={snapd_system_label} to
             # {target}/var/lib/snapd/modeenv to get snapd to pick it up on
             # first boot. But not needed for now.
         rp = fs_controller.model.reset_partition
         if rp is not None:
+            # Populating the recovery partition only needs the partition to
+            # exist, so it runs alongside extract and curthooks. Configuring
+            # the boot entry for it has to wait for the target though.
             mounter = Mounter(self.app)
             rp_target = os.path.join(self.app.root, "factory-reset")
-            mp = await mounter.mount(rp.path, mountpoint=rp_target)
-            await run_curtin_step(
-                name="populate recovery",
-                stages=["extract"],
-                step_config=self.rp_config(logs_dir, mp.p()),
-                source="cp:///cdrom",
+            rp_install_config = self.rp_config(logs_dir, rp_target)["install"]
+            self.app.note_file_for_apport(
+                "CurtinRecoveryErrors", rp_install_config["error_tarfile"]
             )
-            new_casper_uuid = await self.adjust_rp(rp, mp)
-            await self.configure_rp_boot(
-                context=context, rp=rp, casper_uuid=new_casper_uuid
+            self.app.note_file_for_apport(
+                "CurtinRecoveryLog", rp_install_config["log_file"]
+            )
+            new_casper_uuid = None
+
+            async def populate_rp(*, context):
+                nonlocal new_casper_uuid
+                mp = await mounter.mount(rp.path, mountpoint=rp_target)
+                await curtin_step(
+                    name="populate recovery",
+                    stages=["extract"],
+                    step_config=self.rp_config(logs_dir, mp.p()),
+                    source="cp:///cdrom",
+                )(context=context)
+                new_casper_uuid = await self.adjust_rp(rp, mp)
+
+            async def configure_rp_boot(*, context):
+                await self.configure_rp_boot(
+                    context=context, rp=rp, casper_uuid=new_casper_uuid
+                )
+
+            scheduler.add("populate-recovery", populate_rp, after=[partitioned])
+            scheduler.add(
+                "recovery-boot",
+                configure_rp_boot,
+                after=["populate-recovery", target_done],
             )
         else:
-            await self.maybe_configure_existing_rp_boot(context=context)
+            scheduler.add(
+                "existing-recovery-boot",
+                self.maybe_configure_existing_rp_boot,
+                after=[target_done or partitioned],
+            )
+
+        await scheduler.run()
 
     async def adjust_rp(self, rp: Partition, mp: Mountpoint) -> str:
         if self.app.opts.dry_run:
@@ -630,9 +813,7 @@ class InstallController(SubiquityController):
 
             await self.install_live_packages(context=context)
 
-            if self.model.target is not None:
-                if os.path.exists(self.model.target):
-                    await self.unmount_target(context=context, target=self.model.target)
+            await self.prepare_target(context=context)
 
             await self.curtin_install(context=context, source=for_install_path)
 
@@ -648,7 +829,9 @@ class InstallController(SubiquityController):
             await self.app.controllers.Late.run()
 
             self.app.update_state(ApplicationState.DONE)
+            self.app.dump_trace()
         except Exception as exc:
+            self.app.dump_trace()
             kw = {}
             if self.tb_extractor.traceback:
                 kw["Traceback"] = "\n".join(self.tb_extractor.traceback)
@@ -710,37 +893,44 @@ class InstallController(SubiquityController):
     )
     async def postinstall(self, *, context):
         self.write_autoinstall_config()
+        prefetched: List[str] = []
         try:
-            if self.supports_apt():
-                packages = await self.get_target_packages(context=context)
-                for package in packages:
-                    if package.skip_when_offline and not self.model.network.has_network:
-                        log.warning(
-                            "skipping installation of package %s when"
-                            " performing an offline install.",
-                            package.name,
-                        )
-                        continue
-                    await self.install_package(context=context, package=package.name)
-        finally:
-            await self.configure_cloud_init(context=context)
-
-        fs_controller = self.app.controllers.Filesystem
-        if fs_controller.use_snapd_install_api():
-            await fs_controller.finish_install(
-                context=context, kernel_components=self.kernel_components()
-            )
+            try:
+                if self.supports_apt():
+                    packages = await self.get_target_packages(context=context)
+                    to_install = [
+                        name
+                        for name in self.packages_to_install(packages, warn=True)
+                        if not self.checkpoints.done(f"package {name}")
+                    ]
+                    prefetched = await self.prefetcher.populate(self.tpath())
+                    await self.install_packages(context=context, packages=to_install)
+                    self.checkpoints.mark(*(f"package {name}" for name in to_install))
+            finally:
+                await self.configure_cloud_init(context=context)
+
+            fs_controller = self.app.controllers.Filesystem
+            if fs_controller.use_snapd_install_api():
+                await fs_controller.finish_install(
+                    context=context, kernel_components=self.kernel_components()
+                )
 
-        if self.supports_apt():
-            if self.model.drivers.do_install:
+            if self.supports_apt() and self.model.drivers.do_install:
                 with context.child(
                     "ubuntu-drivers-install", "installing third-party drivers"
                 ) as child:
                     udrivers = self.app.controllers.Drivers.ubuntu_drivers
                     await udrivers.install_drivers(root_dir=self.tpath(), context=child)
+        finally:
+            # The drivers are prefetched too, so keep the packages until
+            # ubuntu-drivers has installed them.
+            self.prefetcher.cleanup(prefetched)
+
+        if self.supports_apt():
             if self.model.network.has_network:
                 self.app.update_state(ApplicationState.UU_RUNNING)
                 policy = self.model.updates.updates
+                await self.download_updates(context=context, policy=policy)
                 await self.run_unattended_upgrades(context=context, policy=policy)
             await self.restore_apt_config(context=context)
         if self.model.active_directory.do_join:
@@ -757,6 +947,42 @@ class InstallController(SubiquityController):
     async def configure_cloud_init(self, context):
         await run_in_thread(self.model.configure_cloud_init)
 
+    def packages_to_install(
+        self, packages: List[TargetPkg], *, warn: bool = False
+    ) -> List[str]:
+        names = []
+        for package in packages:
+            if package.skip_when_offline and not self.model.network.has_network:
+                if warn:
+                    log.warning(
+                        "skipping installation of package %s when"
+                        " performing an offline install.",
+                        package.name,
+                    )
+                continue
+            if package.name not in names:
+                names.append(package.name)
+        return names
+
+    def start_prefetch(self) -> None:
+        if not self.model.network.has_network:
+            return
+        self.prefetcher.start(self._packages_to_prefetch, self._drivers_to_prefetch)
+
+    async def _packages_to_prefetch(self) -> List[str]:
+        return self.packages_to_install(await self.model.target_packages())
+
+    async def _drivers_to_prefetch(self) -> List[str]:
+        drivers = self.app.controllers.Drivers
+        if not drivers.list_drivers_done_event.is_set():
+            # Waiting could hold up postinstall, and ubuntu-drivers
+            # downloads the drivers anyway.
+            log.debug("drivers not listed yet, not prefetching them")
+            return []
+        if not self.model.drivers.do_install:
+            return []
+        return drivers.drivers or []
+
     @with_context(description="calculating extra packages to install")
     async def get_target_packages(self, context) -> List[TargetPkg]:
         return await self.app.base_model.target_packages()
@@ -764,9 +990,31 @@ class InstallController(SubiquityController):
     @with_context(name="install_{package}", description="installing {package}")
     async def install_package(self, *, context, package):
         """Attempt to download the package up-to three times, then install it."""
+        await self._system_install(context, [package])
+
+    async def install_packages(self, *, context, packages: List[str]) -> None:
+        """Install packages in a single apt transaction.
+
+        If that fails, fall back to installing them one at a time, so that
+        the failure is reported against the package that caused it."""
+        if len(packages) <= 1:
+            for package in packages:
+                await self.install_package(context=context, package=package)
+            return
+        names = " ".join(packages)
+        try:
+            with context.child("install_packages", f"installing {names}") as child:
+                await self._system_install(child, packages)
+        except subprocess.CalledProcessError:
+            log.warning("installing %s together failed, trying one at a time", names)
+            for package in packages:
+                await self.install_package(context=context, package=package)
+
+    async def _system_install(self, context, packages: List[str]) -> None:
+        names = " ".join(packages)
         for attempt, attempts_remaining in enumerate(reversed(range(3))):
             try:
-                with context.child("retrieving", f"retrieving {package}"):
+                with context.child("retrieving", f"retrieving {names}"):
                     await run_curtin_command(
                         self.app,
                         context,
@@ -775,11 +1023,11 @@ class InstallController(SubiquityController):
                         self.tpath(),
                         "--download-only",
                         "--",
-                        package,
+                        *packages,
                         private_mounts=False,
                     )
             except subprocess.CalledProcessError:
-                log.error(f"failed to download package {package}")
+                log.error(f"failed to download package {names}")
                 if attempts_remaining > 0:
                     await asyncio.sleep(1 + attempt * 3)
                 else:
@@ -787,7 +1035,7 @@ class InstallController(SubiquityController):
             else:
                 break
 
-        with context.child("unpacking", f"unpacking {package}"):
+        with context.child("unpacking", f"unpacking {names}"):
             await run_curtin_command(
                 self.app,
                 context,
@@ -796,7 +1044,7 @@ class InstallController(SubiquityController):
                 self.tpath(),
                 "--assume-downloaded",
                 "--",
-                package,
+                *packages,
                 private_mounts=False,
             )
 
@@ -805,6 +1053,47 @@ class InstallController(SubiquityController):
         configurer = self.app.controllers.Mirror.final_apt_configurer
         await configurer.deconfigure(context, self.tpath())
 
+    @with_context(description="downloading {policy} updates")
+    async def download_updates(self, *, context, policy):
+        """Download the packages that unattended-upgrades is about to upgrade,
+        several at a time and reporting progress, so that it finds them in
+        the apt archive of the target rather than downloading them one by
+        one itself.
+
+        The packages are the ones a dist-upgrade would download from the
+        sources configured in the target. apt-get --print-uris does not say
+        which pocket a package comes from, so with the "security" policy,
+        where most of them would be from -updates and not installed, the
+        download is left to unattended-upgrades."""
+        if self.app.opts.dry_run:
+            return
+        if policy != "all":
+            log.debug("not downloading updates ahead for policy %s", policy)
+            return
+        try:
+            result = await run_curtin_command(
+                self.app,
+                context,
+                "in-target",
+                "-t",
+                self.tpath(),
+                "--",
+                "apt-get",
+                "--print-uris",
+                "--quiet",
+                "--quiet",
+                "--assume-yes",
+                "dist-upgrade",
+                capture=True,
+                private_mounts=True,
+            )
+            items = parse_print_uris(result.stdout.decode("utf-8"))
+            await PackageDownloader(self.app).download(
+                context, items, self.tpath("var/cache/apt/archives")
+            )
+        except Exception:
+            log.exception("downloading updates failed")
+
     @with_context(description="downloading and installing {policy} updates")
     async def run_unattended_upgrades(self, context, policy):
         if self.app.opts.dry_run:
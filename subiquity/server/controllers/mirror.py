@@ -175,9 +175,10 @@ class MirrorController(SubiquityController):
         else:
             log.debug("Mirror checking successful")
         finally:
-            log.debug("APT output follows")
-            for line in output.getvalue().splitlines():
-                log.debug("%s", line)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("APT output follows")
+                for line in output.getvalue().splitlines():
+                    log.debug("%s", line)
 
     async def find_and_elect_candidate_mirror(self, context):
         # Ensure we block until the proxy and network models have been
@@ -15,7 +15,7 @@
 
 import asyncio
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from subiquity.common.apidef import API
 from subiquity.common.types import OEMResponse
@@ -96,9 +96,25 @@ class OEMController(SubiquityController):
 
     async def wants_oem_kernel(self, pkgname: str, *, context, overlay) -> bool:
         """For a given package, tell whether it wants the OEM or the default
+        kernel flavor. See wants_oem_kernels."""
+        wants = await self.wants_oem_kernels(
+            [pkgname], context=context, overlay=overlay
+        )
+        return wants[pkgname]
+
+    async def wants_oem_kernels(
+        self, pkgnames: List[str], *, context, overlay
+    ) -> Dict[str, bool]:
+        """For each package, tell whether it wants the OEM or the default
         kernel flavor. We look for the Ubuntu-Oem-Kernel-Flavour attribute in
         the package meta-data. If the attribute is present and has the value
-        "default", then return False. Otherwise, return True."""
+        "default", then the package wants the default flavor. Otherwise, it
+        wants the OEM flavor.
+
+        The meta-data of all the packages is retrieved with a single call to
+        apt-cache show."""
+        if not pkgnames:
+            return {}
         result = await run_curtin_command(
             self.app,
             context,
@@ -108,25 +124,35 @@ class OEMController(SubiquityController):
             "--",
             "apt-cache",
             "show",
-            pkgname,
+            *pkgnames,
             capture=True,
             private_mounts=True,
         )
+        flavors: Dict[str, str] = {}
+        package = None
         for line in result.stdout.decode("utf-8").splitlines():
-            if not line.startswith("Ubuntu-Oem-Kernel-Flavour:"):
-                continue
+            if line.startswith("Package:"):
+                package = line.split(":", maxsplit=1)[1].strip()
+            elif line.startswith("Ubuntu-Oem-Kernel-Flavour:"):
+                # apt-cache show lists every available version of a package;
+                # like apt-get install, go with the first (preferred) one.
+                flavor = line.split(":", maxsplit=1)[1].strip()
+                flavors.setdefault(package, flavor)
 
-            flavor = line.split(":", maxsplit=1)[1].strip()
-            if flavor == "default":
-                return False
+        wants = {}
+        for pkgname in pkgnames:
+            flavor = flavors.get(pkgname)
+            if flavor is None:
+                log.warning("%s has no Ubuntu-Oem-Kernel-Flavour", pkgname)
+                wants[pkgname] = True
+            elif flavor == "default":
+                wants[pkgname] = False
             elif flavor == "oem":
-                return True
+                wants[pkgname] = True
             else:
                 log.warning("%s wants unexpected kernel flavor: %s", pkgname, flavor)
-                return True
-
-        log.warning("%s has no Ubuntu-Oem-Kernel-Flavour", pkgname)
-        return True
+                wants[pkgname] = True
+        return wants
 
     @with_context()
     async def load_metapackages_list(self, context) -> None:
@@ -167,13 +193,11 @@ class OEMController(SubiquityController):
                     metapkgs: List[str] = await self.ubuntu_drivers.list_oem(
                         root_dir=d.mountpoint, context=context
                     )
+                    wants = await self.wants_oem_kernels(
+                        metapkgs, context=context, overlay=d
+                    )
                     self.model.metapkgs = [
-                        OEMMetaPkg(
-                            name=name,
-                            wants_oem_kernel=await self.wants_oem_kernel(
-                                name, context=context, overlay=d
-                            ),
-                        )
+                        OEMMetaPkg(name=name, wants_oem_kernel=wants[name])
                         for name in metapkgs
                     ]
 
@@ -13,10 +13,19 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import copy
+import json
 import logging
+import os
+import threading
 
-from curtin.reporter import available_handlers, update_configuration
+from curtin import url_helper
+from curtin.reporter import (
+    available_handlers,
+    instantiated_handler_registry,
+    update_configuration,
+)
 from curtin.reporter.events import (
     ReportingEvent,
     report_event,
@@ -25,11 +34,16 @@ from curtin.reporter.events import (
     status,
 )
 from curtin.reporter.handlers import LogHandler as CurtinLogHandler
+from curtin.reporter.handlers import WebHookHandler as CurtinWebHookHandler
 
 from subiquity.server.controller import NonInteractiveController
 from subiquity.server.event_listener import EventListener
+from subiquity.server.types import InstallerChannels
+from subiquitycore.async_helpers import run_in_thread
 from subiquitycore.context import Context
 
+log = logging.getLogger("subiquity.server.controllers.reporting")
+
 
 class LogHandler(CurtinLogHandler):
     def publish_event(self, event):
@@ -38,8 +52,239 @@ class LogHandler(CurtinLogHandler):
         logger.log(level, event.as_string())
 
 
+class WebHookHandler(CurtinWebHookHandler):
+    """A webhook reporter that does not block the caller.
+
+    curtin's handler POSTs each event synchronously, which blocks the
+    event loop for a round trip per event. This one puts events in a
+    bounded queue that a background thread sends from. If a POST fails,
+    the thread backs off and retries the same events, giving up on them
+    (as curtin's handler does straight away) after max_attempts tries. If
+    the queue fills up, new events are handed to the thread to append to
+    spill_file (if set), and sent once the queue has drained; without a
+    spill file the oldest events are dropped. Only the thread touches the
+    spill file, so publishing an event never waits for file I/O. Once
+    max_spill events have been spilled, further events are dropped until
+    the spill file has drained, as it is usually on a tmpfs.
+
+    By default each event is POSTed on its own, as curtin does. If
+    batch_size is greater than 1, up to that many queued events are sent
+    at once as a JSON list, for collectors that accept that.
+    """
+
+    initial_backoff = 1.0
+    max_backoff = 60.0
+    max_attempts = 5
+    max_spill = 10000
+
+    def __init__(
+        self, endpoint, *, queue_size=1000, batch_size=1, spill_file=None, **kw
+    ):
+        super().__init__(endpoint, **kw)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.spill_file = spill_file
+        self._queue = collections.deque()
+        # Events for the thread to append to the spill file.
+        self._overflow = []
+        # Number of events in the spill file or waiting to be written to it.
+        self._spilled = 0
+        # Number of events spilled since the spill file was created.
+        self._spill_written = 0
+        # Number of events in the spill file that have not been moved back
+        # to the queue, and the offset of the first of them. Only the thread
+        # uses these.
+        self._spill_count = 0
+        self._spill_offset = 0
+        self._dropped = 0
+        self._sending = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="webhook-reporter", daemon=True
+        )
+        self._thread.start()
+
+    def publish_event(self, event):
+        data = event.as_dict()
+        with self._cond:
+            if self._spilled or len(self._queue) >= self.queue_size:
+                if self.spill_file is None:
+                    self._queue.popleft()
+                    self._queue.append(data)
+                    self._dropped += 1
+                elif self._spill_written < self.max_spill:
+                    self._overflow.append(data)
+                    self._spilled += 1
+                    self._spill_written += 1
+                else:
+                    self._dropped += 1
+            else:
+                self._queue.append(data)
+            self._cond.notify_all()
+
+    def _write_spill(self, events):
+        # Called from the thread, without self._cond held.
+        if not self._spill_count:
+            # Nothing left to read, so start the file afresh.
+            os.makedirs(os.path.dirname(self.spill_file), exist_ok=True)
+            mode = "w"
+            self._spill_offset = 0
+        else:
+            mode = "a"
+        with open(self.spill_file, mode) as fp:
+            for data in events:
+                fp.write(json.dumps(data) + "\n")
+        self._spill_count += len(events)
+
+    def _read_spill(self, n):
+        # Called from the thread, without self._cond held.
+        events = []
+        with open(self.spill_file) as fp:
+            fp.seek(self._spill_offset)
+            while len(events) < min(n, self._spill_count):
+                events.append(json.loads(fp.readline()))
+            self._spill_offset = fp.tell()
+        self._spill_count -= len(events)
+        if not self._spill_count:
+            os.unlink(self.spill_file)
+        return events
+
+    def _unspill(self, overflow, refill):
+        # Write the events handed over by publish_event() to the spill file
+        # and, if refill is set, read back as many spilled events as fit in
+        # the queue. The file I/O is done without self._cond held.
+        try:
+            if overflow:
+                self._write_spill(overflow)
+            events = []
+            if refill and self._spill_count:
+                events = self._read_spill(self.queue_size)
+        except (OSError, ValueError) as exc:
+            log.warning("webhook %s: spill file failed: %s", self.endpoint, exc)
+            lost = self._spill_count + len(overflow)
+            self._spill_count = 0
+            with self._cond:
+                self._dropped += lost
+                self._spilled -= lost
+                self._spill_written = len(self._overflow)
+            return
+        with self._cond:
+            self._queue.extend(events)
+            self._spilled -= len(events)
+            if not self._spill_count:
+                self._spill_written = len(self._overflow)
+
+    def _post(self, events):
+        if self.batch_size > 1:
+            data = json.dumps(events)
+        else:
+            [event] = events
+            data = json.dumps(event)
+        if self.oauth_helper:
+            readurl = self.oauth_helper.readurl
+        else:
+            readurl = url_helper.readurl
+        readurl(self.endpoint, data=data, headers=self.headers, retries=self.retries)
+
+    def _sent(self, events):
+        # Called with self._cond held.
+        for event in events:
+            # The queue may have dropped events from the front while we
+            # were posting.
+            if self._queue and self._queue[0] is event:
+                self._queue.popleft()
+        self._sending = False
+        self._cond.notify_all()
+
+    def _run(self):
+        backoff = self.initial_backoff
+        attempts = 0
+        while True:
+            with self._cond:
+                while not (self._queue or self._spilled or self._closed):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                overflow, self._overflow = self._overflow, []
+                refill = not self._queue
+            if overflow or refill:
+                self._unspill(overflow, refill)
+            with self._cond:
+                if not self._queue:
+                    continue
+                if self._dropped:
+                    log.warning(
+                        "webhook %s: dropped %d events", self.endpoint, self._dropped
+                    )
+                    self._dropped = 0
+                n = min(self.batch_size, len(self._queue))
+                events = [self._queue[i] for i in range(n)]
+                self._sending = True
+            try:
+                self._post(events)
+            except Exception as exc:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    log.warning(
+                        "webhook %s: posting %d events failed %d times, "
+                        "dropping them: %s",
+                        self.endpoint,
+                        len(events),
+                        attempts,
+                        exc,
+                    )
+                    with self._cond:
+                        self._sent(events)
+                    backoff = self.initial_backoff
+                    attempts = 0
+                    continue
+                log.warning(
+                    "webhook %s: posting %d events failed, retrying in %ss: %s",
+                    self.endpoint,
+                    len(events),
+                    backoff,
+                    exc,
+                )
+                with self._cond:
+                    self._sending = False
+                    self._cond.notify_all()
+                if self._stop.wait(backoff):
+                    return
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.initial_backoff
+            attempts = 0
+            with self._cond:
+                self._sent(events)
+
+    def pending(self):
+        """Return the number of events that have not been sent yet."""
+        with self._cond:
+            return len(self._queue) + self._spilled
+
+    def flush(self, timeout=None):
+        """Wait until all events have been sent or timeout expires.
+
+        Return True if everything was sent."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not (self._queue or self._spilled or self._sending), timeout
+            )
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._stop.set()
+        self._thread.join()
+
+
 available_handlers.unregister_item("log")
 available_handlers.register_item("log", LogHandler)
+available_handlers.unregister_item("webhook")
+available_handlers.register_item("webhook", WebHookHandler)
 
 INITIAL_CONFIG = {
     "logging": {"type": "log"},
@@ -65,6 +310,7 @@ class ReportingController(EventListener, NonInteractiveController):
         super().__init__(app)
         self.config = copy.deepcopy(INITIAL_CONFIG)
         app.add_event_listener(self)
+        app.hub.subscribe(InstallerChannels.PRE_SHUTDOWN, self._pre_shutdown)
 
     def load_autoinstall_data(self, data):
         if self.app.interactive:
@@ -74,8 +320,20 @@ class ReportingController(EventListener, NonInteractiveController):
             self.config.update(copy.deepcopy(data))
 
     def start(self):
+        for name, handler_config in self.config.items():
+            if handler_config.get("type") == "webhook":
+                handler_config.setdefault(
+                    "spill_file", self.app.state_path("reporting", name + ".spill")
+                )
         update_configuration(self.config)
 
+    async def _pre_shutdown(self):
+        # Give the webhooks a chance to send the last events, such as the
+        # end of the install.
+        for handler in instantiated_handler_registry.registered_items.values():
+            if isinstance(handler, WebHookHandler):
+                await run_in_thread(handler.flush, 10)
+
     def report_start_event(self, context, description):
         report_start_event(context.full_name(), description, level=context.level)
 
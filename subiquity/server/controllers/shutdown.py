@@ -23,9 +23,9 @@ from subiquity.common.types import ShutdownMode
 from subiquity.server.controller import SubiquityController
 from subiquity.server.controllers.install import ApplicationState
 from subiquity.server.types import InstallerChannels
-from subiquitycore.async_helpers import run_bg_task
+from subiquitycore.async_helpers import run_bg_task, run_in_thread
 from subiquitycore.context import with_context
-from subiquitycore.file_util import open_perms, set_log_perms
+from subiquitycore.file_util import copy_file, copy_tree, open_perms, set_log_perms
 from subiquitycore.utils import run_command
 
 log = logging.getLogger("subiquity.server.controllers.shutdown")
@@ -92,8 +92,10 @@ class ShutdownController(SubiquityController):
             if not os.path.exists(logfile):
                 continue
             set_log_perms(logfile)
-            await self.app.command_runner.run(
-                ["cp", "-a", logfile, "/var/log/installer"]
+            await run_in_thread(
+                copy_file,
+                logfile,
+                os.path.join("/var/log/installer", os.path.basename(logfile)),
             )
 
     @with_context()
@@ -106,13 +108,13 @@ class ShutdownController(SubiquityController):
             # Possibly should copy logs somewhere else in this case?
             return
         target_logs = os.path.join(self.app.base_model.target, "var/log/installer")
+        self.app.dump_api_metrics()
+        self.app.dump_trace()
         if self.opts.dry_run:
             os.makedirs(target_logs, exist_ok=True)
         else:
             await self.copy_cloud_init_logs(target_logs)
-            await self.app.command_runner.run(
-                ["cp", "-aT", "/var/log/installer", target_logs]
-            )
+            await run_in_thread(copy_tree, "/var/log/installer", target_logs)
             # explicitly setting the expected permissions on this dir
             set_log_perms(target_logs, mode=0o770, group="adm")
 
@@ -13,6 +13,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 import os
 import shutil
 import subprocess
@@ -42,6 +43,7 @@ class TestWriteConfig(unittest.IsolatedAsyncioTestCase):
 
     @patch("subiquity.server.controllers.install.run_curtin_command")
     async def test_run_curtin_install_step(self, run_cmd):
+        self.controller.app.opts.dry_run = False
         with patch("subiquity.server.controllers.install.open", mock_open()) as m_open:
             await self.controller.run_curtin_step(
                 name="MyStep",
@@ -64,6 +66,7 @@ class TestWriteConfig(unittest.IsolatedAsyncioTestCase):
             "/source",
             config="/config.yaml",
             private_mounts=False,
+            unit="subiquity-curtin-MyStep",
         )
 
     @patch("subiquity.server.controllers.install.run_curtin_command")
@@ -89,6 +92,7 @@ class TestWriteConfig(unittest.IsolatedAsyncioTestCase):
             'json:stages=["partitioning", "extract"]',
             config="/config.yaml",
             private_mounts=False,
+            unit=None,
         )
 
     @patch("subiquity.server.controllers.install.open", mock_open())
@@ -137,6 +141,24 @@ class TestWriteConfig(unittest.IsolatedAsyncioTestCase):
             },
         )
 
+    def test_rp_config(self):
+        config = self.controller.rp_config(
+            logs_dir=Path("/logs"), target="/factory-reset"
+        )
+
+        self.assertDictEqual(
+            config,
+            {
+                "install": {
+                    "target": "/factory-reset",
+                    "resume_data": None,
+                    "extra_rsync_args": ["--no-links"],
+                    "log_file": "/logs/curtin-install-recovery.log",
+                    "error_tarfile": "/logs/curtin-errors-recovery.tar",
+                }
+            },
+        )
+
     def test_generic_config(self):
         with patch.object(
             self.controller.model, "render", return_value={"key": "value"}
@@ -251,6 +273,79 @@ class TestInstallController(unittest.IsolatedAsyncioTestCase):
             with self.assertRaises(subprocess.CalledProcessError):
                 await self.controller.install_package(package="git")
 
+    @patch("asyncio.sleep")
+    async def test_install_packages(self, m_sleep):
+        run_curtin = "subiquity.server.controllers.install.run_curtin_command"
+        with patch(run_curtin) as m_run:
+            await self.controller.install_packages(
+                context=self.controller.context, packages=["git", "vim"]
+            )
+        self.assertEqual(
+            [c.args[5:] for c in m_run.call_args_list],
+            [
+                ("--download-only", "--", "git", "vim"),
+                ("--assume-downloaded", "--", "git", "vim"),
+            ],
+        )
+
+    @patch("asyncio.sleep")
+    async def test_install_packages_fallback(self, m_sleep):
+        run_curtin = "subiquity.server.controllers.install.run_curtin_command"
+        error = subprocess.CalledProcessError(
+            returncode=1, cmd="curtin system-install git vim"
+        )
+        # The download together works but unpacking fails, so each package
+        # is then installed on its own.
+        with patch(run_curtin, side_effect=(None, error, None, None, None, None)) as m:
+            await self.controller.install_packages(
+                context=self.controller.context, packages=["git", "vim"]
+            )
+        self.assertEqual(
+            [c.args[7:] for c in m.call_args_list],
+            [("git", "vim"), ("git", "vim"), ("git",), ("git",), ("vim",), ("vim",)],
+        )
+
+    async def test_install_packages_single(self):
+        with patch.object(self.controller, "install_package") as m_install:
+            await self.controller.install_packages(
+                context=self.controller.context, packages=["git"]
+            )
+        m_install.assert_called_once_with(
+            context=self.controller.context, package="git"
+        )
+
+    async def test_oem_metapackages(self):
+        self.controller.model.oem.metapkgs = [Mock(), Mock()]
+        self.controller.model.oem.metapkgs[0].name = "oem-a-meta"
+        self.controller.model.oem.metapkgs[1].name = "oem-b-meta"
+        self.controller.model.network.has_network = True
+        parts_dir = self.controller.tpath("tmp/subiquity-oem-sources")
+        parts = []
+
+        async def fake_run_curtin(app, context, *args, **kw):
+            parts.extend(sorted(os.listdir(parts_dir)))
+
+        run_curtin = patch(
+            "subiquity.server.controllers.install.run_curtin_command",
+            side_effect=fake_run_curtin,
+        )
+        install_packages = patch.object(self.controller, "install_packages")
+        with run_curtin as m_run, install_packages as m_install:
+            await self.controller.pre_curthooks_oem_configuration(
+                context=self.controller.context
+            )
+
+        self.assertEqual(
+            [c.kwargs["packages"] for c in m_install.call_args_list],
+            [["oem-a-meta", "oem-b-meta"], ["oem-a-meta", "oem-b-meta"]],
+        )
+        m_run.assert_called_once()
+        self.assertIn(
+            "Dir::Etc::SourceParts=/tmp/subiquity-oem-sources", m_run.call_args.args
+        )
+        self.assertEqual(parts, ["oem-a-meta.list", "oem-b-meta.list"])
+        self.assertFalse(os.path.exists(parts_dir))
+
     def setup_rp_test(self, lsblk_output=b"lsblk_output"):
         app = self.controller.app
         app.opts.dry_run = False
@@ -265,6 +360,123 @@ class TestInstallController(unittest.IsolatedAsyncioTestCase):
         app.package_installer.install_pkg.return_value = PackageInstallState.DONE
         fsm, self.part = make_model_and_partition()
 
+    def setup_curtin_install_test(self):
+        app = self.controller.app
+        app.opts.dry_run = False
+        app.note_file_for_apport = Mock()
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        app.state_path = lambda *parts: os.path.join(state_dir, *parts)
+        self.controller.model.filesystem.render.return_value = {}
+        self.controller.model.render.return_value = {}
+        fsc = app.controllers.Filesystem
+        fsc.reset_partition_only = False
+        fsc.use_snapd_install_api.return_value = False
+        self.controller.bridge_kernel_decided.set()
+        self.controller.setup_target = AsyncMock()
+        self.controller.pre_curthooks_oem_configuration = AsyncMock()
+        return fsc
+
+    async def prepare_target(self, *steps, snapd=False):
+        app = self.controller.app
+        app.opts.dry_run = False
+        app.command_runner = AsyncMock()
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        app.state_path = lambda *parts: os.path.join(state_dir, *parts)
+        app.controllers.Filesystem.use_snapd_install_api.return_value = snapd
+        self.controller.model.target = state_dir
+        self.controller.checkpoint_key = Mock(return_value="key")
+        self.controller.checkpoints.load("key")
+        self.controller.checkpoints.mark(*steps)
+        self.controller.unmount_target = AsyncMock()
+
+        await self.controller.prepare_target(context=self.controller.context)
+
+        app.command_runner.stop_unit.assert_awaited_once_with("subiquity-curtin-*")
+        return self.controller.unmount_target.await_count > 0
+
+    async def test_prepare_target(self):
+        self.assertTrue(await self.prepare_target())
+        self.assertTrue(await self.prepare_target("initial"))
+        self.assertFalse(await self.prepare_target("initial", "partitioning"))
+
+    async def test_prepare_target_snapd(self):
+        self.assertTrue(
+            await self.prepare_target("initial", "partitioning", snapd=True)
+        )
+        self.assertFalse(
+            await self.prepare_target(
+                "initial", "partitioning", "formatting", snapd=True
+            )
+        )
+
+    async def test_curtin_install_resume(self):
+        fsc = self.setup_curtin_install_test()
+        fsc.model.reset_partition = None
+        self.controller.maybe_configure_existing_rp_boot = AsyncMock()
+        self.controller.checkpoints.load("key")
+        self.controller.checkpoints.mark("initial", "partitioning", "extract", "oem")
+        self.controller.run_curtin_step = AsyncMock()
+        self.controller.load_device_map = Mock()
+
+        await self.controller.curtin_install(
+            context=self.controller.context, source="cp:///source"
+        )
+
+        self.assertEqual(
+            [c.kwargs["name"] for c in self.controller.run_curtin_step.call_args_list],
+            ["curthooks"],
+        )
+        self.assertEqual(self.controller.load_device_map.call_count, 3)
+        self.controller.setup_target.assert_awaited_once()
+        self.controller.pre_curthooks_oem_configuration.assert_not_awaited()
+        self.assertTrue(self.controller.checkpoints.done("curthooks"))
+
+    @patch("subiquity.server.controllers.install.Mounter")
+    async def test_curtin_install_populates_rp_concurrently(self, m_mounter):
+        fsc = self.setup_curtin_install_test()
+        fsc.model.reset_partition = Mock(path="/dev/vda3")
+        m_mounter.return_value.mount = AsyncMock(
+            return_value=Mountpoint(mountpoint="/factory-reset")
+        )
+        events = []
+
+        async def run_curtin_step(*, context, name, **kw):
+            events.append(("start", name))
+            if name == "populate recovery":
+                # Make curthooks run while the recovery partition is
+                # being populated.
+                while ("end", "curthooks") not in events:
+                    await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            events.append(("end", name))
+
+        self.controller.run_curtin_step = run_curtin_step
+        self.controller.adjust_rp = AsyncMock(return_value="new-uuid")
+        self.controller.configure_rp_boot = AsyncMock()
+
+        await self.controller.curtin_install(
+            context=self.controller.context, source="cp:///source"
+        )
+
+        self.assertEqual(
+            events[:3],
+            [
+                ("start", "initial"),
+                ("end", "initial"),
+                ("start", "partitioning"),
+            ],
+        )
+        self.assertLess(
+            events.index(("start", "populate recovery")),
+            events.index(("start", "curthooks")),
+        )
+        self.assertEqual(events[-1], ("end", "populate recovery"))
+        self.controller.configure_rp_boot.assert_awaited_once_with(
+            context=ANY, rp=fsc.model.reset_partition, casper_uuid="new-uuid"
+        )
+
     async def test_configure_rp_boot_grub(self):
         fsuuid, partuuid = "fsuuid", "partuuid"
         self.setup_rp_test(f"{fsuuid}\t{partuuid}".encode("ascii"))
@@ -273,6 +485,79 @@ class TestInstallController(unittest.IsolatedAsyncioTestCase):
             cfg = fp.read()
         self.assertIn("--fs-uuid fsuuid", cfg)
 
+    async def test_download_updates(self):
+        run_curtin = "subiquity.server.controllers.install.run_curtin_command"
+        downloader = "subiquity.server.controllers.install.PackageDownloader"
+        self.controller.app.opts.dry_run = False
+        output = (
+            b"'http://mirror/pool/main/a/apt/apt_2.8_amd64.deb'"
+            b" apt_2.8_amd64.deb 10 SHA256:ab\n"
+        )
+        with patch(run_curtin, return_value=Mock(stdout=output)) as m_run:
+            with patch(downloader) as m_downloader:
+                m_downloader.return_value.download = AsyncMock()
+                await self.controller.download_updates(policy="all")
+        self.assertIn("--print-uris", m_run.call_args.args)
+        [[context, items, archives], _] = m_downloader.return_value.download.call_args
+        self.assertEqual([item.filename for item in items], ["apt_2.8_amd64.deb"])
+        self.assertEqual(archives, self.controller.tpath("var/cache/apt/archives"))
+
+        # Failing to download the updates is not fatal.
+        error = subprocess.CalledProcessError(returncode=100, cmd="apt-get")
+        with patch(run_curtin, side_effect=error):
+            with self.assertLogs("subiquity.server.controllers.install", "ERROR"):
+                await self.controller.download_updates(policy="all")
+
+    async def test_download_updates_skipped(self):
+        run_curtin = "subiquity.server.controllers.install.run_curtin_command"
+        self.controller.app.opts.dry_run = False
+        with patch(run_curtin) as m_run:
+            # Which pocket the packages come from is not known, so nothing
+            # is downloaded ahead for the security policy.
+            await self.controller.download_updates(policy="security")
+            self.controller.app.opts.dry_run = True
+            await self.controller.download_updates(policy="all")
+        m_run.assert_not_called()
+
+    async def test_postinstall_keeps_prefetched_for_drivers(self):
+        c = self.controller
+        app = c.app
+        events = []
+        c.write_autoinstall_config = Mock()
+        c.get_target_packages = AsyncMock(return_value=[])
+        c.install_packages = AsyncMock()
+        c.configure_cloud_init = AsyncMock()
+        c.restore_apt_config = AsyncMock()
+        c.platform_postinstall = AsyncMock()
+        c.prefetcher = Mock(populate=AsyncMock(return_value=["/a.deb"]))
+        c.prefetcher.cleanup.side_effect = lambda moved: events.append("cleanup")
+        app.controllers.Filesystem.use_snapd_install_api.return_value = False
+        app.controllers.Drivers.ubuntu_drivers.install_drivers = AsyncMock(
+            side_effect=lambda **kw: events.append("drivers")
+        )
+        c.model.drivers.do_install = True
+        c.model.network.has_network = False
+        c.model.active_directory.do_join = False
+
+        await c.postinstall(context=c.context)
+
+        self.assertEqual(events, ["drivers", "cleanup"])
+        c.prefetcher.cleanup.assert_called_once_with(["/a.deb"])
+
+    async def test_drivers_to_prefetch(self):
+        drivers = self.controller.app.controllers.Drivers
+        drivers.list_drivers_done_event = asyncio.Event()
+        drivers.drivers = ["nvidia-driver-550"]
+        self.controller.model.drivers.do_install = True
+        # Not waiting for the drivers to be listed.
+        self.assertEqual(await self.controller._drivers_to_prefetch(), [])
+        drivers.list_drivers_done_event.set()
+        self.assertEqual(
+            await self.controller._drivers_to_prefetch(), ["nvidia-driver-550"]
+        )
+        self.controller.model.drivers.do_install = False
+        self.assertEqual(await self.controller._drivers_to_prefetch(), [])
+
     @patch("platform.machine", return_value="s390x")
     @patch("subiquity.server.controllers.install.arun_command")
     async def test_postinstall_platform_s390x(self, arun, machine):
@@ -114,6 +114,52 @@ Ubuntu-Oem-Kernel-Flavour: oem
                 )
             )
 
+    async def test_wants_oem_kernels(self):
+        apt_cache_show_output = b"""\
+Package: oem-somerville-tentacool-meta
+Version: 22.04~ubuntu2
+Ubuntu-Oem-Kernel-Flavour: default
+
+Package: oem-somerville-tentacool-meta
+Version: 22.04~ubuntu1
+Ubuntu-Oem-Kernel-Flavour: oem
+
+Package: oem-sutton-balint-meta
+Version: 22.04~ubuntu1
+Ubuntu-Oem-Kernel-Flavour: oem
+
+Package: oem-no-flavour-meta
+Version: 22.04~ubuntu1
+
+"""
+        subprocess_return = subprocess.CompletedProcess(
+            args=[], returncode=0, stdout=apt_cache_show_output
+        )
+        pkgnames = [
+            "oem-somerville-tentacool-meta",
+            "oem-sutton-balint-meta",
+            "oem-no-flavour-meta",
+        ]
+
+        with patch(
+            "subiquity.server.controllers.oem.run_curtin_command",
+            return_value=subprocess_return,
+        ) as run_curtin:
+            wants = await self.controller.wants_oem_kernels(
+                pkgnames, context=None, overlay=Mock(mountpoint="/overlay")
+            )
+
+        run_curtin.assert_called_once()
+        self.assertEqual(run_curtin.call_args.args[-3:], tuple(pkgnames))
+        self.assertEqual(
+            wants,
+            {
+                "oem-somerville-tentacool-meta": False,
+                "oem-sutton-balint-meta": True,
+                "oem-no-flavour-meta": True,
+            },
+        )
+
     def test_valid_schema(self):
         """Test that the expected autoinstall JSON schema is valid"""
 
@@ -13,13 +13,19 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import http.server
+import json
+import os
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import jsonschema
+from curtin.reporter.events import ReportingEvent
 from curtin.reporter.events import status as CurtinStatus
 from jsonschema.validators import validator_for
 
-from subiquity.server.controllers.reporting import ReportingController
+from subiquity.server.controllers.reporting import ReportingController, WebHookHandler
 from subiquitycore.context import Context
 from subiquitycore.context import Status as ContextStatus
 from subiquitycore.tests import SubiTestCase
@@ -117,3 +123,184 @@ class TestReportingCurtinCalls(SubiTestCase):
             "description",
             level="ERROR",
         )
+
+
+class Collector:
+    """A local stand-in for a webhook endpoint.
+
+    Records the JSON body of each POST. The first `fail` requests get a
+    500 response, and requests block while `blocked` is set."""
+
+    def __init__(self, fail=0):
+        self.received = []
+        self.requests = 0
+        self.fail = fail
+        self.blocked = threading.Event()
+        collector = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                collector.requests += 1
+                while collector.blocked.is_set():
+                    time.sleep(0.01)
+                if collector.fail > 0:
+                    collector.fail -= 1
+                    self.send_response(500)
+                else:
+                    collector.received.append(json.loads(body))
+                    self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.blocked.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_event(i):
+    return ReportingEvent("info", "subiquity/Test", f"event {i}", level="INFO")
+
+
+@patch.object(WebHookHandler, "initial_backoff", 0.01)
+class TestWebHookHandler(SubiTestCase):
+    def make_handler(self, collector, **kw):
+        handler = WebHookHandler(collector.url, **kw)
+        self.addCleanup(handler.close)
+        return handler
+
+    def make_collector(self, **kw):
+        collector = Collector(**kw)
+        self.addCleanup(collector.close)
+        return collector
+
+    def descriptions(self, collector):
+        return [event["description"] for event in collector.received]
+
+    def test_does_not_block(self):
+        collector = self.make_collector()
+        collector.blocked.set()
+        handler = self.make_handler(collector)
+        start = time.monotonic()
+        for i in range(10):
+            handler.publish_event(make_event(i))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(handler.pending(), 10)
+        collector.blocked.clear()
+        self.assertTrue(handler.flush(10))
+        self.assertEqual(
+            self.descriptions(collector), [f"event {i}" for i in range(10)]
+        )
+
+    def test_retry(self):
+        collector = self.make_collector(fail=3)
+        handler = self.make_handler(collector)
+        for i in range(2):
+            handler.publish_event(make_event(i))
+        self.assertTrue(handler.flush(10))
+        self.assertEqual(self.descriptions(collector), ["event 0", "event 1"])
+
+    @patch.object(WebHookHandler, "max_attempts", 2)
+    def test_give_up(self):
+        collector = self.make_collector(fail=2)
+        handler = self.make_handler(collector)
+        for i in range(2):
+            handler.publish_event(make_event(i))
+        with self.assertLogs("subiquity.server.controllers.reporting", "WARNING"):
+            self.assertTrue(handler.flush(10))
+        # The first event failed twice and was dropped.
+        self.assertEqual(self.descriptions(collector), ["event 1"])
+
+    def test_spill(self):
+        spill_file = os.path.join(self.tmp_dir(), "reporting", "hook.spill")
+        collector = self.make_collector()
+        collector.blocked.set()
+        handler = self.make_handler(collector, queue_size=2, spill_file=spill_file)
+        written = []
+        write_spill = handler._write_spill
+
+        def _write_spill(events):
+            written.append((threading.current_thread(), len(events)))
+            write_spill(events)
+
+        handler._write_spill = _write_spill
+        handler.publish_event(make_event(0))
+        while collector.requests == 0:
+            time.sleep(0.01)
+        for i in range(1, 6):
+            handler.publish_event(make_event(i))
+        self.assertEqual(handler.pending(), 6)
+        # The events are written to the spill file by the sender thread, not
+        # by publish_event().
+        self.assertFalse(os.path.exists(spill_file))
+        collector.blocked.clear()
+        self.assertTrue(handler.flush(10))
+        self.assertEqual(self.descriptions(collector), [f"event {i}" for i in range(6)])
+        self.assertEqual(written, [(handler._thread, 4)])
+        self.assertFalse(os.path.exists(spill_file))
+
+    @patch.object(WebHookHandler, "max_spill", 2)
+    def test_spill_limit(self):
+        spill_file = os.path.join(self.tmp_dir(), "hook.spill")
+        collector = self.make_collector()
+
+        def publish(first, last):
+            collector.blocked.set()
+            requests = collector.requests
+            handler.publish_event(make_event(first))
+            while collector.requests == requests:
+                time.sleep(0.01)
+            for i in range(first + 1, last):
+                handler.publish_event(make_event(i))
+
+        handler = self.make_handler(collector, queue_size=2, spill_file=spill_file)
+        publish(0, 6)
+        self.assertEqual(handler.pending(), 4)
+        collector.blocked.clear()
+        self.assertTrue(handler.flush(10))
+        self.assertEqual(self.descriptions(collector), [f"event {i}" for i in range(4)])
+
+        # Once the spill file has drained, events are spilled again.
+        publish(6, 10)
+        self.assertEqual(handler.pending(), 4)
+        collector.blocked.clear()
+        self.assertTrue(handler.flush(10))
+        self.assertEqual(len(collector.received), 8)
+
+    def test_drop_without_spill_file(self):
+        collector = self.make_collector()
+        collector.blocked.set()
+        handler = self.make_handler(collector, queue_size=2)
+        handler.publish_event(make_event(0))
+        while collector.requests == 0:
+            time.sleep(0.01)
+        for i in range(1, 5):
+            handler.publish_event(make_event(i))
+        self.assertEqual(handler.pending(), 2)
+        collector.blocked.clear()
+        self.assertTrue(handler.flush(10))
+        # The event being posted when the queue filled up is still sent.
+        self.assertEqual(
+            self.descriptions(collector), ["event 0", "event 3", "event 4"]
+        )
+
+    def test_batch(self):
+        collector = self.make_collector()
+        collector.blocked.set()
+        handler = self.make_handler(collector, batch_size=3)
+        for i in range(5):
+            handler.publish_event(make_event(i))
+        collector.blocked.clear()
+        self.assertTrue(handler.flush(10))
+        batches = [[e["description"] for e in batch] for batch in collector.received]
+        self.assertEqual(sum(batches, []), [f"event {i}" for i in range(5)])
+        self.assertLessEqual(max(len(batch) for batch in batches), 3)
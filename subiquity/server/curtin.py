@@ -21,16 +21,72 @@ import os
 import re
 import subprocess
 import sys
-from typing import Dict, List, Type
+from typing import Dict, List, Optional, Tuple, Type
 
 import yaml
 
-from subiquity.journald import journald_listen
+from subiquity.journald import journald_listen_batched
 from subiquitycore.context import Context, Status
 
 log = logging.getLogger("subiquity.server.curtin")
 
 
+class _ContextTrie:
+    """Contexts for curtin events, stored by the path of the event name.
+
+    longest_prefix finds the context whose name is the longest prefix
+    (in whole path components) of a given name, without having to try
+    every prefix in turn."""
+
+    def __init__(self):
+        self.context: Optional[Context] = None
+        self.children: Dict[str, "_ContextTrie"] = {}
+
+    @staticmethod
+    def _parts(name: str) -> List[str]:
+        if name == "":
+            return []
+        return name.split("/")
+
+    def insert(self, name: str, context: Context) -> None:
+        node = self
+        for part in self._parts(name):
+            node = node.children.setdefault(part, _ContextTrie())
+        node.context = context
+
+    def remove(self, name: str) -> None:
+        path = [self]
+        for part in self._parts(name):
+            node = path[-1].children.get(part)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].context = None
+        # Prune nodes that no longer lead to any context.
+        for part, node, parent in zip(
+            reversed(self._parts(name)), reversed(path), reversed(path[:-1])
+        ):
+            if node.context is not None or node.children:
+                break
+            del parent.children[part]
+
+    def longest_prefix(self, name: str) -> Tuple[Optional[Context], str]:
+        """Return the context for the longest prefix of name and the rest
+        of name, or (None, name) if there is no such context."""
+        parts = self._parts(name)
+        node = self
+        best, best_depth = self.context, 0
+        for depth, part in enumerate(parts, start=1):
+            node = node.children.get(part)
+            if node is None:
+                break
+            if node.context is not None:
+                best, best_depth = node.context, depth
+        if best is None:
+            return None, name
+        return best, "/".join(parts[best_depth:])
+
+
 class _CurtinCommand:
     _count = 0
 
@@ -40,16 +96,23 @@ class _CurtinCommand:
         self.opts = opts
         self.runner = runner
         self._event_contexts: Dict[str, Context] = {}
+        self._context_trie = _ContextTrie()
+        # Set when no curtin contexts are left open.
+        self._drained = asyncio.Event()
         _CurtinCommand._count += 1
         self._event_syslog_id = "curtin_event.%s.%s" % (
             os.getpid(),
             _CurtinCommand._count,
         )
-        self._fd = None
+        self._listener = None
         self.proc = None
         self._cmd = self.make_command(command, *args, config=config)
         self.private_mounts = private_mounts
 
+    def _events(self, events):
+        for event in events:
+            self._event(event)
+
     def _event(self, event):
         e = {
             "EVENT_TYPE": "???",
@@ -63,27 +126,31 @@ class _CurtinCommand:
                 e[k[len(prefix) :]] = v
         event_type = e["EVENT_TYPE"]
         if event_type == "start":
-
-            def p(name):
-                parts = name.split("/")
-                for i in range(len(parts), -1, -1):
-                    yield "/".join(parts[:i]), "/".join(parts[i:])
-
-            curtin_ctx = None
-            for pre, post in p(e["NAME"]):
-                if pre in self._event_contexts:
-                    parent = self._event_contexts[pre]
-                    curtin_ctx = parent.child(post, e["MESSAGE"])
-                    self._event_contexts[e["NAME"]] = curtin_ctx
-                    break
-            if curtin_ctx:
+            parent, post = self._context_trie.longest_prefix(e["NAME"])
+            if parent is not None:
+                curtin_ctx = parent.child(post, e["MESSAGE"])
+                self._add_context(e["NAME"], curtin_ctx)
                 curtin_ctx.enter()
         if event_type == "finish":
             status = getattr(Status, e["RESULT"], Status.WARN)
-            curtin_ctx = self._event_contexts.pop(e["NAME"], None)
+            curtin_ctx = self._remove_context(e["NAME"])
             if curtin_ctx is not None:
                 curtin_ctx.exit(result=status)
 
+    def _add_context(self, name: str, context: Context) -> None:
+        self._event_contexts[name] = context
+        self._context_trie.insert(name, context)
+        if len(self._event_contexts) > 1:
+            self._drained.clear()
+
+    def _remove_context(self, name: str) -> Optional[Context]:
+        context = self._event_contexts.pop(name, None)
+        if context is not None:
+            self._context_trie.remove(name)
+        if len(self._event_contexts) <= 1:
+            self._drained.set()
+        return context
+
     def make_command(self, command: str, *args: str, config=None) -> List[str]:
         reporting_conf = {
             "subiquity": {
@@ -112,24 +179,43 @@ class _CurtinCommand:
         return cmd
 
     async def start(self, context, **opts):
-        self._fd = journald_listen([self._event_syslog_id], self._event)
+        self._listener = journald_listen_batched(
+            [self._event_syslog_id], self._events, fields=["CURTIN_"]
+        )
         # Yield to the event loop before starting curtin to avoid missing the
         # first couple of events.
         await asyncio.sleep(0)
-        self._event_contexts[""] = context
+        self._add_context("", context)
+        self._drained.set()
         self.proc = await self.runner.start(
             self._cmd, **opts, private_mounts=self.private_mounts
         )
 
     async def wait(self):
-        result = await self.runner.wait(self.proc)
-        waited = 0.0
-        while len(self._event_contexts) > 1 and waited < 5.0:
-            await asyncio.sleep(0.1)
-            waited += 0.1
-            log.debug("waited %s seconds for events to drain", waited)
-        self._event_contexts.pop("", None)
-        asyncio.get_running_loop().remove_reader(self._fd)
+        try:
+            result = await self.runner.wait(self.proc)
+        except asyncio.CancelledError:
+            self._remove_context("")
+            self._listener.close()
+            raise
+        # curtin has exited but the journal may still have events for us to
+        # read, wait (for a bit) until every context it started has finished.
+        if not self._drained.is_set():
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            try:
+                await asyncio.wait_for(self._drained.wait(), 5.0)
+            except asyncio.TimeoutError:
+                log.debug(
+                    "gave up waiting for events to drain, %d contexts left open",
+                    len(self._event_contexts) - 1,
+                )
+            else:
+                log.debug(
+                    "waited %.3f seconds for events to drain", loop.time() - start
+                )
+        self._remove_context("")
+        self._listener.close()
         return result
 
     async def run(self, context):
@@ -0,0 +1,199 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+import attr
+
+log = logging.getLogger("subiquity.server.download")
+
+# apt's names for the hashes it prints, and hashlib's.
+_HASHES = {
+    "SHA512": "sha512",
+    "SHA256": "sha256",
+    "SHA1": "sha1",
+    "MD5Sum": "md5",
+}
+
+
+@attr.s(auto_attribs=True)
+class DownloadItem:
+    uri: str
+    filename: str
+    size: int
+    # As apt prints it, e.g. "SHA512:0123...", or "" if there is none.
+    hash: str = ""
+
+
+def parse_print_uris(output: str) -> List[DownloadItem]:
+    """Parse the output of apt-get --print-uris, which has a line for each
+    file apt would download like:
+
+    'http://archive.ubuntu.com/ubuntu/pool/main/a/apt/apt_2.7.14_amd64.deb' \
+apt_2.7.14_amd64.deb 1390822 SHA512:0123...
+    """
+    items = []
+    for line in output.splitlines():
+        if not line.startswith("'"):
+            continue
+        uri, _, rest = line[1:].partition("' ")
+        fields = rest.split()
+        if len(fields) < 2:
+            continue
+        items.append(
+            DownloadItem(
+                uri=uri,
+                filename=fields[0],
+                size=int(fields[1]),
+                hash=fields[2] if len(fields) > 2 else "",
+            )
+        )
+    return items
+
+
+class DownloadProgress:
+    """Counts the bytes downloaded and reports them as an info event on
+    context, at most every interval seconds."""
+
+    def __init__(self, context, total: int, interval: float):
+        self.context = context
+        self.total = total
+        self.done = 0
+        self.interval = interval
+        self._last_report: Optional[float] = None
+
+    def message(self) -> str:
+        percent = 100 * self.done // self.total if self.total else 100
+        return (
+            f"downloaded {self.done / 1e6:.1f} of {self.total / 1e6:.1f} MB"
+            f" ({percent}%)"
+        )
+
+    def report(self) -> None:
+        self._last_report = time.monotonic()
+        self.context.info(self.message())
+
+    def add(self, size: int) -> None:
+        self.done += size
+        if (
+            self._last_report is None
+            or time.monotonic() - self._last_report >= self.interval
+        ):
+            self.report()
+
+    def skip(self, size: int, received: int) -> None:
+        # A file that failed to download no longer counts.
+        self.total -= size
+        self.done -= received
+
+
+class PackageDownloader:
+    """Downloads packages into an apt archive directory, several at a time,
+    reporting the progress in bytes on a context.
+
+    Downloading is only an optimization: apt checks the files it finds in
+    the archive against the package lists and downloads any that are
+    missing or do not match. So failures are logged and the file skipped."""
+
+    def __init__(self, app, *, max_concurrency: int = 4, report_interval: float = 1.0):
+        self.app = app
+        self.max_concurrency = max_concurrency
+        self.report_interval = report_interval
+
+    def _wanted(self, item: DownloadItem, archives: str) -> bool:
+        if urlparse(item.uri).scheme not in ("http", "https"):
+            # Such as file:///cdrom, which apt copies from itself.
+            return False
+        try:
+            size = os.stat(os.path.join(archives, item.filename)).st_size
+        except FileNotFoundError:
+            return True
+        return size != item.size
+
+    async def download(
+        self, context, items: List[DownloadItem], archives: str
+    ) -> List[str]:
+        """Download items into archives. Return the paths of the files that
+        were downloaded."""
+        items = [item for item in items if self._wanted(item, archives)]
+        if not items:
+            return []
+        os.makedirs(os.path.join(archives, "partial"), exist_ok=True)
+        progress = DownloadProgress(
+            context, sum(item.size for item in items), self.report_interval
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        proxy = self.app.base_model.proxy.proxy or None
+        timeout = aiohttp.ClientTimeout(sock_connect=30, sock_read=60)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            paths = await asyncio.gather(
+                *(
+                    self._fetch(session, semaphore, proxy, item, archives, progress)
+                    for item in items
+                )
+            )
+        progress.report()
+        return [path for path in paths if path is not None]
+
+    async def _fetch(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        proxy: Optional[str],
+        item: DownloadItem,
+        archives: str,
+        progress: DownloadProgress,
+    ) -> Optional[str]:
+        algorithm, _, expected = item.hash.partition(":")
+        hasher = hashlib.new(_HASHES[algorithm]) if algorithm in _HASHES else None
+        tmp = os.path.join(archives, "partial", item.filename)
+        dest = os.path.join(archives, item.filename)
+        received = 0
+        async with semaphore:
+            try:
+                async with session.get(item.uri, proxy=proxy) as resp:
+                    resp.raise_for_status()
+                    with open(tmp, "wb") as fp:
+                        async for chunk in resp.content.iter_chunked(1 << 16):
+                            fp.write(chunk)
+                            if hasher is not None:
+                                hasher.update(chunk)
+                            received += len(chunk)
+                            progress.add(len(chunk))
+                if received != item.size:
+                    raise ValueError(f"expected {item.size} bytes, got {received}")
+                if hasher is not None and hasher.hexdigest() != expected:
+                    raise ValueError(f"{algorithm} mismatch")
+                os.rename(tmp, dest)
+            except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError,
+                OSError,
+                ValueError,
+            ) as exc:
+                log.warning("downloading %s failed: %r", item.uri, exc)
+                progress.skip(item.size, received)
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(tmp)
+                return None
+        return dest
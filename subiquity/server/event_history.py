@@ -0,0 +1,121 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import collections
+import itertools
+import time
+from typing import Any, Deque, Optional
+
+from subiquity.common.types import ReportingEvent, ReportingEventPage
+from subiquity.server.event_listener import EventListener
+from subiquitycore.context import Context
+
+
+class EventHistory(EventListener):
+    """Keeps the most recent reporting events in memory so that clients
+    that connect late can catch up without reading the journal.
+
+    Events for contexts created to handle API requests are not kept."""
+
+    # Upper bound on how long a single wait() call may block, so that a
+    # client cannot hold a long-poll open indefinitely.
+    max_wait = 60.0
+
+    def __init__(self, maxlen: int = 10000):
+        self.events: Deque[ReportingEvent] = collections.deque(maxlen=maxlen)
+        self.last_id = 0
+        self.new_event = asyncio.Event()
+
+    def _record(
+        self,
+        event_type: str,
+        context: Context,
+        description: str,
+        result: Optional[str] = None,
+    ) -> None:
+        if context.get("request") is not None:
+            return
+        self.last_id += 1
+        if context.parent is not None:
+            parent_id = context.parent.id
+        else:
+            parent_id = None
+        self.events.append(
+            ReportingEvent(
+                id=self.last_id,
+                timestamp=time.time(),
+                event_type=event_type,
+                context_id=context.id,
+                context_parent_id=parent_id,
+                context_name=context.full_name(),
+                level=context.level,
+                description=description or "",
+                result=result,
+            )
+        )
+        # Replace rather than clear the event, so that a waiter that has
+        # not started waiting on it yet still sees it set.
+        self.new_event.set()
+        self.new_event = asyncio.Event()
+
+    def report_start_event(self, context: Context, description: str) -> None:
+        self._record("start", context, description)
+
+    def report_finish_event(
+        self, context: Context, description: str, result: Any
+    ) -> None:
+        self._record("finish", context, description, result.name)
+
+    def report_info_event(self, context: Context, message: str) -> None:
+        self._record("info", context, message)
+
+    def report_warning_event(self, context: Context, message: str) -> None:
+        self._record("warning", context, message)
+
+    def report_error_event(self, context: Context, message: str) -> None:
+        self._record("error", context, message)
+
+    def get(self, since: int = 0, limit: int = 1000) -> ReportingEventPage:
+        """Return up to limit events with an id greater than since."""
+        since = max(since, 0)
+        if self.events:
+            first_id = self.events[0].id
+        else:
+            first_id = self.last_id + 1
+        missed = max(first_id - since - 1, 0)
+        # Ids are consecutive, so the position of the first event to
+        # return can be computed rather than searched for.
+        start = max(since + 1 - first_id, 0)
+        events = list(itertools.islice(self.events, start, start + max(limit, 0)))
+        if events:
+            last = events[-1].id
+        else:
+            last = since
+        return ReportingEventPage(events=events, last=last, missed=missed)
+
+    async def wait(
+        self, since: int = 0, limit: int = 1000, timeout: float = 0
+    ) -> ReportingEventPage:
+        """Like get, but if there are no events after since, wait up to
+        timeout seconds (capped at max_wait) for one to be reported."""
+        timeout = min(timeout, self.max_wait)
+        if since >= self.last_id and timeout > 0:
+            new_event = self.new_event
+            try:
+                await asyncio.wait_for(new_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(since, limit)
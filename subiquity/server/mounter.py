@@ -18,9 +18,10 @@ import functools
 import logging
 import os
 import shutil
+import subprocess
 import tempfile
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 import attr
 
@@ -87,6 +88,12 @@ class OverlayMountpoint(_MountBase):
 Lower = Union[Mountpoint, str, OverlayMountpoint]
 
 
+def _fstab_escape(path: str) -> str:
+    # fstab fields are separated by whitespace, so whitespace (and the
+    # backslash itself) in paths is written as octal escapes.
+    return "".join(f"\\{ord(c):03o}" if c in " \t\n\\" else c for c in str(path))
+
+
 @functools.singledispatch
 def lowerdir_for(x):
     """Return value suitable for passing to the lowerdir= overlayfs option."""
@@ -121,24 +128,28 @@ class Mounter:
         self.tmpfiles = TmpFileSet()
         self._mounts: List[Mountpoint] = []
 
+    @staticmethod
+    def _prepare_mountpoint(device, mountpoint, options) -> Tuple[str, bool]:
+        """Create the mountpoint if needed. Returns the mountpoint and
+        whether it was created."""
+        if mountpoint is None:
+            return tempfile.mkdtemp(), True
+        if os.path.exists(mountpoint):
+            return mountpoint, False
+        path = Path(device)
+        if options == "bind" and not path.is_dir():
+            Path(mountpoint).touch(exist_ok=False)
+        else:
+            os.makedirs(mountpoint, exist_ok=False)
+        return mountpoint, True
+
     async def mount(self, device, mountpoint=None, options=None, type=None):
         opts = []
         if options is not None:
             opts.extend(["-o", options])
         if type is not None:
             opts.extend(["-t", type])
-        if mountpoint is None:
-            mountpoint = tempfile.mkdtemp()
-            created = True
-        elif os.path.exists(mountpoint):
-            created = False
-        else:
-            path = Path(device)
-            if options == "bind" and not path.is_dir():
-                Path(mountpoint).touch(exist_ok=False)
-            else:
-                os.makedirs(mountpoint, exist_ok=False)
-            created = True
+        mountpoint, created = self._prepare_mountpoint(device, mountpoint, options)
         await self.app.command_runner.run(
             ["mount"] + opts + [device, mountpoint], private_mounts=False
         )
@@ -146,19 +157,68 @@ class Mounter:
         self._mounts.append(m)
         return m
 
+    async def bind_mount_all(self, binds: List[Tuple[str, str]]) -> None:
+        """bind-mount each (source, destination) pair in binds, with a
+        single mount command rather than one for each."""
+        if not binds:
+            return
+        mounts = []
+        try:
+            lines = []
+            for src, dst in binds:
+                dst, created = self._prepare_mountpoint(src, dst, "bind")
+                mounts.append(Mountpoint(mountpoint=dst, created=created))
+                lines.append(
+                    f"{_fstab_escape(src)} {_fstab_escape(dst)} none bind 0 0\n"
+                )
+            with tempfile.TemporaryDirectory() as tdir:
+                fstab = os.path.join(tdir, "fstab")
+                with open(fstab, "w") as fp:
+                    fp.write("".join(lines))
+                await self.app.command_runner.run(
+                    ["mount", "--all", "--fstab", fstab], private_mounts=False
+                )
+        except BaseException:
+            # mount --all carries on past a failing entry, so some of the
+            # binds may be in place. Undo them all; umount fails for the
+            # ones that are not.
+            with contextlib.suppress(subprocess.CalledProcessError):
+                await self._unmount_all(list(reversed(mounts)))
+            raise
+        self._mounts.extend(mounts)
+
+    @staticmethod
+    def _remove_mountpoint(mountpoint: Mountpoint) -> None:
+        if mountpoint.created:
+            path = Path(mountpoint.mountpoint)
+            with contextlib.suppress(OSError):
+                if path.is_dir():
+                    path.rmdir()
+                else:
+                    path.unlink(missing_ok=True)
+
+    async def _unmount_all(self, mounts: List[Mountpoint]) -> None:
+        """Unmount mounts, in the order given, with a single (lazy, so that
+        nothing still using one of the mounts makes it fail) umount command
+        and remove the mountpoints that were created for them, even if the
+        umount command fails."""
+        try:
+            if mounts:
+                await self.app.command_runner.run(
+                    ["umount", "--lazy"] + [m.mountpoint for m in mounts],
+                    private_mounts=False,
+                )
+        finally:
+            for m in mounts:
+                self._remove_mountpoint(m)
+
     async def unmount(self, mountpoint: Mountpoint, remove=True):
         if remove:
             self._mounts.remove(mountpoint)
         await self.app.command_runner.run(
             ["umount", mountpoint.mountpoint], private_mounts=False
         )
-        if mountpoint.created:
-            path = Path(mountpoint.mountpoint)
-            if path.is_dir():
-                with contextlib.suppress(OSError):
-                    path.rmdir()
-            else:
-                path.unlink(missing_ok=True)
+        self._remove_mountpoint(mountpoint)
 
     async def setup_overlay(self, lowers: List[Lower]) -> OverlayMountpoint:
         """Setup a RW overlay FS over one or more lower layers.
@@ -185,9 +245,12 @@ class Mounter:
         return OverlayMountpoint(lowers=lowers, mountpoint=mount.p(), upperdir=upperdir)
 
     async def cleanup(self):
-        for m in reversed(self._mounts):
-            await self.unmount(m, remove=False)
-        self.tmpfiles.cleanup()
+        mounts = list(reversed(self._mounts))
+        self._mounts = []
+        try:
+            await self._unmount_all(mounts)
+        finally:
+            self.tmpfiles.cleanup()
 
     async def bind_mount_tree(self, src, dst):
         """bind-mount files and directories from src that are not already
@@ -195,6 +258,7 @@ class Mounter:
         if not os.path.exists(dst):
             await self.mount(src, dst, options="bind")
             return
+        binds = []
         for src_dirpath, dirnames, filenames in os.walk(src):
             dst_dirpath = src_dirpath.replace(src, dst)
             for name in dirnames + filenames:
@@ -202,9 +266,10 @@ class Mounter:
                 if os.path.exists(dst_path):
                     continue
                 src_path = os.path.join(src_dirpath, name)
-                await self.mount(src_path, dst_path, options="bind")
+                binds.append((src_path, dst_path))
                 if name in dirnames:
                     dirnames.remove(name)
+        await self.bind_mount_all(binds)
 
     @contextlib.asynccontextmanager
     async def mounted(self, device, mountpoint=None, options=None, type=None):
@@ -0,0 +1,162 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import glob
+import logging
+import os
+import shutil
+from typing import Awaitable, Callable, List, Optional
+
+from subiquity.server.apt import OverlayCleanupError
+from subiquity.server.curtin import run_curtin_command
+from subiquitycore.async_helpers import run_in_thread
+from subiquitycore.context import with_context
+
+log = logging.getLogger("subiquity.server.prefetch")
+
+
+class PackagePrefetcher:
+    """Downloads the packages that will be installed in postinstall while the
+    earlier steps of the install run.
+
+    The packages are downloaded in an overlay of the configured source and
+    the .deb files moved to a cache on the live system. Once the target is
+    ready, populate() moves them into its apt archive, so installing the
+    packages only has to unpack them (apt checks the files against the
+    package lists and downloads any that do not match). The files are moved
+    rather than copied as the live system keeps them in memory. Prefetching
+    is only an optimization, so failures are logged and otherwise ignored."""
+
+    # How long populate() waits for a prefetch still in progress before
+    # giving up on it and leaving apt to download the packages.
+    populate_timeout = 300.0
+
+    def __init__(self, app):
+        self.app = app
+        self.context = app.context
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cache_dir(self) -> str:
+        return self.app.state_path("prefetch")
+
+    def start(self, *batches: Callable[[], Awaitable[List[str]]]) -> None:
+        """Prefetch the packages each of batches returns, one batch after
+        the other, so that a batch that takes a while to work out does not
+        hold up the ones before it."""
+        self.cancel()
+        self._task = asyncio.create_task(self._run(batches))
+
+    def cancel(self) -> None:
+        """Stop any prefetch in progress and discard what was downloaded,
+        for example because the source or mirror changed."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for any prefetch in progress to finish. Return False if it
+        has not finished after timeout seconds."""
+        if self._task is not None:
+            done, pending = await asyncio.wait([self._task], timeout=timeout)
+            return not pending
+        return True
+
+    async def _run(self, batches) -> None:
+        for get_packages in batches:
+            try:
+                packages = await get_packages()
+                if packages:
+                    await self.prefetch(packages=packages)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("prefetching packages failed")
+
+    @with_context(description="prefetching packages")
+    async def prefetch(self, *, context, packages: List[str]) -> None:
+        apt = self.app.controllers.Mirror.final_apt_configurer
+        try:
+            async with apt.overlay() as d:
+                await run_curtin_command(
+                    self.app,
+                    context,
+                    "in-target",
+                    "-t",
+                    d.mountpoint,
+                    "--",
+                    "apt-get",
+                    "install",
+                    "--download-only",
+                    "--assume-yes",
+                    *packages,
+                    private_mounts=True,
+                )
+                archives = d.p("var/cache/apt/archives")
+                await run_in_thread(self._keep_debs, archives)
+        except OverlayCleanupError:
+            log.exception("Failed to cleanup overlay. Continuing anyway.")
+
+    def _keep_debs(self, archives: str) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for deb in glob.glob(os.path.join(archives, "*.deb")):
+            shutil.move(deb, os.path.join(self.cache_dir, os.path.basename(deb)))
+
+    async def populate(self, target: str) -> List[str]:
+        """Wait for the prefetch to finish and move the downloaded packages
+        into the apt archive of target. Return the paths they were moved to.
+        If the prefetch does not finish within populate_timeout, it is
+        cancelled and nothing is moved."""
+        task = self._task
+        if not await self.wait(self.populate_timeout):
+            log.warning(
+                "prefetching packages did not finish after %s seconds, giving up",
+                self.populate_timeout,
+            )
+            # Let the download stop before apt downloads the packages itself.
+            task.cancel()
+            await asyncio.wait([task])
+            self.cancel()
+            return []
+        return await run_in_thread(self._populate, target)
+
+    def _populate(self, target: str) -> List[str]:
+        archives = os.path.join(target, "var/cache/apt/archives")
+        moved = []
+        for deb in glob.glob(os.path.join(self.cache_dir, "*.deb")):
+            dest = os.path.join(archives, os.path.basename(deb))
+            if os.path.exists(dest):
+                continue
+            try:
+                os.makedirs(archives, exist_ok=True)
+                shutil.move(deb, dest)
+            except OSError:
+                log.exception("moving %s to the target failed", deb)
+                continue
+            moved.append(dest)
+        log.debug("moved %d prefetched packages to the target", len(moved))
+        return moved
+
+    def cleanup(self, moved: List[str]) -> None:
+        """Remove the packages populate() moved to the target (apt leaves
+        them in the archive) and the cache."""
+        for path in moved:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,173 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Tools for finding out what the server is spending its time on.
+
+SamplingProfiler periodically records the stack of every thread and writes
+the counts in the "collapsed stack" format used by flamegraph.pl, speedscope
+and similar tools. SlowCallbackWatchdog logs the stack of the event loop
+thread when a single callback blocks the loop for too long.
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Counter, Dict, Optional
+
+log = logging.getLogger("subiquity.server.profiler")
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads from a background thread.
+
+    Only sys._current_frames() is used, so the overhead is a short pause of
+    the other threads every interval seconds and nothing in between."""
+
+    # Sampling more often than this would keep the GIL from the event loop.
+    min_interval = 0.001
+
+    def __init__(self) -> None:
+        self.counts: Counter[str] = collections.Counter()
+        self.samples = 0
+        self._names: Dict[object, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval: float = 0.01) -> None:
+        """Start sampling every interval seconds (at least min_interval).
+        Raises ValueError if interval is not positive."""
+        if not interval > 0:
+            raise ValueError(f"profiling interval must be positive, not {interval}")
+        if self._thread is not None:
+            return
+        interval = max(interval, self.min_interval)
+        self.counts.clear()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(interval,),
+            name="subiquity-profiler",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            filename = os.path.basename(code.co_filename)
+            name = self._names[code] = f"{code.co_name} ({filename})"
+        return name
+
+    def _run(self, interval: float) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(interval):
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f"thread-{ident}"))
+                stack.reverse()
+                self.counts[";".join(stack)] += 1
+            self.samples += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as fp:
+            for stack, count in sorted(self.counts.items()):
+                fp.write(f"{stack} {count}\n")
+
+
+class SlowCallbackWatchdog:
+    """Logs the stack of the event loop thread whenever a callback runs for
+    longer than threshold seconds.
+
+    A callback scheduled on the loop records a heartbeat; a background
+    thread that notices the heartbeat is late grabs the stack of the loop
+    thread while the slow callback is still running. This works without
+    putting the loop in debug mode, which is too expensive to leave on."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float) -> None:
+        self.loop = loop
+        self.threshold = threshold
+        self._interval = threshold / 2
+        self._last_beat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._loop_thread: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start watching. Must be called from the loop's thread."""
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(
+            target=self._watch, name="subiquity-watchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _beat(self) -> None:
+        now = time.monotonic()
+        if self._reported_beat == self._last_beat:
+            blocked = now - self._last_beat - self._interval
+            log.warning("event loop was blocked for %.3fs", blocked)
+        self._last_beat = now
+        self._handle = self.loop.call_later(self._interval, self._beat)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self._interval):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat - self._interval
+            if blocked <= self.threshold or self._reported_beat == last_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self._reported_beat = last_beat
+            log.warning(
+                "event loop blocked for more than %.3fs in:\n%s",
+                blocked,
+                "".join(traceback.format_stack(frame)),
+            )
@@ -17,10 +17,11 @@ import asyncio
 import os
 import random
 import subprocess
+import uuid
 from contextlib import suppress
 from typing import List, Optional
 
-from subiquitycore.utils import astart_command
+from subiquitycore.utils import arun_command, astart_command
 
 
 class LoggedCommandRunner:
@@ -42,7 +43,11 @@ class LoggedCommandRunner:
             self.use_systemd_user = os.geteuid() != 0
 
     def _forge_systemd_cmd(
-        self, cmd: List[str], private_mounts: bool, capture: bool
+        self,
+        cmd: List[str],
+        private_mounts: bool,
+        capture: bool,
+        unit: Optional[str] = None,
     ) -> List[str]:
         """Return the supplied command prefixed with the systemd-run stuff."""
         prefix = [
@@ -52,6 +57,10 @@ class LoggedCommandRunner:
             "--property",
             f"SyslogIdentifier={self.ident}",
         ]
+        if unit is not None:
+            # --collect so that the name can be reused even if the unit
+            # failed.
+            prefix.extend((f"--unit={unit}", "--collect"))
         if private_mounts:
             prefix.extend(("--property", "PrivateMounts=yes"))
         if self.use_systemd_user:
@@ -76,19 +85,43 @@ class LoggedCommandRunner:
         *,
         private_mounts: bool = False,
         capture: bool = False,
+        unit: Optional[str] = None,
         **astart_kwargs,
     ) -> asyncio.subprocess.Process:
+        """Start cmd in a transient unit. If unit is None, the unit gets a
+        name of its own, so that it can be stopped if waiting for it is
+        cancelled."""
+        if unit is None:
+            unit = f"subiquity-run-{uuid.uuid4().hex[:12]}"
         forged: List[str] = self._forge_systemd_cmd(
-            cmd, private_mounts=private_mounts, capture=capture
+            cmd, private_mounts=private_mounts, capture=capture, unit=unit
         )
         proc = await astart_command(forged, **astart_kwargs)
         proc.args = forged
+        proc.unit = unit
         return proc
 
+    async def stop_unit(self, unit: str) -> None:
+        """Stop the transient unit named unit, if it is running. This waits
+        until the command in the unit has exited."""
+        cmd = ["systemctl"]
+        if self.use_systemd_user:
+            cmd.append("--user")
+        cmd.extend(("stop", "--", f"{unit}.service"))
+        await arun_command(cmd)
+
     async def wait(
         self, proc: asyncio.subprocess.Process
     ) -> subprocess.CompletedProcess:
-        stdout, stderr = await proc.communicate()
+        """Wait for a command started with start() to exit. If this is
+        cancelled, the command is stopped before CancelledError is raised:
+        cancelling systemd-run alone would leave the unit running."""
+        try:
+            stdout, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            await self.stop_unit(proc.unit)
+            await proc.wait()
+            raise
         # .communicate() forces returncode to be set to a value
         assert proc.returncode is not None
         if proc.returncode != 0:
@@ -113,7 +146,7 @@ class DryRunCommandRunner(LoggedCommandRunner):
         self.delay = delay
 
     def _forge_systemd_cmd(
-        self, cmd: List[str], private_mounts: bool, capture: bool
+        self, cmd: List[str], private_mounts: bool, capture: bool, **kw
     ) -> List[str]:
         if "scripts/replay-curtin-log.py" in cmd:
             # We actually want to run this command
@@ -122,7 +155,7 @@ class DryRunCommandRunner(LoggedCommandRunner):
             prefixed_command = ["echo", "not running:"] + cmd
 
         return super()._forge_systemd_cmd(
-            prefixed_command, private_mounts=private_mounts, capture=capture
+            prefixed_command, private_mounts=private_mounts, capture=capture, **kw
         )
 
     def _get_delay_for_cmd(self, cmd: List[str]) -> float:
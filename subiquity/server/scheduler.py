@@ -0,0 +1,97 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+import attr
+
+log = logging.getLogger("subiquity.server.scheduler")
+
+StepFunc = Callable[..., Awaitable[None]]
+
+
+@attr.s(auto_attribs=True)
+class Step:
+    name: str
+    func: StepFunc
+    after: List[str]
+    description: str = ""
+
+
+class StepScheduler:
+    """Runs a set of install steps, each as soon as the steps it depends on
+    have finished, with at most max_concurrency of them running at once.
+
+    Each step runs in a child context of the context passed in, so the
+    steps, including those that overlap, show up in the event reporting as
+    usual. Steps can only depend on steps that have already been added, so
+    the dependencies cannot form a cycle. If a step fails, the steps that
+    are running are cancelled, no more are started and run() raises the
+    exception of the failed step once the cancelled steps have finished.
+    Cancelling a step that is waiting for a command stops the command (see
+    LoggedCommandRunner.wait), so nothing a step started is left running.
+    Steps that run at the same time must not share files such as curtin's
+    log_file."""
+
+    def __init__(self, context, *, max_concurrency: int = 2):
+        self.context = context
+        self.max_concurrency = max_concurrency
+        self.steps: Dict[str, Step] = {}
+
+    def add(
+        self,
+        name: str,
+        func: StepFunc,
+        *,
+        after: Iterable[Optional[str]] = (),
+        description: str = "",
+    ) -> str:
+        """Add a step. func is called with the step's context as the context
+        keyword argument. Names in after that are None are ignored, to make
+        optional dependencies easy to express. Returns name."""
+        if name in self.steps:
+            raise ValueError(f"duplicate step {name!r}")
+        deps = [dep for dep in after if dep is not None]
+        for dep in deps:
+            if dep not in self.steps:
+                raise ValueError(f"step {name!r} depends on unknown step {dep!r}")
+        self.steps[name] = Step(
+            name=name, func=func, after=deps, description=description
+        )
+        return name
+
+    async def run(self) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        done: Dict[str, asyncio.Event] = {name: asyncio.Event() for name in self.steps}
+
+        async def run_step(step: Step) -> None:
+            for dep in step.after:
+                await done[dep].wait()
+            async with semaphore:
+                log.debug("starting install step %s", step.name)
+                with self.context.child(step.name, step.description) as context:
+                    await step.func(context=context)
+            done[step.name].set()
+
+        tasks = [asyncio.create_task(run_step(step)) for step in self.steps.values()]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                await fut
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
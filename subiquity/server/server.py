@@ -25,7 +25,6 @@ import jsonschema
 import yaml
 from aiohttp import web
 from jsonschema.exceptions import ValidationError
-from systemd import journal
 
 from subiquity.cloudinit import (
     CloudInitSchemaTopLevelKeyError,
@@ -35,11 +34,13 @@ from subiquity.cloudinit import (
     rand_user_password,
     validate_cloud_init_top_level_keys,
 )
+from subiquity.common.api.metrics import APIMetrics
 from subiquity.common.api.server import bind, controller_for_request
 from subiquity.common.apidef import API
 from subiquity.common.errorreport import ErrorReport, ErrorReporter, ErrorReportKind
 from subiquity.common.serialize import to_json
 from subiquity.common.types import (
+    APIRouteMetrics,
     ApplicationState,
     ApplicationStatus,
     ErrorReportRef,
@@ -47,23 +48,29 @@ from subiquity.common.types import (
     LiveSessionSSHInfo,
     NonReportableError,
     PasswordKind,
+    ReportingEventPage,
 )
+from subiquity.journald import JournalWriter
 from subiquity.models.subiquity import ModelNames, SubiquityModel
 from subiquity.server.autoinstall import AutoinstallError, AutoinstallValidationError
 from subiquity.server.controller import SubiquityController
 from subiquity.server.dryrun import DRConfig
 from subiquity.server.errors import ErrorController
+from subiquity.server.event_history import EventHistory
 from subiquity.server.event_listener import EventListener
 from subiquity.server.geoip import DryRunGeoIPStrategy, GeoIP, HTTPGeoIPStrategy
 from subiquity.server.nonreportable import NonReportableException
 from subiquity.server.pkghelper import get_package_installer
+from subiquity.server.profiler import SamplingProfiler, SlowCallbackWatchdog
 from subiquity.server.runner import get_command_runner
 from subiquity.server.snapd.api import make_api_client
+from subiquity.server.trace import TraceRecorder
 from subiquity.server.types import InstallerChannels
 from subiquitycore.async_helpers import run_bg_task, run_in_thread
 from subiquitycore.context import Context, with_context
 from subiquitycore.core import Application
 from subiquitycore.file_util import copy_file_if_exists, write_file
+from subiquitycore.log import stop_background_logging
 from subiquitycore.prober import Prober
 from subiquitycore.snapd import AsyncSnapd, SnapdConnection, get_fake_connection
 from subiquitycore.ssh import host_key_fingerprints, user_key_fingerprints
@@ -181,6 +188,34 @@ class MetaController:
 
         return i_sections
 
+    async def metrics_GET(self) -> List[APIRouteMetrics]:
+        return self.app.api_metrics.snapshot()
+
+    async def events_GET(
+        self, since: int = 0, limit: int = 1000, wait: float = 0
+    ) -> ReportingEventPage:
+        return await self.app.event_history.wait(since, limit, wait)
+
+    async def trace_POST(self) -> Optional[str]:
+        return self.app.dump_trace()
+
+    async def profile_GET(self) -> bool:
+        return self.app.profiler.running
+
+    async def profile_POST(self, enable: bool, interval: float = 0.01) -> Optional[str]:
+        if enable:
+            self.app.profiler.start(interval)
+        elif self.app.profiler.running:
+            return self.app.dump_profile()
+        return None
+
+    async def metrics_prometheus(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.app.api_metrics.prometheus_text(),
+            content_type="text/plain",
+            headers={"x-status": "ok"},
+        )
+
 
 def get_installer_password_from_cloudinit_log():
     try:
@@ -346,7 +381,17 @@ class SubiquityServer(Application):
             log.info("no snapd socket found. Snap support is disabled")
             self.snapd = None
         self.note_data_for_apport("SnapUpdated", str(self.updated))
-        self.event_listeners: list[EventListener] = []
+        self.event_history = EventHistory()
+        self.trace_recorder = TraceRecorder()
+        self.event_listeners: list[EventListener] = [
+            self.event_history,
+            self.trace_recorder,
+        ]
+        self.api_metrics = APIMetrics()
+        self.profiler = SamplingProfiler()
+        self.profiles_written = 0
+        self.slow_callback_watchdog: Optional[SlowCallbackWatchdog] = None
+        self.journal_writer = JournalWriter()
         self.autoinstall_config = None
         self.hub.subscribe(InstallerChannels.NETWORK_UP, self._network_change)
         self.hub.subscribe(InstallerChannels.NETWORK_PROXY_SET, self._proxy_set)
@@ -397,7 +442,7 @@ class SubiquityServer(Application):
         install_context: bool = context.get("is-install-context", default=False)
         msg: str = ""
         parent_id: str = ""
-        indent: int = context.full_name().count("/") - 2
+        indent: int = context.depth - 2
 
         # We do filtering on which types of events get reported.
         # For interactive installs, we only want to report the event
@@ -450,11 +495,11 @@ class SubiquityServer(Application):
         else:
             parent_id = ""
 
-        journal.send(
+        self.journal_writer.send(
             formatted_message,
             PRIORITY=context.level,
             SYSLOG_IDENTIFIER=self.event_syslog_id,
-            SUBIQUITY_CONTEXT_NAME=context.full_name(),
+            SUBIQUITY_CONTEXT_NAME=name,
             SUBIQUITY_EVENT_TYPE=event_type,
             SUBIQUITY_CONTEXT_ID=str(context.id),
             SUBIQUITY_CONTEXT_PARENT_ID=parent_id,
@@ -781,12 +826,31 @@ class SubiquityServer(Application):
 
     async def start_api_server(self):
         app = web.Application(middlewares=[self.middleware])
-        bind(app.router, API.meta, MetaController(self))
-        bind(app.router, API.errors, ErrorController(self))
+        meta = MetaController(self)
+        bind(
+            app.router,
+            API.meta,
+            meta,
+            metrics=self.api_metrics,
+            check_signatures=self.opts.dry_run,
+        )
+        app.router.add_get("/meta/metrics/prometheus", meta.metrics_prometheus)
+        bind(
+            app.router,
+            API.errors,
+            ErrorController(self),
+            metrics=self.api_metrics,
+            check_signatures=self.opts.dry_run,
+        )
         if self.opts.dry_run:
             from .dryrun import DryRunController
 
-            bind(app.router, API.dry_run, DryRunController(self))
+            bind(
+                app.router,
+                API.dry_run,
+                DryRunController(self),
+                metrics=self.api_metrics,
+            )
         for controller in self.controllers.instances:
             controller.add_routes(app)
         runner = web.AppRunner(app, keepalive_timeout=0xFFFFFFFF, access_log=None)
@@ -1017,7 +1081,50 @@ class SubiquityServer(Application):
         else:
             self.installer_user_passwd_kind = PasswordKind.NONE
 
+    def start_profiling(self):
+        # subiquity-slow-callback=SECONDS on the kernel command line (or the
+        # slow-callbacks debug flag in dry-run mode) logs the stack of any
+        # callback that blocks the event loop for longer than that.
+        threshold = self.kernel_cmdline.get("subiquity-slow-callback")
+        if threshold is None and "slow-callbacks" in self.debug_flags:
+            threshold = 0.1
+        if threshold is not None:
+            try:
+                threshold = float(threshold)
+            except ValueError:
+                log.warning(
+                    "ignoring invalid subiquity-slow-callback=%s, "
+                    "expected a number of seconds",
+                    threshold,
+                )
+                threshold = None
+        if threshold is not None:
+            self.slow_callback_watchdog = SlowCallbackWatchdog(
+                asyncio.get_running_loop(), threshold
+            )
+            self.slow_callback_watchdog.start()
+        # subiquity-profile (or the profile debug flag) runs the sampling
+        # profiler from startup. It can also be started and stopped with
+        # /meta/profile.
+        if "subiquity-profile" in self.kernel_cmdline or "profile" in self.debug_flags:
+            self.profiler.start()
+
+    def dump_profile(self) -> Optional[str]:
+        self.profiler.stop()
+        self.profiles_written += 1
+        name = f"server-profile-{self.profiles_written}.folded"
+        path = os.path.join(self.block_log_dir, name)
+        try:
+            self.profiler.write(path)
+        except OSError:
+            log.exception("saving profile failed")
+            return None
+        self.note_file_for_apport(f"ServerProfile{self.profiles_written}", path)
+        return path
+
     async def start(self):
+        self.journal_writer.start()
+        self.start_profiling()
         self.controllers.load_all()
         await self.start_api_server()
         self.update_state(ApplicationState.CLOUD_INIT_WAIT)
@@ -1043,8 +1150,39 @@ class SubiquityServer(Application):
         await super().start()
         await self.apply_autoinstall_config()
 
+    def dump_api_metrics(self) -> None:
+        path = os.path.join(self.root, "var/log/installer/subiquity-api-metrics.json")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.api_metrics.dump(path)
+        except OSError:
+            log.exception("saving API metrics failed")
+
+    def dump_trace(self) -> Optional[str]:
+        """Write the install trace and the step timings derived from it to
+        /var/log/installer. Returns the path to the trace."""
+        log_dir = os.path.join(self.root, "var/log/installer")
+        path = os.path.join(log_dir, "trace.json")
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            self.trace_recorder.write(path)
+            self.trace_recorder.write_timings(
+                os.path.join(log_dir, "installer-timings.json")
+            )
+        except OSError:
+            log.exception("saving install trace failed")
+            return None
+        return path
+
     def exit(self):
         self.update_state(ApplicationState.EXITED)
+        self.dump_api_metrics()
+        self.dump_trace()
+        if self.profiler.running:
+            self.dump_profile()
+        if self.slow_callback_watchdog is not None:
+            self.slow_callback_watchdog.stop()
+        self.journal_writer.close()
         super().exit()
 
     def _network_change(self):
@@ -1070,6 +1208,7 @@ class SubiquityServer(Application):
                 "-m",
                 "subiquity.cmd.server",
             ] + sys.argv[1:]
+        stop_background_logging()
         os.execvp(cmdline[0], cmdline)
 
     def make_autoinstall(self):
@@ -15,6 +15,7 @@
 
 import contextlib
 import io
+import os
 import pathlib
 import subprocess
 import tempfile
@@ -71,6 +72,8 @@ class TestAptConfigurer(SubiTestCase):
         self.model.locale.selected_language = "en_US.UTF-8"
         self.app = make_app(self.model)
         self.app.command_runner = AsyncMock()
+        state_dir = self.tmp_dir()
+        self.app.state_path = lambda *parts: os.path.join(state_dir, *parts)
         self.configurer = AptConfigurer(self.app, AsyncMock(), TrivialSourceHandler(""))
 
         self.astart_sym = "subiquity.server.apt.astart_command"
@@ -143,6 +146,77 @@ class TestAptConfigurer(SubiTestCase):
                 with self.assertRaises(AptConfigCheckError):
                     await self.configurer.run_apt_config_check(output)
 
+    async def test_run_apt_config_check_lists_cache(self):
+        # The check starts from the cached Release files and adds what it
+        # fetched to the cache.
+        cached = pathlib.Path(self.tmp_dir())
+        (cached / "mirror_dists_focal_InRelease").write_text("old release")
+        (cached / "mirror_dists_focal_main_binary-amd64_Packages").touch()
+        self.configurer.lists_cache.save(str(cached))
+
+        root = pathlib.Path(self.tmp_dir())
+        self.configurer.configured_tree = OverlayMountpoint(
+            upperdir="upperdir-install-tree",
+            lowers=["lowers1-install-tree"],
+            mountpoint=root,
+        )
+        lists = root / "var/lib/apt/lists"
+        seen = []
+
+        async def astart_success(cmd, **kwargs):
+            seen.extend(sorted(os.listdir(lists)))
+            (lists / "mirror_dists_focal_InRelease").write_text("new release")
+            return await astart_command(["true"], **kwargs)
+
+        with patch(self.astart_sym, side_effect=astart_success):
+            await self.configurer.run_apt_config_check(io.StringIO())
+
+        self.assertEqual(seen, ["mirror_dists_focal_InRelease", "partial"])
+        target = pathlib.Path(self.tmp_dir())
+        self.configurer.lists_cache.restore(str(target), release_only=True)
+        self.assertEqual(
+            (target / "mirror_dists_focal_InRelease").read_text(), "new release"
+        )
+        # Only the Release files were fetched, so the other lists stay.
+        self.assertEqual(self.configurer.lists_cache.restore(str(target)), 2)
+
+    async def test_configure_for_install_lists_cache(self):
+        # The update in the install tree starts from no lists at all
+        # (LP: #2105480), so it is not seeded from the cache, but what it
+        # fetches replaces the cached lists.
+        cached = pathlib.Path(self.tmp_dir())
+        (cached / "stale_InRelease").write_text("stale")
+        self.configurer.lists_cache.save(str(cached))
+
+        root = pathlib.Path(self.tmp_dir())
+        (root / "etc/apt").mkdir(parents=True)
+        lists = root / "var/lib/apt/lists"
+        lists.mkdir(parents=True)
+        (lists / "stale_Packages").write_text("stale")
+        self.configurer.configured_tree = Mock()
+        self.configurer.mounter.setup_overlay.return_value = OverlayMountpoint(
+            upperdir=None, lowers=[], mountpoint=str(root)
+        )
+        self.model.network.has_network = True
+        seen = []
+
+        async def update(app, context, *args, **kw):
+            seen.extend(os.listdir(lists) if lists.exists() else [])
+            lists.mkdir()
+            (lists / "fresh_InRelease").write_text("fresh")
+
+        with patch("subiquity.server.apt.run_curtin_command", side_effect=update):
+            with patch(
+                "subiquity.server.apt.lsb_release",
+                return_value={"codename": "noble"},
+            ):
+                await self.configurer.configure_for_install(None)
+
+        self.assertEqual(seen, [])
+        target = pathlib.Path(self.tmp_dir())
+        self.configurer.lists_cache.restore(str(target))
+        self.assertEqual(os.listdir(target), ["fresh_InRelease"])
+
     @staticmethod
     @contextlib.contextmanager
     def naked_apt_dir():
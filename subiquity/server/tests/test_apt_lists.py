@@ -0,0 +1,145 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import concurrent.futures
+import os
+
+from subiquity.server.apt_lists import AptListsCache
+from subiquitycore.tests import SubiTestCase
+from subiquitycore.tests.mocks import make_app
+
+MTIME_NS = 1_700_000_000_000_000_000
+
+
+class TestAptListsCache(SubiTestCase):
+    def setUp(self):
+        self.app = make_app()
+        state_dir = self.tmp_dir()
+        self.app.state_path = lambda *parts: os.path.join(state_dir, *parts)
+        self.cache = AptListsCache(self.app)
+
+    def make_lists(self, files):
+        lists = self.tmp_dir()
+        os.mkdir(os.path.join(lists, "partial"))
+        for name, content in files.items():
+            path = os.path.join(lists, name)
+            with open(path, "w") as fp:
+                fp.write(content)
+            os.utime(path, ns=(MTIME_NS, MTIME_NS))
+        return lists
+
+    def test_save_restore(self):
+        lists = self.make_lists(
+            {
+                "mirror_dists_noble_InRelease": "release",
+                "mirror_dists_noble_main_binary-amd64_Packages": "packages",
+                "lock": "",
+            }
+        )
+        self.cache.save(lists)
+
+        target = os.path.join(self.tmp_dir(), "lists")
+        self.assertEqual(self.cache.restore(target), 2)
+        self.assertEqual(
+            sorted(os.listdir(target)),
+            [
+                "mirror_dists_noble_InRelease",
+                "mirror_dists_noble_main_binary-amd64_Packages",
+            ],
+        )
+        path = os.path.join(target, "mirror_dists_noble_InRelease")
+        with open(path) as fp:
+            self.assertEqual(fp.read(), "release")
+        # apt sends If-Modified-Since based on the mtime.
+        self.assertEqual(os.stat(path).st_mtime_ns, MTIME_NS)
+
+    def test_restore_release_only(self):
+        self.cache.save(
+            self.make_lists(
+                {
+                    "mirror_dists_noble_InRelease": "release",
+                    "mirror_dists_noble_main_binary-amd64_Packages": "packages",
+                }
+            )
+        )
+        target = self.tmp_dir()
+        self.assertEqual(self.cache.restore(target, release_only=True), 1)
+        self.assertEqual(os.listdir(target), ["mirror_dists_noble_InRelease"])
+
+    def test_content_addressed(self):
+        # Lists with the same content are stored once and objects that are
+        # no longer used are dropped.
+        self.cache.save(self.make_lists({"a_InRelease": "same", "b_InRelease": "same"}))
+        objects = os.path.join(self.cache.dir, "objects")
+        self.assertEqual(len(os.listdir(objects)), 1)
+        self.cache.save(self.make_lists({"a_InRelease": "new", "b_InRelease": "same"}))
+        self.assertEqual(len(os.listdir(objects)), 2)
+        self.cache.save(self.make_lists({"a_InRelease": "new", "b_InRelease": "new"}))
+        self.assertEqual(len(os.listdir(objects)), 1)
+
+        target = self.tmp_dir()
+        self.cache.restore(target)
+        for name in "a_InRelease", "b_InRelease":
+            with open(os.path.join(target, name)) as fp:
+                self.assertEqual(fp.read(), "new")
+
+    def test_save_replaces(self):
+        # Lists of sources that are no longer configured are dropped.
+        self.cache.save(self.make_lists({"a_InRelease": "a", "a_Packages": "a"}))
+        self.cache.save(self.make_lists({"b_InRelease": "b1", "b_Packages": "b2"}))
+        target = self.tmp_dir()
+        self.assertEqual(self.cache.restore(target), 2)
+        self.assertEqual(sorted(os.listdir(target)), ["b_InRelease", "b_Packages"])
+        objects = os.path.join(self.cache.dir, "objects")
+        self.assertEqual(len(os.listdir(objects)), 2)
+
+    def test_save_release_only(self):
+        self.cache.save(self.make_lists({"a_InRelease": "a", "a_Packages": "a"}))
+        self.cache.save(
+            self.make_lists({"b_InRelease": "b", "b_Packages": "b"}), release_only=True
+        )
+        target = self.tmp_dir()
+        self.cache.restore(target)
+        self.assertEqual(sorted(os.listdir(target)), ["a_Packages", "b_InRelease"])
+
+    def test_max_size(self):
+        # Release files are the last to be left out.
+        self.cache.max_size = 10
+        self.cache.save(
+            self.make_lists(
+                {"a_Packages": "x" * 5, "a_InRelease": "x" * 6, "b_InRelease": "x" * 4}
+            )
+        )
+        target = self.tmp_dir()
+        self.cache.restore(target)
+        self.assertEqual(sorted(os.listdir(target)), ["a_InRelease", "b_InRelease"])
+
+    def test_concurrent_saves(self):
+        lists = [
+            self.make_lists({f"{i}_InRelease": str(i), f"{i}_Packages": str(i)})
+            for i in range(8)
+        ]
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            list(pool.map(self.cache.save, lists))
+        # Whichever save came last, the cache holds exactly its lists.
+        target = self.tmp_dir()
+        self.assertEqual(self.cache.restore(target), 2)
+        objects = os.listdir(os.path.join(self.cache.dir, "objects"))
+        self.assertEqual(len(objects), 1)
+
+    def test_restore_empty(self):
+        target = self.tmp_dir()
+        self.assertEqual(self.cache.restore(target), 0)
+        self.assertEqual(os.listdir(target), [])
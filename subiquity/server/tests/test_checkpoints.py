@@ -0,0 +1,62 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from subiquity.server.checkpoints import InstallCheckpoints
+from subiquitycore.tests import SubiTestCase
+from subiquitycore.tests.mocks import make_app
+
+
+class TestInstallCheckpoints(SubiTestCase):
+    def setUp(self):
+        self.app = make_app()
+        state_dir = self.tmp_dir()
+        self.app.state_path = lambda *parts: os.path.join(state_dir, *parts)
+
+    def test_resume(self):
+        checkpoints = InstallCheckpoints(self.app)
+        self.assertFalse(checkpoints.load("key"))
+        checkpoints.mark("partitioning")
+        checkpoints.mark("extract", "partitioning")
+
+        checkpoints = InstallCheckpoints(self.app)
+        self.assertTrue(checkpoints.load("key"))
+        self.assertEqual(checkpoints.steps, ["partitioning", "extract"])
+        self.assertTrue(checkpoints.done("extract"))
+        self.assertFalse(checkpoints.done("curthooks"))
+
+    def test_different_key(self):
+        checkpoints = InstallCheckpoints(self.app)
+        checkpoints.load("key")
+        checkpoints.mark("partitioning")
+        with open(checkpoints.path("resume-data.json"), "w") as fp:
+            fp.write("{}")
+
+        checkpoints = InstallCheckpoints(self.app)
+        self.assertFalse(checkpoints.load("other key"))
+        self.assertFalse(checkpoints.done("partitioning"))
+        self.assertEqual(os.listdir(checkpoints.dir), [])
+
+    def test_not_loaded(self):
+        checkpoints = InstallCheckpoints(self.app)
+        checkpoints.mark("partitioning")
+        self.assertFalse(checkpoints.done("partitioning"))
+        self.assertFalse(os.path.exists(checkpoints.dir))
+
+    def test_make_key(self):
+        key = InstallCheckpoints.make_key({"a": 1, "b": [2]})
+        self.assertEqual(key, InstallCheckpoints.make_key({"b": [2], "a": 1}))
+        self.assertNotEqual(key, InstallCheckpoints.make_key({"a": 1, "b": [3]}))
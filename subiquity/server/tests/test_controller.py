@@ -14,7 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import contextlib
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from subiquity.server.autoinstall import AutoinstallValidationError
 from subiquity.server.controller import NonInteractiveController, SubiquityController
@@ -27,7 +27,7 @@ from subiquitycore.tests.parameterized import parameterized
 class TestController(SubiTestCase):
     def setUp(self):
         self.controller = SubiquityController(make_app())
-        self.controller.context.child = contextlib.nullcontext
+        self.controller.context = Mock(child=contextlib.nullcontext)
 
     @patch.object(SubiquityController, "load_autoinstall_data")
     def test_setup_autoinstall(self, mock_load):
@@ -0,0 +1,120 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from subiquity.server.curtin import _ContextTrie, _CurtinCommand
+from subiquitycore.context import Context
+from subiquitycore.tests import SubiTestCase
+
+
+def curtin_event(event_type, name, message="", result="SUCCESS"):
+    return {
+        "CURTIN_EVENT_TYPE": event_type,
+        "CURTIN_NAME": name,
+        "CURTIN_MESSAGE": message,
+        "CURTIN_RESULT": result,
+    }
+
+
+class TestContextTrie(SubiTestCase):
+    def test_longest_prefix(self):
+        trie = _ContextTrie()
+        self.assertEqual(trie.longest_prefix("a/b"), (None, "a/b"))
+        root, a, abc = Mock(), Mock(), Mock()
+        trie.insert("", root)
+        trie.insert("a", a)
+        trie.insert("a/b/c", abc)
+        self.assertEqual(trie.longest_prefix("x/y"), (root, "x/y"))
+        self.assertEqual(trie.longest_prefix("a"), (a, ""))
+        self.assertEqual(trie.longest_prefix("a/b"), (a, "b"))
+        self.assertEqual(trie.longest_prefix("a/b/c/d/e"), (abc, "d/e"))
+        self.assertEqual(trie.longest_prefix("ab"), (root, "ab"))
+
+    def test_remove(self):
+        trie = _ContextTrie()
+        root, a, abc = Mock(), Mock(), Mock()
+        trie.insert("", root)
+        trie.insert("a", a)
+        trie.insert("a/b/c", abc)
+        trie.remove("a")
+        self.assertEqual(trie.longest_prefix("a/b"), (root, "a/b"))
+        self.assertEqual(trie.longest_prefix("a/b/c/d"), (abc, "d"))
+        trie.remove("a/b/c")
+        self.assertEqual(trie.children, {})
+        trie.remove("not/there")
+
+
+class TestCurtinCommand(SubiTestCase):
+    def setUp(self):
+        self.app = Mock(project="subiquity")
+        self.context = Context.new(self.app)
+        self.runner = Mock(start=AsyncMock(), wait=AsyncMock())
+        self.cmd = _CurtinCommand(Mock(), self.runner, "install", private_mounts=False)
+
+    async def start(self):
+        with patch("subiquity.server.curtin.journald_listen_batched"):
+            await self.cmd.start(self.context)
+
+    def started_names(self):
+        return [
+            call.args[0].full_name()
+            for call in self.app.report_start_event.call_args_list
+        ]
+
+    async def test_event_contexts(self):
+        await self.start()
+        self.cmd._event(curtin_event("start", "cmd-install"))
+        self.cmd._event(curtin_event("start", "cmd-install/stage-partitioning"))
+        self.cmd._event(
+            curtin_event("start", "cmd-install/stage-partitioning/builtin/cmd-block")
+        )
+        self.assertEqual(
+            self.started_names(),
+            [
+                "subiquity/cmd-install",
+                "subiquity/cmd-install/stage-partitioning",
+                "subiquity/cmd-install/stage-partitioning/builtin/cmd-block",
+            ],
+        )
+        self.cmd._event(
+            curtin_event(
+                "finish",
+                "cmd-install/stage-partitioning/builtin/cmd-block",
+                result="FAIL",
+            )
+        )
+        context, description, status = self.app.report_finish_event.call_args.args
+        self.assertEqual(
+            context.full_name(),
+            "subiquity/cmd-install/stage-partitioning/builtin/cmd-block",
+        )
+        self.assertEqual(status.name, "FAIL")
+
+    async def test_wait_drains(self):
+        await self.start()
+        self.cmd._events([curtin_event("start", "cmd-install")])
+        waiting = asyncio.create_task(self.cmd.wait())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        self.cmd._events([curtin_event("finish", "cmd-install")])
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(self.cmd._event_contexts, {})
+        self.cmd._listener.close.assert_called_once_with()
+
+    async def test_wait_nothing_to_drain(self):
+        await self.start()
+        await asyncio.wait_for(self.cmd.wait(), 1)
@@ -0,0 +1,132 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+from unittest.mock import Mock
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from subiquity.server.download import (
+    DownloadItem,
+    DownloadProgress,
+    PackageDownloader,
+    parse_print_uris,
+)
+from subiquitycore.tests import SubiTestCase
+from subiquitycore.tests.mocks import make_app
+
+PRINT_URIS_OUTPUT = """\
+'http://archive.ubuntu.com/ubuntu/pool/main/a/apt/apt_2.8_amd64.deb' \
+apt_2.8_amd64.deb 1390822 SHA512:0123
+'file:/cdrom/pool/main/b/bash/bash_5.2_amd64.deb' bash_5.2_amd64.deb 5 MD5Sum:ab
+"""
+
+
+class TestParsePrintUris(SubiTestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_print_uris(PRINT_URIS_OUTPUT),
+            [
+                DownloadItem(
+                    uri="http://archive.ubuntu.com/ubuntu/pool/main/a/apt/"
+                    "apt_2.8_amd64.deb",
+                    filename="apt_2.8_amd64.deb",
+                    size=1390822,
+                    hash="SHA512:0123",
+                ),
+                DownloadItem(
+                    uri="file:/cdrom/pool/main/b/bash/bash_5.2_amd64.deb",
+                    filename="bash_5.2_amd64.deb",
+                    size=5,
+                    hash="MD5Sum:ab",
+                ),
+            ],
+        )
+
+    def test_parse_empty(self):
+        self.assertEqual(parse_print_uris("Reading package lists...\n"), [])
+
+
+class TestDownloadProgress(SubiTestCase):
+    def test_report(self):
+        context = Mock()
+        progress = DownloadProgress(context, total=4_000_000, interval=3600)
+        progress.add(1_000_000)
+        progress.add(1_000_000)
+        # The second chunk is within the interval, so not reported.
+        context.info.assert_called_once_with("downloaded 1.0 of 4.0 MB (25%)")
+        progress.skip(2_000_000, 0)
+        progress.report()
+        context.info.assert_called_with("downloaded 2.0 of 2.0 MB (100%)")
+
+
+class TestPackageDownloader(SubiTestCase):
+    async def asyncSetUp(self):
+        self.files = {
+            "good.deb": b"good" * 1000,
+            "bad-hash.deb": b"bad",
+        }
+
+        async def handle(request):
+            try:
+                return web.Response(body=self.files[request.match_info["name"]])
+            except KeyError:
+                raise web.HTTPNotFound()
+
+        app = web.Application()
+        app.router.add_get("/pool/{name}", handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.addAsyncCleanup(self.server.close)
+
+    def item(self, name, content=None, hash=None):
+        if content is None:
+            content = self.files.get(name, b"")
+        if hash is None:
+            hash = "SHA256:" + hashlib.sha256(content).hexdigest()
+        return DownloadItem(
+            uri=str(self.server.make_url(f"/pool/{name}")),
+            filename=name,
+            size=len(content),
+            hash=hash,
+        )
+
+    async def test_download(self):
+        app = make_app()
+        app.base_model.proxy.proxy = ""
+        archives = self.tmp_dir()
+        context = Mock()
+        items = [
+            self.item("good.deb"),
+            self.item("bad-hash.deb", hash="SHA256:0000"),
+            self.item("missing.deb", content=b"missing"),
+            DownloadItem(uri="file:/cdrom/pool/x.deb", filename="x.deb", size=1),
+        ]
+        downloader = PackageDownloader(app, max_concurrency=2)
+        with self.assertLogs("subiquity.server.download", "WARNING"):
+            paths = await downloader.download(context, items, archives)
+
+        self.assertEqual(paths, [os.path.join(archives, "good.deb")])
+        with open(paths[0], "rb") as fp:
+            self.assertEqual(fp.read(), self.files["good.deb"])
+        self.assertEqual(sorted(os.listdir(archives)), ["good.deb", "partial"])
+        self.assertEqual(os.listdir(os.path.join(archives, "partial")), [])
+        context.info.assert_called_with("downloaded 0.0 of 0.0 MB (100%)")
+
+        # Files already in the archive are not downloaded again.
+        paths = await downloader.download(context, items[:1], archives)
+        self.assertEqual(paths, [])
@@ -0,0 +1,137 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import unittest
+from unittest.mock import Mock
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from subiquity.common.api.defs import api
+from subiquity.common.api.server import bind
+from subiquity.server.event_history import EventHistory
+from subiquitycore.context import Context, Status
+
+
+class TestEventHistory(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.root = Context.new(Mock(project="subiquity"))
+
+    def report(self, history, n):
+        for i in range(n):
+            history.report_info_event(self.root, f"event {i}")
+
+    def test_get(self):
+        history = EventHistory()
+        child = self.root.child("install")
+        history.report_start_event(child, "installing")
+        history.report_finish_event(child, "", Status.FAIL)
+        page = history.get()
+        self.assertEqual([e.id for e in page.events], [1, 2])
+        self.assertEqual(page.last, 2)
+        self.assertEqual(page.missed, 0)
+        start, finish = page.events
+        self.assertEqual(start.event_type, "start")
+        self.assertEqual(start.context_name, "subiquity/install")
+        self.assertEqual(start.context_parent_id, self.root.id)
+        self.assertEqual(start.description, "installing")
+        self.assertEqual(finish.result, "FAIL")
+
+    def test_cursor(self):
+        history = EventHistory()
+        self.report(history, 5)
+        page = history.get(since=0, limit=2)
+        self.assertEqual([e.id for e in page.events], [1, 2])
+        page = history.get(since=page.last, limit=2)
+        self.assertEqual([e.id for e in page.events], [3, 4])
+        page = history.get(since=page.last)
+        self.assertEqual([e.id for e in page.events], [5])
+        page = history.get(since=page.last)
+        self.assertEqual((page.events, page.last, page.missed), ([], 5, 0))
+
+    def test_missed(self):
+        history = EventHistory(maxlen=3)
+        self.report(history, 5)
+        page = history.get(since=1)
+        self.assertEqual([e.id for e in page.events], [3, 4, 5])
+        self.assertEqual(page.missed, 1)
+        page = history.get(since=3)
+        self.assertEqual([e.id for e in page.events], [4, 5])
+        self.assertEqual(page.missed, 0)
+
+    def test_request_contexts_ignored(self):
+        history = EventHistory()
+        request = self.root.child("GET /meta/events")
+        request.set("request", object())
+        history.report_start_event(request, "")
+        self.assertEqual(history.get().events, [])
+
+    async def test_wait(self):
+        history = EventHistory()
+        self.report(history, 1)
+        waiter = asyncio.create_task(history.wait(since=1, timeout=10))
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        self.report(history, 1)
+        page = await asyncio.wait_for(waiter, 1)
+        self.assertEqual([e.id for e in page.events], [2])
+
+    async def test_wait_timeout(self):
+        history = EventHistory()
+        page = await history.wait(since=0, timeout=0.01)
+        self.assertEqual((page.events, page.last), ([], 0))
+
+    async def test_wait_capped(self):
+        history = EventHistory()
+        history.max_wait = 0.01
+        page = await asyncio.wait_for(history.wait(since=0, timeout=1000), 5)
+        self.assertEqual((page.events, page.last), ([], 0))
+
+    async def test_no_wait_when_events_pending(self):
+        history = EventHistory()
+        self.report(history, 1)
+        page = await asyncio.wait_for(history.wait(since=0, timeout=10), 1)
+        self.assertEqual(len(page.events), 1)
+
+    async def test_long_poll_does_not_wake_itself(self):
+        # The events of the request handling a long poll are not recorded,
+        # so the poll does not return straight away with its own start
+        # event (and get called again, and again...).
+        history = EventHistory()
+
+        @api
+        class API:
+            def GET(since: int) -> int: ...
+
+        class Impl:
+            context = Context.new(
+                Mock(
+                    project="subiquity",
+                    report_start_event=history.report_start_event,
+                    report_finish_event=history.report_finish_event,
+                )
+            )
+
+            async def GET(self, since: int) -> int:
+                page = await history.wait(since=since, timeout=0.1)
+                return len(page.events)
+
+        app = web.Application()
+        bind(app.router, API, Impl())
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get("/", params={"since": "0"})
+            self.assertEqual(await resp.json(), 0)
+        self.assertEqual(history.last_id, 0)
@@ -14,8 +14,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import subprocess
 from pathlib import Path
-from unittest.mock import AsyncMock, Mock, call, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from subiquity.server.mounter import (
     AbsolutePathError,
@@ -113,21 +114,115 @@ class TestMounter(SubiTestCase):
         touch(f"{src}/both-dir/only-src-file", f"{src}/both-dir/both-file")
         touch(f"{dst}/both-dir/only-dst-file", f"{dst}/both-dir/both-file")
 
-        with patch.object(mounter, "mount", new_callable=AsyncMock) as mocked:
+        with patch.object(mounter, "bind_mount_all", new_callable=AsyncMock) as mocked:
             await mounter.bind_mount_tree(src, dst)
-        mocked.assert_has_calls(
+        mocked.assert_called_once()
+        [binds] = mocked.call_args.args
+        self.assertCountEqual(
+            binds,
             [
-                call(f"{src}/only-src-file", f"{dst}/only-src-file", options="bind"),
-                call(f"{src}/only-src-dir", f"{dst}/only-src-dir", options="bind"),
-                call(
+                (f"{src}/only-src-file", f"{dst}/only-src-file"),
+                (f"{src}/only-src-dir", f"{dst}/only-src-dir"),
+                (
                     f"{src}/both-dir/only-src-file",
                     f"{dst}/both-dir/only-src-file",
-                    options="bind",
                 ),
             ],
-            any_order=True,
         )
-        self.assertEqual(mocked.call_count, 3)
+
+    async def test_bind_mount_all(self):
+        mounter = Mounter(self.app)
+        # All the bind mounts are done by a single mount command, from a
+        # generated fstab.
+        src = self.tmp_dir()
+        dst = self.tmp_dir()
+        os.mkdir(f"{src}/a dir")
+        Path(f"{src}/file").touch()
+        fstabs = []
+
+        async def run(cmd, **kw):
+            with open(cmd[-1]) as fp:
+                fstabs.append(fp.read())
+
+        self.app.command_runner = Mock(run=AsyncMock(side_effect=run))
+        await mounter.bind_mount_all(
+            [(f"{src}/a dir", f"{dst}/a dir"), (f"{src}/file", f"{dst}/file")]
+        )
+        [[cmd], kw] = self.app.command_runner.run.call_args
+        self.assertEqual(cmd[:3], ["mount", "--all", "--fstab"])
+        self.assertEqual(kw, {"private_mounts": False})
+        self.assertEqual(
+            fstabs,
+            [
+                f"{src}/a\\040dir {dst}/a\\040dir none bind 0 0\n"
+                f"{src}/file {dst}/file none bind 0 0\n"
+            ],
+        )
+        self.assertTrue(os.path.isdir(f"{dst}/a dir"))
+        self.assertTrue(os.path.isfile(f"{dst}/file"))
+        self.assertFalse(os.path.exists(cmd[-1]))
+
+    async def test_cleanup(self):
+        mounter = Mounter(self.app)
+        # cleanup unmounts everything with one lazy umount, most recent
+        # mount first, and removes the mountpoints it created.
+        src = self.tmp_dir()
+        dst = self.tmp_dir()
+        Path(f"{src}/file").touch()
+        existing = self.tmp_dir()
+        self.app.command_runner = Mock(run=AsyncMock())
+        await mounter.mount("/dev/cdrom", existing)
+        await mounter.bind_mount_all([(f"{src}/file", f"{dst}/file")])
+        self.app.command_runner.run.reset_mock()
+
+        await mounter.cleanup()
+        self.app.command_runner.run.assert_called_once_with(
+            ["umount", "--lazy", f"{dst}/file", existing], private_mounts=False
+        )
+        self.assertFalse(os.path.exists(f"{dst}/file"))
+        self.assertTrue(os.path.isdir(existing))
+
+    async def test_bind_mount_all_partial_failure(self):
+        mounter = Mounter(self.app)
+        # If mount --all fails part way, whatever it did mount is unmounted
+        # and the mountpoints created for the binds are removed.
+        src = self.tmp_dir()
+        dst = self.tmp_dir()
+        os.mkdir(f"{src}/dir")
+        Path(f"{src}/file").touch()
+        self.app.command_runner = Mock(
+            run=AsyncMock(side_effect=subprocess.CalledProcessError(32, "mount"))
+        )
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            await mounter.bind_mount_all(
+                [(f"{src}/dir", f"{dst}/dir"), (f"{src}/file", f"{dst}/file")]
+            )
+        self.assertEqual(cm.exception.cmd, "mount")
+        self.app.command_runner.run.assert_called_with(
+            ["umount", "--lazy", f"{dst}/file", f"{dst}/dir"], private_mounts=False
+        )
+        self.assertEqual(os.listdir(dst), [])
+        self.assertEqual(mounter._mounts, [])
+
+    async def test_cleanup_failure(self):
+        mounter = Mounter(self.app)
+        # A failing umount still leaves the mounter with nothing recorded
+        # and the mountpoints and temporary directories removed.
+        src = self.tmp_dir()
+        dst = self.tmp_dir()
+        Path(f"{src}/file").touch()
+        self.app.command_runner = Mock(run=AsyncMock())
+        await mounter.bind_mount_all([(f"{src}/file", f"{dst}/file")])
+        tdir = mounter.tmpfiles.tdir()
+        self.app.command_runner.run.side_effect = subprocess.CalledProcessError(
+            32, "umount"
+        )
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            await mounter.cleanup()
+        self.assertFalse(os.path.exists(f"{dst}/file"))
+        self.assertFalse(os.path.exists(tdir))
+        self.assertEqual(mounter._mounts, [])
 
     async def test_bind_mount_tree_no_target(self):
         mounter = Mounter(self.app)
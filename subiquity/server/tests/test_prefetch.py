@@ -0,0 +1,153 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import contextlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+
+from subiquity.server.prefetch import PackagePrefetcher
+from subiquitycore.tests.mocks import make_app
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w"):
+        pass
+
+
+class TestPackagePrefetcher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.app = make_app()
+        self.app.state_path = lambda *parts: os.path.join(self.tmp, "state", *parts)
+        self.target = os.path.join(self.tmp, "target")
+        self.archives = os.path.join(self.target, "var/cache/apt/archives")
+        self.prefetcher = PackagePrefetcher(self.app)
+
+    def make_overlay(self):
+        root = os.path.join(self.tmp, "overlay")
+        overlay = Mock(mountpoint=root, p=lambda *p: os.path.join(root, *p))
+
+        @contextlib.asynccontextmanager
+        async def cm():
+            yield overlay
+
+        self.app.controllers.Mirror.final_apt_configurer.overlay = cm
+        return root
+
+    async def test_prefetch(self):
+        root = self.make_overlay()
+
+        async def download(app, context, *args, private_mounts):
+            touch(os.path.join(root, "var/cache/apt/archives/a_1_amd64.deb"))
+
+        with patch(
+            "subiquity.server.prefetch.run_curtin_command", side_effect=download
+        ) as run:
+            await self.prefetcher.prefetch(packages=["a", "b"])
+        args = run.call_args.args[2:]
+        self.assertEqual(args[:4], ("in-target", "-t", root, "--"))
+        self.assertEqual(args[-2:], ("a", "b"))
+        self.assertIn("--download-only", args)
+        self.assertEqual(os.listdir(self.prefetcher.cache_dir), ["a_1_amd64.deb"])
+        self.assertEqual(os.listdir(os.path.join(root, "var/cache/apt/archives")), [])
+
+    async def test_populate_and_cleanup(self):
+        touch(os.path.join(self.prefetcher.cache_dir, "a_1_amd64.deb"))
+        touch(os.path.join(self.prefetcher.cache_dir, "b_1_amd64.deb"))
+        touch(os.path.join(self.archives, "b_1_amd64.deb"))
+        moved = await self.prefetcher.populate(self.target)
+        self.assertEqual(moved, [os.path.join(self.archives, "a_1_amd64.deb")])
+        self.assertEqual(os.listdir(self.prefetcher.cache_dir), ["b_1_amd64.deb"])
+        self.prefetcher.cleanup(moved)
+        self.assertEqual(os.listdir(self.archives), ["b_1_amd64.deb"])
+        self.assertFalse(os.path.exists(self.prefetcher.cache_dir))
+
+    async def test_populate_waits(self):
+        done = asyncio.Event()
+
+        async def prefetch(*, packages):
+            await done.wait()
+            touch(os.path.join(self.prefetcher.cache_dir, "a_1_amd64.deb"))
+
+        self.prefetcher.prefetch = prefetch
+        self.prefetcher.start(AsyncMock(return_value=["a"]))
+        populate = asyncio.create_task(self.prefetcher.populate(self.target))
+        await asyncio.sleep(0)
+        self.assertFalse(populate.done())
+        done.set()
+        self.assertEqual(len(await populate), 1)
+
+    async def test_populate_timeout(self):
+        cancelled = asyncio.Event()
+
+        async def prefetch(*, packages):
+            touch(os.path.join(self.prefetcher.cache_dir, "a_1_amd64.deb"))
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        self.prefetcher.prefetch = prefetch
+        self.prefetcher.populate_timeout = 0.01
+        self.prefetcher.start(AsyncMock(return_value=["a"]))
+        self.assertEqual(
+            await asyncio.wait_for(self.prefetcher.populate(self.target), 5), []
+        )
+        self.assertTrue(cancelled.is_set())
+        self.assertFalse(os.path.exists(self.prefetcher.cache_dir))
+        self.assertFalse(os.path.exists(self.archives))
+
+    async def test_cancel(self):
+        started = asyncio.Event()
+
+        async def prefetch(*, packages):
+            started.set()
+            await asyncio.Event().wait()
+
+        self.prefetcher.prefetch = prefetch
+        touch(os.path.join(self.prefetcher.cache_dir, "a_1_amd64.deb"))
+        self.prefetcher.start(AsyncMock(return_value=["a"]))
+        await started.wait()
+        self.prefetcher.cancel()
+        self.assertFalse(os.path.exists(self.prefetcher.cache_dir))
+        self.assertEqual(await self.prefetcher.populate(self.target), [])
+
+    async def test_batches(self):
+        fetched = []
+
+        async def prefetch(*, packages):
+            fetched.append(packages)
+
+        self.prefetcher.prefetch = prefetch
+        self.prefetcher.start(
+            AsyncMock(side_effect=RuntimeError),
+            AsyncMock(return_value=["a"]),
+            AsyncMock(return_value=[]),
+            AsyncMock(return_value=["b"]),
+        )
+        await self.prefetcher.wait()
+        self.assertEqual(fetched, [["a"], ["b"]])
+
+    async def test_failure_ignored(self):
+        self.prefetcher.prefetch = AsyncMock(side_effect=RuntimeError)
+        self.prefetcher.start(AsyncMock(return_value=["a"]))
+        self.assertEqual(await self.prefetcher.populate(self.target), [])
@@ -0,0 +1,84 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from subiquity.server.profiler import SamplingProfiler, SlowCallbackWatchdog
+from subiquitycore.tests import SubiTestCase
+
+
+def busy_wait(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class TestSamplingProfiler(SubiTestCase):
+    def test_collapsed_stacks(self):
+        profiler = SamplingProfiler()
+        profiler.start(interval=0.001)
+        self.assertTrue(profiler.running)
+        busy_wait(0.2)
+        profiler.stop()
+        self.assertFalse(profiler.running)
+        self.assertGreater(profiler.samples, 0)
+        path = self.tmp_path("profile.folded")
+        profiler.write(path)
+        with open(path) as fp:
+            lines = fp.read().splitlines()
+        stacks = [line.rsplit(" ", 1)[0] for line in lines]
+        busy = [s for s in stacks if s.endswith("busy_wait (test_profiler.py)")]
+        self.assertNotEqual(busy, [])
+        self.assertTrue(busy[0].startswith("MainThread;"))
+        self.assertFalse(any("subiquity-profiler" in s for s in stacks))
+        for line in lines:
+            self.assertRegex(line, r" \d+$")
+
+    def test_interval(self):
+        profiler = SamplingProfiler()
+        for interval in 0, -1, float("nan"):
+            with self.assertRaises(ValueError):
+                profiler.start(interval=interval)
+            self.assertFalse(profiler.running)
+        with patch.object(threading, "Thread") as thread:
+            profiler.start(interval=1e-9)
+        self.assertEqual(thread.call_args.kwargs["args"], (profiler.min_interval,))
+
+
+class TestSlowCallbackWatchdog(unittest.IsolatedAsyncioTestCase):
+    async def test_logs_blocking_callback(self):
+        watchdog = SlowCallbackWatchdog(asyncio.get_running_loop(), 0.05)
+        watchdog.start()
+        try:
+            with self.assertLogs("subiquity.server.profiler", "WARNING") as cm:
+                busy_wait(0.3)
+                await asyncio.sleep(0.1)
+        finally:
+            watchdog.stop()
+        self.assertIn("busy_wait", cm.output[0])
+        self.assertIn("event loop was blocked for", cm.output[1])
+
+    async def test_quiet_when_not_blocked(self):
+        watchdog = SlowCallbackWatchdog(asyncio.get_running_loop(), 0.2)
+        watchdog.start()
+        try:
+            with self.assertNoLogs("subiquity.server.profiler", "WARNING"):
+                await asyncio.sleep(0.3)
+        finally:
+            watchdog.stop()
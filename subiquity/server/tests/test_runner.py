@@ -13,9 +13,10 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
 import os
 import subprocess
-from unittest.mock import ANY, patch
+from unittest.mock import ANY, AsyncMock, Mock, patch
 
 from subiquity.server.runner import DryRunCommandRunner, LoggedCommandRunner
 from subiquitycore.tests import SubiTestCase
@@ -113,6 +114,43 @@ class TestLoggedCommandRunner(SubiTestCase):
         expected_cmd = ANY
         astart_mock.assert_called_once_with(expected_cmd, stdout=subprocess.PIPE)
 
+    async def test_start_unit(self):
+        runner = LoggedCommandRunner(ident="my-id", use_systemd_user=False)
+
+        with patch("subiquity.server.runner.astart_command") as astart_mock:
+            proc = await runner.start(["/bin/ls"], unit="my-unit")
+
+        self.assertEqual(proc.unit, "my-unit")
+        cmd = astart_mock.call_args.args[0]
+        self.assertEqual(cmd[5:7], ["--unit=my-unit", "--collect"])
+
+        with patch("subiquity.server.runner.astart_command") as astart_mock:
+            await runner.start(["/bin/ls"])
+            await runner.start(["/bin/ls"])
+
+        # Each command gets a unit of its own.
+        first, second = [c.args[0][5] for c in astart_mock.call_args_list]
+        self.assertTrue(first.startswith("--unit="))
+        self.assertNotEqual(first, second)
+
+    async def test_wait_cancelled(self):
+        runner = LoggedCommandRunner(ident="my-id", use_systemd_user=True)
+        proc = Mock(unit="my-unit")
+        proc.communicate = AsyncMock(side_effect=asyncio.Event().wait)
+        proc.wait = AsyncMock()
+
+        with patch("subiquity.server.runner.arun_command") as run_mock:
+            task = asyncio.create_task(runner.wait(proc))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        run_mock.assert_awaited_once_with(
+            ["systemctl", "--user", "stop", "--", "my-unit.service"]
+        )
+        proc.wait.assert_awaited_once()
+
 
 class TestDryRunCommandRunner(SubiTestCase):
     def setUp(self):
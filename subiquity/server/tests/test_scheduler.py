@@ -0,0 +1,110 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import unittest
+from unittest.mock import ANY, Mock
+
+from subiquity.server.scheduler import StepScheduler
+from subiquitycore.context import Context
+
+
+class TestStepScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.app = Mock(project="subiquity")
+        self.scheduler = StepScheduler(Context.new(self.app))
+        self.log = []
+
+    def step(self, name, delay=0):
+        async def run(*, context):
+            self.log.append(("start", name, context.full_name()))
+            await asyncio.sleep(delay)
+            self.log.append(("end", name))
+
+        return run
+
+    async def test_dependencies(self):
+        s = self.scheduler
+        s.add("a", self.step("a"))
+        s.add("b", self.step("b"), after=["a"])
+        s.add("c", self.step("c"), after=["a", None])
+        s.add("d", self.step("d"), after=["b", "c"])
+        await s.run()
+        order = [entry[1] for entry in self.log]
+        for before, after in ("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"):
+            self.assertLess(
+                order.index(before, order.index(before) + 1), order.index(after)
+            )
+        self.assertIn(("start", "d", "subiquity/d"), self.log)
+
+    async def test_overlap(self):
+        s = self.scheduler
+        s.add("a", self.step("a", 0.05))
+        s.add("b", self.step("b", 0.05))
+        await s.run()
+        self.assertEqual(
+            [entry[0] for entry in self.log], ["start", "start", "end", "end"]
+        )
+
+    async def test_max_concurrency(self):
+        s = StepScheduler(Context.new(self.app), max_concurrency=1)
+        s.add("a", self.step("a", 0.01))
+        s.add("b", self.step("b", 0.01))
+        await s.run()
+        self.assertEqual(
+            [entry[0] for entry in self.log], ["start", "end", "start", "end"]
+        )
+
+    async def test_failure(self):
+        async def fail(*, context):
+            raise RuntimeError("boom")
+
+        s = self.scheduler
+        s.add("slow", self.step("slow", 10))
+        s.add("fail", fail)
+        s.add("after", self.step("after"), after=["fail"])
+        with self.assertRaisesRegex(RuntimeError, "boom"):
+            await s.run()
+        self.assertEqual(self.log, [("start", "slow", "subiquity/slow")])
+        self.app.report_finish_event.assert_any_call(ANY, "boom", ANY)
+
+    async def test_failure_waits_for_cancelled_steps(self):
+        async def fail(*, context):
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        async def slow(*, context):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                # Like stopping a command that is running.
+                await asyncio.sleep(0.01)
+                self.log.append("stopped")
+                raise
+
+        s = self.scheduler
+        s.add("slow", slow)
+        s.add("fail", fail)
+        with self.assertRaisesRegex(RuntimeError, "boom"):
+            await s.run()
+        self.assertEqual(self.log, ["stopped"])
+
+    def test_bad_dependencies(self):
+        s = self.scheduler
+        s.add("a", self.step("a"))
+        with self.assertRaises(ValueError):
+            s.add("a", self.step("a"))
+        with self.assertRaises(ValueError):
+            s.add("b", self.step("b"), after=["c"])
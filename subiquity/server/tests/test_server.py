@@ -24,8 +24,12 @@ import yaml
 from jsonschema.validators import validator_for
 
 from subiquity.cloudinit import CloudInitSchemaTopLevelKeyError
+from subiquity.common.api.server import check_implementations
+from subiquity.common.apidef import API
 from subiquity.common.types import NonReportableError, PasswordKind
 from subiquity.server.autoinstall import AutoinstallError, AutoinstallValidationError
+from subiquity.server.dryrun import DryRunController
+from subiquity.server.errors import ErrorController
 from subiquity.server.nonreportable import NonReportableException
 from subiquity.server.server import (
     NOPROBERARG,
@@ -606,6 +610,29 @@ class TestExceptionHandling(SubiTestCase):
         self.assertIsNone(self.server.nonreportable_error)
 
 
+class TestStartProfiling(SubiTestCase):
+    async def asyncSetUp(self):
+        opts = Mock()
+        opts.dry_run = True
+        opts.output_base = self.tmp_dir()
+        opts.machine_config = "examples/machines/simple.json"
+        self.server = SubiquityServer(opts, None)
+        self.server.debug_flags = set()
+
+    async def test_slow_callback(self):
+        self.server.kernel_cmdline = {"subiquity-slow-callback": "0.5"}
+        self.server.start_profiling()
+        watchdog = self.server.slow_callback_watchdog
+        self.addCleanup(watchdog.stop)
+        self.assertEqual(watchdog.threshold, 0.5)
+
+    async def test_slow_callback_invalid(self):
+        self.server.kernel_cmdline = {"subiquity-slow-callback": "fast"}
+        with self.assertLogs("subiquity.server.server", "WARNING"):
+            self.server.start_profiling()
+        self.assertIsNone(self.server.slow_callback_watchdog)
+
+
 class TestEventReporting(SubiTestCase):
     async def asyncSetUp(self):
         opts = Mock()
@@ -658,7 +685,7 @@ class TestEventReporting(SubiTestCase):
             controller.interactive = lambda: controller_is_interactive
             context.set("controller", controller)
 
-        with patch("subiquity.server.server.journal.send") as journal_send_mock:
+        with patch("subiquity.journald.journal.send") as journal_send_mock:
             self.server._maybe_push_to_journal(
                 "event_type", context, context.description
             )
@@ -683,7 +710,7 @@ class TestEventReporting(SubiTestCase):
         )
         self.server.interactive = interactive
 
-        with patch("subiquity.server.server.journal.send") as journal_send_mock:
+        with patch("subiquity.journald.journal.send") as journal_send_mock:
             self.server.report_info_event(context, "message")
 
         if not expect_pushed:
@@ -711,7 +738,7 @@ class TestEventReporting(SubiTestCase):
         )
         self.server.interactive = interactive
 
-        with patch("subiquity.server.server.journal.send") as journal_send_mock:
+        with patch("subiquity.journald.journal.send") as journal_send_mock:
             self.server.report_warning_event(context, "message")
 
         journal_send_mock.assert_called_once()
@@ -736,7 +763,7 @@ class TestEventReporting(SubiTestCase):
         )
         self.server.interactive = interactive
 
-        with patch("subiquity.server.server.journal.send") as journal_send_mock:
+        with patch("subiquity.journald.journal.send") as journal_send_mock:
             self.server.report_error_event(context, "message")
 
         journal_send_mock.assert_called_once()
@@ -759,3 +786,25 @@ class TestVariantHandling(SubiTestCase):
         self.server.set_source_variant("mock-variant")
         self.assertEqual(self.server.variant, "mock-variant")
         self.server.base_model.set_source_variant.assert_called_with("mock-variant")
+
+
+class TestAPIImplementations(SubiTestCase):
+    # The server only checks the signatures of the API implementations
+    # in dry-run mode, so make sure they are all checked here.
+
+    def test_controllers(self):
+        for name in SubiquityServer.controllers:
+            cls = getattr(SubiquityServer.controllers_mod, name + "Controller")
+            if cls.endpoint is None:
+                continue
+            with self.subTest(controller=name):
+                check_implementations(cls.endpoint, cls)
+
+    def test_meta(self):
+        check_implementations(API.meta, MetaController)
+
+    def test_errors(self):
+        check_implementations(API.errors, ErrorController)
+
+    def test_dry_run(self):
+        check_implementations(API.dry_run, DryRunController)
@@ -0,0 +1,193 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+from unittest.mock import Mock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from subiquity.common.api.defs import api
+from subiquity.common.api.server import bind
+from subiquity.server.trace import TraceRecorder
+from subiquitycore.context import Context, Status
+from subiquitycore.tests import SubiTestCase
+
+
+class TestTraceRecorder(SubiTestCase):
+    def setUp(self):
+        self.now = 100.0
+        p = patch("subiquity.server.trace.time.monotonic", lambda: self.now)
+        p.start()
+        self.addCleanup(p.stop)
+        self.recorder = TraceRecorder()
+        self.root = Context.new(Mock(project="subiquity"))
+
+    def start(self, context, at):
+        self.now = at
+        self.recorder.report_start_event(context, "")
+
+    def finish(self, context, at, result=Status.SUCCESS):
+        self.now = at
+        self.recorder.report_finish_event(context, "", result)
+
+    def spans(self):
+        trace = self.recorder.to_chrome_trace()
+        return {
+            e["args"]["full_name"]: e for e in trace["traceEvents"] if e["ph"] == "X"
+        }
+
+    def test_nesting(self):
+        install = self.root.child("install")
+        curtin = install.child("curtin")
+        self.start(install, 101.0)
+        self.start(curtin, 102.0)
+        self.finish(curtin, 104.0)
+        self.finish(install, 105.0, Status.FAIL)
+        spans = self.spans()
+        outer = spans["subiquity/install"]
+        inner = spans["subiquity/install/curtin"]
+        self.assertEqual((outer["ts"], outer["dur"]), (1e6, 4e6))
+        self.assertEqual((inner["ts"], inner["dur"]), (2e6, 2e6))
+        self.assertEqual(outer["args"]["result"], "FAIL")
+        self.assertEqual(inner["args"]["parent_id"], install.id)
+        self.assertEqual(outer["tid"], inner["tid"])
+
+    def test_concurrent_spans_on_separate_lanes(self):
+        install = self.root.child("install")
+        snaps = self.root.child("snaps")
+        self.start(install, 101.0)
+        self.start(snaps, 102.0)
+        self.finish(install, 103.0)
+        self.start(install.child("late"), 103.5)
+        self.finish(snaps, 104.0)
+        spans = self.spans()
+        self.assertNotEqual(
+            spans["subiquity/install"]["tid"], spans["subiquity/snaps"]["tid"]
+        )
+        # A span that starts after the first lane is free again reuses it,
+        # but does not get drawn as if it were a child of snaps.
+        self.assertNotEqual(
+            spans["subiquity/install/late"]["tid"], spans["subiquity/snaps"]["tid"]
+        )
+
+    def test_unfinished(self):
+        install = self.root.child("install")
+        self.start(install, 101.0)
+        self.now = 110.0
+        span = self.spans()["subiquity/install"]
+        self.assertEqual(span["dur"], 9e6)
+        self.assertTrue(span["args"]["unfinished"])
+
+    def test_request_contexts_ignored(self):
+        request = self.root.child("GET /meta/status")
+        request.set("request", object())
+        self.start(request, 101.0)
+        self.recorder.report_info_event(request, "hello")
+        self.finish(request, 102.0)
+        self.assertEqual(self.spans(), {})
+        self.assertEqual(self.recorder.instants, [])
+
+    async def test_api_requests_ignored(self):
+        # Through the real request handler: its context must be marked as a
+        # request before the start event is reported, or every status poll
+        # would be recorded (and eventually crowd out the install spans).
+        @api
+        class API:
+            def GET() -> str: ...
+
+        recorder = self.recorder
+
+        class Impl:
+            context = Context.new(
+                Mock(
+                    project="subiquity",
+                    report_start_event=recorder.report_start_event,
+                    report_finish_event=recorder.report_finish_event,
+                )
+            )
+
+            async def GET(self) -> str:
+                return "ok"
+
+        app = web.Application()
+        bind(app.router, API, Impl())
+        async with TestClient(TestServer(app)) as client:
+            for i in range(3):
+                resp = await client.get("/")
+                self.assertEqual(await resp.json(), "ok")
+        self.assertEqual(self.recorder.spans, {})
+        self.assertEqual(self.recorder.dropped, 0)
+
+    def test_max_spans(self):
+        self.recorder.max_spans = 1
+        self.start(self.root.child("one"), 101.0)
+        self.start(self.root.child("two"), 101.0)
+        self.assertEqual(list(self.spans()), ["subiquity/one"])
+        self.assertEqual(self.recorder.dropped, 1)
+
+    def test_write(self):
+        context = self.root.child("install")
+        self.start(context, 101.0)
+        self.recorder.report_warning_event(context, "careful")
+        self.finish(context, 102.0)
+        path = self.tmp_path("trace.json")
+        self.recorder.write(path)
+        with open(path) as fp:
+            trace = json.load(fp)
+        phases = sorted(e["ph"] for e in trace["traceEvents"])
+        self.assertEqual(phases, ["M", "X", "i"])
+
+    def test_timings(self):
+        install = self.root.child("install")
+        extract = install.child("extract")
+        recovery = install.child("recovery")
+        self.start(install, 101.0)
+        self.start(extract, 102.0)
+        self.start(recovery, 102.0)
+        self.finish(recovery, 103.0)
+        self.finish(extract, 106.0)
+        self.finish(install, 107.0, Status.FAIL)
+        timings = self.recorder.timings()
+        self.assertEqual(timings["total"], 6.0)
+        steps = {step["name"]: step for step in timings["steps"]}
+        self.assertEqual(
+            steps["subiquity/install"],
+            {
+                "name": "subiquity/install",
+                "description": "",
+                "start": 1.0,
+                "duration": 6.0,
+                "result": "FAIL",
+            },
+        )
+        self.assertEqual(steps["subiquity/install/recovery"]["duration"], 1.0)
+        self.assertEqual(
+            timings["critical_path"],
+            [
+                {"name": "subiquity/install", "duration": 6.0, "self": 2.0},
+                {"name": "subiquity/install/extract", "duration": 4.0, "self": 4.0},
+            ],
+        )
+
+    def test_write_timings(self):
+        self.start(self.root.child("install"), 101.0)
+        self.now = 102.5
+        path = self.tmp_path("installer-timings.json")
+        self.recorder.write_timings(path)
+        with open(path) as fp:
+            timings = json.load(fp)
+        [step] = timings["steps"]
+        self.assertEqual((step["duration"], step["result"]), (1.5, None))
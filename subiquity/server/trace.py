@@ -0,0 +1,324 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Record the timeline of an install in the Chrome trace event format.
+
+The resulting file can be loaded in https://ui.perfetto.dev or
+chrome://tracing, or summarized with scripts/trace-critical-path.py.
+
+The same spans are also summarized as a plain list of step timings with
+the critical path of the install, which scripts/compare-timings.py can
+compare between two installs.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import attr
+
+from subiquity.server.event_listener import EventListener
+from subiquitycore.context import Context
+
+log = logging.getLogger("subiquity.server.trace")
+
+
+@attr.s(auto_attribs=True)
+class Span:
+    id: int
+    parent_id: Optional[int]
+    name: str
+    full_name: str
+    level: str
+    start: float
+    description: str
+    end: Optional[float] = None
+    result: Optional[str] = None
+
+
+# Spans ending this close to the start of the next one on the critical
+# path still count as leading to it.
+CRITICAL_PATH_EPSILON = 1e-6
+
+
+def critical_path(
+    span: Span, children: Dict[Optional[int], List[Span]], now: float
+) -> List[Tuple[Span, float]]:
+    """Return (span, self time) for each span on the critical path through
+    span, in start order. Starting from the end of span, the path follows
+    the child that finished last, then the child that finished last before
+    that one started, and so on, recursively. The self time is the part of
+    a span's duration not covered by its children on the path."""
+    chain = []
+    t = span.end or now
+    for child in sorted(
+        children.get(span.id, []), key=lambda c: c.end or now, reverse=True
+    ):
+        end = child.end or now
+        if end <= t + CRITICAL_PATH_EPSILON and end > span.start:
+            chain.append(child)
+            t = child.start
+    chain.reverse()
+
+    def duration(s: Span) -> float:
+        return (s.end or now) - s.start
+
+    self_time = duration(span) - sum(duration(child) for child in chain)
+    path = [(span, max(self_time, 0.0))]
+    for child in chain:
+        path.extend(critical_path(child, children, now))
+    return path
+
+
+@attr.s(auto_attribs=True)
+class Instant:
+    context_id: int
+    full_name: str
+    kind: str
+    message: str
+    time: float
+
+
+class TraceRecorder(EventListener):
+    """Records a span for each context, from its start to its finish event.
+
+    Contexts for API requests are not recorded, and at most max_spans
+    spans are kept so that a long-running server cannot use unbounded
+    memory."""
+
+    max_spans = 100_000
+
+    def __init__(self):
+        self.origin = time.monotonic()
+        self.wall_origin = time.time()
+        self.spans: Dict[int, Span] = {}
+        self.instants: List[Instant] = []
+        self.dropped = 0
+
+    def _ignore(self, context: Context) -> bool:
+        return context.get("request") is not None
+
+    def report_start_event(self, context: Context, description: str) -> None:
+        if self._ignore(context):
+            return
+        if len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return
+        parent_id = None
+        if context.parent is not None:
+            parent_id = context.parent.id
+        self.spans[context.id] = Span(
+            id=context.id,
+            parent_id=parent_id,
+            name=context.name,
+            full_name=context.full_name(),
+            level=context.level,
+            start=time.monotonic(),
+            description=description,
+        )
+
+    def report_finish_event(
+        self, context: Context, description: str, result: Any
+    ) -> None:
+        span = self.spans.get(context.id)
+        if span is None:
+            return
+        span.end = time.monotonic()
+        span.result = result.name
+        if description:
+            span.description = description
+
+    def _report_instant(self, kind: str, context: Context, message: str) -> None:
+        if self._ignore(context) or len(self.instants) >= self.max_spans:
+            return
+        self.instants.append(
+            Instant(
+                context_id=context.id,
+                full_name=context.full_name(),
+                kind=kind,
+                message=message,
+                time=time.monotonic(),
+            )
+        )
+
+    def report_info_event(self, context: Context, message: str) -> None:
+        self._report_instant("info", context, message)
+
+    def report_warning_event(self, context: Context, message: str) -> None:
+        self._report_instant("warning", context, message)
+
+    def report_error_event(self, context: Context, message: str) -> None:
+        self._report_instant("error", context, message)
+
+    def _us(self, t: float) -> float:
+        return round((t - self.origin) * 1e6, 1)
+
+    def _assign_lanes(self, spans: List[Span], now: float) -> Dict[int, int]:
+        # The trace viewers draw spans on the same thread ("lane") nested
+        # according to their times, so only put a span on a lane if it is
+        # a child of the innermost span open on that lane (or the lane is
+        # empty). Concurrent tasks end up on different lanes.
+        lanes: List[List[Span]] = []
+        lane_of: Dict[int, int] = {}
+        for span in sorted(spans, key=lambda s: (s.start, -(s.end or now))):
+            end = span.end or now
+            preferred = lane_of.get(span.parent_id)
+            order = list(range(len(lanes)))
+            if preferred is not None:
+                order.insert(0, preferred)
+            for lane in order:
+                stack = lanes[lane]
+                while stack and (stack[-1].end or now) <= span.start:
+                    stack.pop()
+                if not stack or (
+                    stack[-1].id == span.parent_id and end <= (stack[-1].end or now)
+                ):
+                    break
+            else:
+                lanes.append([])
+                lane = len(lanes) - 1
+            lanes[lane].append(span)
+            lane_of[span.id] = lane
+        return lane_of
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        pid = os.getpid()
+        spans = list(self.spans.values())
+        lane_of = self._assign_lanes(spans, now)
+        events = []
+        lane_names = {}
+        for span in spans:
+            end = span.end if span.end is not None else now
+            tid = lane_of[span.id] + 1
+            lane_names.setdefault(tid, span.full_name)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.level,
+                    "ph": "X",
+                    "ts": self._us(span.start),
+                    "dur": round((end - span.start) * 1e6, 1),
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {
+                        "id": span.id,
+                        "parent_id": span.parent_id,
+                        "full_name": span.full_name,
+                        "description": span.description,
+                        "result": span.result,
+                        "unfinished": span.end is None,
+                    },
+                }
+            )
+        for instant in self.instants:
+            span_lane = lane_of.get(instant.context_id)
+            events.append(
+                {
+                    "name": instant.message,
+                    "cat": instant.kind,
+                    "ph": "i",
+                    "s": "t" if span_lane is not None else "p",
+                    "ts": self._us(instant.time),
+                    "pid": pid,
+                    "tid": (span_lane or 0) + 1,
+                    "args": {
+                        "context_id": instant.context_id,
+                        "full_name": instant.full_name,
+                    },
+                }
+            )
+        for tid, name in sorted(lane_names.items()):
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "start_time": self.wall_origin,
+                "dropped_spans": self.dropped,
+            },
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as fp:
+            json.dump(self.to_chrome_trace(), fp)
+
+    def timings(self) -> Dict[str, Any]:
+        """Return the duration of every recorded step, in seconds from the
+        start of the server, and the critical path through them."""
+        now = time.monotonic()
+        spans = sorted(self.spans.values(), key=lambda s: s.start)
+        steps = []
+        for span in spans:
+            end = span.end if span.end is not None else now
+            steps.append(
+                {
+                    "name": span.full_name,
+                    "description": span.description,
+                    "start": round(span.start - self.origin, 6),
+                    "duration": round(end - span.start, 6),
+                    "result": span.result,
+                }
+            )
+        children: Dict[Optional[int], List[Span]] = {}
+        for span in spans:
+            parent_id = span.parent_id
+            if parent_id not in self.spans:
+                parent_id = None
+            children.setdefault(parent_id, []).append(span)
+        path = []
+        total = 0.0
+        if spans:
+            first = spans[0].start
+            root = Span(
+                id=None,
+                parent_id=None,
+                name="",
+                full_name="",
+                level="",
+                start=first,
+                description="",
+                end=max(s.end or now for s in spans),
+            )
+            total = root.end - first
+            for span, self_time in critical_path(root, children, now)[1:]:
+                path.append(
+                    {
+                        "name": span.full_name,
+                        "duration": round((span.end or now) - span.start, 6),
+                        "self": round(self_time, 6),
+                    }
+                )
+        return {
+            "start_time": self.wall_origin,
+            "total": round(total, 6),
+            "dropped_steps": self.dropped,
+            "steps": steps,
+            "critical_path": path,
+        }
+
+    def write_timings(self, path: str) -> None:
+        with open(path, "w") as fp:
+            json.dump(self.timings(), fp, indent=1)
@@ -0,0 +1,151 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import call, patch
+
+from subiquity.journald import JournalListener, JournalWriter, journal
+from subiquitycore.tests import SubiTestCase
+
+
+@patch("subiquity.journald.journal.send")
+class TestJournalWriter(SubiTestCase):
+    def test_send_before_start(self, send):
+        writer = JournalWriter()
+        writer.send("message", PRIORITY="INFO")
+        send.assert_called_once_with("message", PRIORITY="INFO")
+
+    def test_send_from_thread(self, send):
+        threads = []
+        send.side_effect = lambda *args, **kw: threads.append(
+            threading.current_thread()
+        )
+        writer = JournalWriter()
+        writer.start()
+        for i in range(100):
+            writer.send(f"message {i}", SUBIQUITY_CONTEXT_ID=str(i))
+        writer.close()
+        self.assertEqual(
+            send.call_args_list,
+            [call(f"message {i}", SUBIQUITY_CONTEXT_ID=str(i)) for i in range(100)],
+        )
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_send_failure(self, send):
+        send.side_effect = [Exception("boom"), None]
+        writer = JournalWriter()
+        writer.start()
+        with self.assertLogs("subiquity.journald", level="ERROR"):
+            writer.send("message 1")
+            writer.send("message 2")
+            writer.close()
+        self.assertEqual(send.call_count, 2)
+
+
+class FakeReader:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.pending = []
+        self.closed = False
+
+    def add_match(self, *args):
+        self.matches = args
+
+    def seek_tail(self):
+        pass
+
+    def wait(self, timeout):
+        if self.batches:
+            self.pending = self.batches.pop(0)
+            return journal.APPEND
+        time.sleep(timeout)
+        return journal.NOP
+
+    def __iter__(self):
+        entries, self.pending = self.pending, []
+        return iter(entries)
+
+    def close(self):
+        self.closed = True
+
+
+@patch.object(JournalListener, "poll_interval", 0.01)
+class TestJournalListener(unittest.IsolatedAsyncioTestCase):
+    def entry(self, i):
+        return {
+            "MESSAGE": f"message {i}",
+            "SYSLOG_IDENTIFIER": "curtin_event.1.1",
+            "CURTIN_NAME": f"name {i}",
+            "CURTIN_EVENT_TYPE": "start",
+            "_PID": "1234",
+            "CODE_LINE": 1,
+        }
+
+    async def listen(self, batches, **kw):
+        reader = FakeReader(batches)
+        received = []
+        got_all = asyncio.Event()
+        total = sum(len(batch) for batch in batches)
+
+        def callback(batch):
+            received.append(batch)
+            if sum(len(b) for b in received) == total:
+                got_all.set()
+
+        with patch("subiquity.journald.journal.Reader", return_value=reader):
+            listener = JournalListener(["curtin_event.1.1"], callback, **kw)
+        await asyncio.wait_for(got_all.wait(), 5)
+        listener.close()
+        return reader, received
+
+    async def test_batches(self):
+        reader, received = await self.listen(
+            [[self.entry(0), self.entry(1)], [self.entry(2)]]
+        )
+        self.assertEqual(reader.matches, ("SYSLOG_IDENTIFIER=curtin_event.1.1",))
+        self.assertEqual(received, [[self.entry(0), self.entry(1)], [self.entry(2)]])
+
+    async def test_max_batch(self):
+        with patch.object(JournalListener, "max_batch", 2):
+            reader, received = await self.listen([[self.entry(i) for i in range(5)]])
+        self.assertEqual([len(batch) for batch in received], [2, 2, 1])
+
+    async def test_fields(self):
+        reader, received = await self.listen(
+            [[self.entry(0)]], fields=["CURTIN_", "MESSAGE"]
+        )
+        self.assertEqual(
+            received,
+            [
+                [
+                    {
+                        "MESSAGE": "message 0",
+                        "CURTIN_NAME": "name 0",
+                        "CURTIN_EVENT_TYPE": "start",
+                    }
+                ]
+            ],
+        )
+
+    async def test_close(self):
+        reader, received = await self.listen([[self.entry(0)]])
+        for i in range(100):
+            if reader.closed:
+                break
+            await asyncio.sleep(0.01)
+        self.assertTrue(reader.closed)
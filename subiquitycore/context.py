@@ -13,6 +13,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import asyncio
+import contextvars
 import enum
 import functools
 import inspect
@@ -28,6 +29,12 @@ class Status(enum.Enum):
 
 context_id = 0
 
+# The id of the innermost Context being run as a context manager in the
+# current thread or task, for including in log records.
+current_context_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "current_context_id", default=None
+)
+
 
 class Context:
     """Class to report when things start and finish.
@@ -49,8 +56,29 @@ class Context:
     with somecontext.child("operation") as context:
         result = await long_running_operation()
         context.description = "result was {}".format(result)
+
+    Values stored with .set() are visible via .get() on the context and its
+    descendants. A child shares its parent's values until a value is set on
+    it, at which point it gets its own copy, so .get() never has to walk up
+    the tree. Values set on a context after it has children are only seen
+    by the children that have not set anything themselves.
     """
 
+    __slots__ = (
+        "id",
+        "app",
+        "name",
+        "description",
+        "parent",
+        "level",
+        "childlevel",
+        "data",
+        "_owns_data",
+        "depth",
+        "_full_name",
+        "_token",
+    )
+
     def __init__(self, app, name, description, parent, level, childlevel=None):
         global context_id
         self.id = context_id
@@ -63,7 +91,21 @@ class Context:
         if childlevel is None:
             childlevel = level
         self.childlevel = childlevel
-        self.data = {}
+        self._token = None
+        if parent is None:
+            self.data = {}
+            self._owns_data = True
+        else:
+            self.data = parent.data
+            self._owns_data = False
+        # Names do not change, so the full name (which is needed for every
+        # event reported) can be computed once here.
+        if parent is None:
+            self.depth = 0
+            self._full_name = name
+        else:
+            self.depth = parent.depth + 1
+            self._full_name = parent._full_name + "/" + name
 
     @classmethod
     def new(cls, app):
@@ -75,12 +117,7 @@ class Context:
         return type(self)(self.app, name, description, self, level, childlevel)
 
     def full_name(self):
-        c = self
-        names = []
-        while c is not None:
-            names.append(c.name)
-            c = c.parent
-        return "/".join(reversed(names))
+        return self._full_name
 
     def enter(self, description=None):
         if description is None:
@@ -94,9 +131,18 @@ class Context:
 
     def __enter__(self):
         self.enter()
+        self._token = current_context_id.set(self.id)
         return self
 
     def __exit__(self, exc, value, tb):
+        if self._token is not None:
+            try:
+                current_context_id.reset(self._token)
+            except ValueError:
+                # Exited from a different task or thread than it was
+                # entered from; that one's value is not ours to restore.
+                pass
+            self._token = None
         if exc is not None:
             result = Status.FAIL
             if isinstance(value, asyncio.CancelledError):
@@ -109,15 +155,13 @@ class Context:
         self.exit(description, result)
 
     def set(self, key, value):
+        if not self._owns_data:
+            self.data = dict(self.data)
+            self._owns_data = True
         self.data[key] = value
 
     def get(self, key, default=None):
-        c = self
-        while c is not None:
-            if key in c.data:
-                return c.data[key]
-            c = c.parent
-        return default
+        return self.data.get(key, default)
 
     def info(self, message: str, log: Optional[Logger] = None) -> None:
         if log is not None:
@@ -52,6 +52,9 @@ class Application:
             #    subiquitycore/prober.py
             #  - copy-logs-fail: makes post-install copying of logs fail, see
             #    subiquity/controllers/installprogress.py
+            #  - profile, slow-callbacks: run the sampling profiler from
+            #    startup and log slow event loop callbacks, see
+            #    subiquity/server/profiler.py
             self.debug_flags = os.environ.get("SUBIQUITY_DEBUG", "").split(",")
 
         self.opts = opts
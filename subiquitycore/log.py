@@ -12,13 +12,98 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
+from subiquitycore.context import current_context_id
 from subiquitycore.file_util import set_log_perms
 
+_listener: Optional[QueueListener] = None
 
-def setup_logger(dir, base="subiquity"):
+
+class ContextIdFilter(logging.Filter):
+    """Adds the id of the Context being run (if any) to records."""
+
+    def filter(self, record):
+        record.context_id = current_context_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single line JSON object."""
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "thread": record.threadName,
+            "context_id": getattr(record, "context_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry)
+
+
+class _BackgroundFileHandler(logging.FileHandler):
+    # Flushing after every record means a write() for every record; the
+    # listener flushes once the queue is drained instead.
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        super().flush()
+
+
+class _BackgroundQueueListener(QueueListener):
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush_now()
+
+    def stop(self):
+        super().stop()
+        for handler in self.handlers:
+            handler.flush_now()
+
+
+class _BackgroundQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # The arguments may be modified once the logging call returns, so
+        # the message has to be interpolated here, but formatting the
+        # record (and writing it out) is left to the listener thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def stop_background_logging():
+    """Write out any queued log records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(dir, base="subiquity", *, background=False, json_format=False):
+    """Log to {base}-info.log and {base}-debug.log in dir.
+
+    With background=True the records are written by a separate thread, so
+    that logging does not block the caller (i.e. the event loop) on file
+    I/O. With json_format=True each record is written as a line of JSON,
+    including the id of the Context it was logged from."""
     os.makedirs(dir, exist_ok=True)
     # Create the log directory in such a way that users in the group may
     # write to this directory in the installation environment.
@@ -35,11 +120,15 @@ def setup_logger(dir, base="subiquity"):
     logger.setLevel(logging.DEBUG)
 
     r = {}
+    handlers = []
 
     for level in "info", "debug":
         nopid_file = os.path.join(dir, "{}-{}.log".format(base, level))
         logfile = "{}.{}".format(nopid_file, os.getpid())
-        handler = logging.FileHandler(logfile)
+        if background:
+            handler = _BackgroundFileHandler(logfile)
+        else:
+            handler = logging.FileHandler(logfile)
         set_log_perms(logfile, group_write=False)
         # os.symlink cannot replace an existing file or symlink so create
         # it and then rename it over.
@@ -48,13 +137,33 @@ def setup_logger(dir, base="subiquity"):
         os.rename(tmplink, nopid_file)
 
         handler.setLevel(getattr(logging, level.upper()))
-        handler.setFormatter(
-            logging.Formatter(
-                "%(asctime)s %(levelname)s %(name)s:%(lineno)d %(message)s"
+        if json_format:
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(
+                logging.Formatter(
+                    "%(asctime)s %(levelname)s %(name)s:%(lineno)d %(message)s"
+                )
             )
-        )
 
-        logger.addHandler(handler)
+        handlers.append(handler)
         r[level] = logfile
 
+    if background:
+        global _listener
+        stop_background_logging()
+        log_queue = queue.SimpleQueue()
+        queue_handler = _BackgroundQueueHandler(log_queue)
+        queue_handler.addFilter(ContextIdFilter())
+        logger.addHandler(queue_handler)
+        _listener = _BackgroundQueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(stop_background_logging)
+    else:
+        for handler in handlers:
+            handler.addFilter(ContextIdFilter())
+            logger.addHandler(handler)
+
     return r
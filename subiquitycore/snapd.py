@@ -110,13 +110,14 @@ class ResponseSet:
 
     def next(self):
         f = self.files[self.index]
-        d = int(os.environ.get("SUBIQUITY_REPLAY_TIMESCALE", 1))
+        # The scale may be fractional, or "inf" to replay with no delay.
+        d = float(os.environ.get("SUBIQUITY_REPLAY_TIMESCALE", 1))
         # Make sure we return the last response even when we skip most
         # of them.
         if d > 1 and self.index + d >= len(self.files):
             self.index = len(self.files) - 1
         else:
-            self.index += d
+            self.index += max(int(d), 1)
         return _FakeFileResponse(f)
 
 
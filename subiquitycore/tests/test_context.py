@@ -0,0 +1,59 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from unittest.mock import Mock
+
+from subiquitycore.context import Context
+
+
+class TestContext(unittest.TestCase):
+    def test_full_name(self):
+        app = Mock(project="subiquity")
+        root = Context.new(app)
+        child = root.child("child")
+        grandchild = child.child("grandchild")
+        self.assertEqual(root.full_name(), "subiquity")
+        self.assertEqual(grandchild.full_name(), "subiquity/child/grandchild")
+        self.assertEqual(
+            [root.depth, child.depth, grandchild.depth],
+            [0, 1, 2],
+        )
+
+    def test_get(self):
+        root = Context.new(Mock(project="subiquity"))
+        root.set("key", "root")
+        child = root.child("child")
+        self.assertEqual(child.get("key"), "root")
+        child.set("key", "child")
+        self.assertEqual(child.get("key"), "child")
+        self.assertEqual(root.get("key"), "root")
+        self.assertIsNone(child.get("other"))
+
+    def test_get_copy_on_write(self):
+        root = Context.new(Mock(project="subiquity"))
+        root.set("a", 1)
+        child = root.child("child")
+        sibling = root.child("sibling")
+        grandchild = child.child("grandchild")
+        child.set("b", 2)
+        self.assertEqual(grandchild.get("a"), 1)
+        self.assertIsNone(grandchild.get("b"))
+        self.assertIsNone(sibling.get("b"))
+        self.assertEqual(child.child("new").get("b"), 2)
+        # Children that have not set anything share their parent's values.
+        root.set("c", 3)
+        self.assertEqual(sibling.get("c"), 3)
+        self.assertEqual(grandchild.get("c"), 3)
+        self.assertIsNone(child.get("c"))
@@ -12,13 +12,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import errno
+import os
 from pathlib import Path
 from unittest.mock import Mock, patch
 
 from subiquitycore.file_util import (
     _DEF_GROUP,
     _DEF_PERMS_FILE,
+    copy_file,
     copy_file_if_exists,
+    copy_tree,
     set_log_perms,
 )
 from subiquitycore.tests import SubiTestCase
@@ -38,6 +42,109 @@ class TestCopy(SubiTestCase):
         copy_file_if_exists("/does/not/exist", "/ditto")
 
 
+class TestCopyTree(SubiTestCase):
+    def make_tree(self):
+        src = self.tmp_dir()
+        os.makedirs(os.path.join(src, "a/b"))
+        for i in range(20):
+            with open(os.path.join(src, f"a/file{i}"), "w") as fp:
+                fp.write(f"contents {i}\n" * i)
+        os.chmod(os.path.join(src, "a/file3"), 0o4750)
+        os.symlink("../a/file1", os.path.join(src, "a/b/link"))
+        os.link(os.path.join(src, "a/file2"), os.path.join(src, "a/b/hardlink"))
+        os.mkfifo(os.path.join(src, "fifo"))
+        os.utime(os.path.join(src, "a/b"), ns=(1, 1_000_000_000))
+        os.chmod(os.path.join(src, "a/b"), 0o500)
+        self.addCleanup(os.chmod, os.path.join(src, "a/b"), 0o700)
+        return src
+
+    def assert_same_tree(self, src, dst):
+        for dirpath, dirnames, filenames in os.walk(src):
+            rel = os.path.relpath(dirpath, src)
+            self.assertEqual(
+                sorted(dirnames + filenames),
+                sorted(os.listdir(os.path.join(dst, rel))),
+            )
+            for name in dirnames + filenames:
+                s = os.lstat(os.path.join(dirpath, name))
+                d = os.lstat(os.path.join(dst, rel, name))
+                self.assertEqual(
+                    (s.st_mode, s.st_uid, s.st_gid, s.st_size, s.st_mtime_ns),
+                    (d.st_mode, d.st_uid, d.st_gid, d.st_size, d.st_mtime_ns),
+                    name,
+                )
+
+    def test_copy_tree(self):
+        src = self.make_tree()
+        dst = os.path.join(self.tmp_dir(), "new")
+        copy_tree(src, dst, max_workers=4)
+        self.addCleanup(os.chmod, os.path.join(dst, "a/b"), 0o700)
+        self.assert_same_tree(src, dst)
+        self.assert_contents(os.path.join(dst, "a/file5"), "contents 5\n" * 5)
+        self.assertEqual(os.readlink(os.path.join(dst, "a/b/link")), "../a/file1")
+        self.assertTrue(
+            os.path.samefile(
+                os.path.join(dst, "a/file2"), os.path.join(dst, "a/b/hardlink")
+            )
+        )
+
+    def test_copy_tree_merges(self):
+        src = self.tmp_dir()
+        dst = self.tmp_dir()
+        with open(os.path.join(src, "file"), "w") as fp:
+            fp.write("new")
+        with open(os.path.join(dst, "file"), "w") as fp:
+            fp.write("old contents")
+        with open(os.path.join(dst, "other"), "w") as fp:
+            fp.write("other")
+        copy_tree(src, dst)
+        self.assert_contents(os.path.join(dst, "file"), "new")
+        self.assert_contents(os.path.join(dst, "other"), "other")
+
+    def test_copy_tree_errors(self):
+        src = self.tmp_dir()
+        os.mkdir(os.path.join(src, "dir"))
+        with open(os.path.join(src, "file"), "w") as fp:
+            fp.write("data")
+        dst = self.tmp_dir()
+        # A directory cannot be replaced by a file, but the rest is copied.
+        os.mkdir(os.path.join(dst, "file"))
+        with self.assertRaises(IsADirectoryError):
+            copy_tree(src, dst)
+        self.assertTrue(os.path.isdir(os.path.join(dst, "dir")))
+
+    @patch("subiquitycore.file_util.os.copy_file_range")
+    @patch("subiquitycore.file_util.fcntl.ioctl")
+    def test_copy_file_fallbacks(self, ioctl, copy_file_range):
+        ioctl.side_effect = OSError(errno.EOPNOTSUPP, "no reflinks")
+        copy_file_range.side_effect = OSError(errno.EXDEV, "cross-device")
+        src = self.tmp_path("src")
+        with open(src, "w") as fp:
+            fp.write("data")
+        os.chmod(src, 0o640)
+        dst = self.tmp_path("dst")
+        copy_file(src, dst)
+        self.assert_contents(dst, "data")
+        self.assertEqual(os.stat(dst).st_mode & 0o777, 0o640)
+        ioctl.assert_called_once()
+        copy_file_range.assert_called_once()
+
+    def test_copy_file_symlink(self):
+        # Like cp -a, a symbolic link is copied as a link, replacing what
+        # is at the destination.
+        target = self.tmp_path("target")
+        with open(target, "w") as fp:
+            fp.write("data")
+        src = self.tmp_path("src")
+        os.symlink(target, src)
+        dst = self.tmp_path("dst")
+        with open(dst, "w") as fp:
+            fp.write("old")
+        copy_file(src, dst)
+        self.assertEqual(os.readlink(dst), target)
+        self.assert_contents(target, "data")
+
+
 @patch("subiquitycore.file_util.os.getuid", new=Mock(return_value=0))
 class TestLogPerms(SubiTestCase):
     def setUp(self):
@@ -0,0 +1,94 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import json
+import logging
+from unittest.mock import Mock, patch
+
+from subiquitycore.context import Context
+from subiquitycore.log import setup_logger, stop_background_logging
+from subiquitycore.tests import SubiTestCase
+
+log = logging.getLogger("subiquitycore.tests.test_log")
+
+
+@patch("subiquitycore.log.set_log_perms")
+class TestSetupLogger(SubiTestCase):
+    def setUp(self):
+        root = logging.getLogger("")
+        handlers = list(root.handlers)
+        level = root.level
+
+        def restore():
+            stop_background_logging()
+            for handler in root.handlers:
+                if handler not in handlers:
+                    root.removeHandler(handler)
+                    handler.close()
+            root.setLevel(level)
+
+        self.addCleanup(restore)
+        self.dir = self.tmp_dir()
+
+    def read(self, logfiles, level):
+        with open(logfiles[level]) as fp:
+            return fp.read().splitlines()
+
+    def test_text(self, set_log_perms):
+        logfiles = setup_logger(self.dir, base="test")
+        log.debug("debug %s", 1)
+        log.info("info %s", 2)
+        [debug1, info1] = self.read(logfiles, "debug")
+        [info2] = self.read(logfiles, "info")
+        self.assertIn("DEBUG subiquitycore.tests.test_log:", debug1)
+        self.assertTrue(debug1.endswith(" debug 1"))
+        self.assertEqual(info1, info2)
+
+    def test_background(self, set_log_perms):
+        logfiles = setup_logger(self.dir, base="test", background=True)
+        data = ["before"]
+        log.debug("data %s", data)
+        # The message is interpolated when logged, not when written.
+        data[0] = "after"
+        stop_background_logging()
+        [line] = self.read(logfiles, "debug")
+        self.assertTrue(line.endswith(" data ['before']"))
+        self.assertEqual(self.read(logfiles, "info"), [])
+
+    def test_json(self, set_log_perms):
+        logfiles = setup_logger(
+            self.dir, base="test", background=True, json_format=True
+        )
+        context = Context.new(Mock(project="subiquity")).child("child")
+        log.info("outside")
+        with context:
+            log.info("inside %s", "context")
+            try:
+                raise ValueError("oops")
+            except ValueError:
+                log.exception("failed")
+        stop_background_logging()
+        entries = [json.loads(line) for line in self.read(logfiles, "info")]
+        self.assertEqual(
+            [(e["message"], e["context_id"]) for e in entries],
+            [
+                ("outside", None),
+                ("inside context", context.id),
+                ("failed", context.id),
+            ],
+        )
+        self.assertEqual(entries[1]["level"], "INFO")
+        self.assertEqual(entries[1]["logger"], "subiquitycore.tests.test_log")
+        self.assertIn("ValueError: oops", entries[2]["exception"])
@@ -0,0 +1,41 @@
+# Copyright 2026 Canonical, Ltd.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import unittest
+from unittest.mock import patch
+
+from subiquitycore.snapd import ResponseSet
+
+
+class TestResponseSet(unittest.TestCase):
+    def responses(self, scale, n=5):
+        rs = ResponseSet([f"f{i}" for i in range(n)])
+        with patch.dict(os.environ, {"SUBIQUITY_REPLAY_TIMESCALE": scale}):
+            return [rs.next().path for i in range(3)]
+
+    def test_default(self):
+        with patch.dict(os.environ):
+            os.environ.pop("SUBIQUITY_REPLAY_TIMESCALE", None)
+            rs = ResponseSet(["f0", "f1"])
+            self.assertEqual(rs.next().path, "f0")
+            self.assertEqual(rs.next().path, "f1")
+
+    def test_scales(self):
+        self.assertEqual(self.responses("1"), ["f0", "f1", "f2"])
+        self.assertEqual(self.responses("0.5"), ["f0", "f1", "f2"])
+        self.assertEqual(self.responses("2"), ["f0", "f2", "f4"])
+        self.assertEqual(self.responses("10"), ["f0", "f4", "f4"])
+        self.assertEqual(self.responses("inf"), ["f0", "f4", "f4"])